@@ -0,0 +1,59 @@
+"""
+Benchmark: EntityResolver.resolve latency as the number of blocks grows.
+
+Each model has a fixed block size, so the matching work per query stays the same while the
+number of blocks grows by orders of magnitude. Query entities are looked up through their
+block keys, so the time per query should stay roughly flat across block counts.
+
+Usage:
+PYTHONPATH=. python benchmarks/resolve_latency.py
+"""
+
+import random
+import time
+
+from rezolva import (Entity, EntityResolver, SimpleBlocker, SimpleModelBuilder,
+                     SimplePreprocessor)
+from rezolva.matchers import JaccardMatcher
+from rezolva.preprocessors.preprocessing_functions import (lowercase,
+                                                           strip_whitespace)
+
+BLOCK_COUNTS = [1_000, 10_000, 100_000]
+BLOCK_SIZE = 3
+NUM_QUERIES = 500
+WORDS = ["acme", "global", "systems", "trading", "holdings", "partners", "group", "labs", "works", "supply"]
+
+
+def make_entity(entity_id: str, block: int, rng: random.Random) -> Entity:
+    return Entity(entity_id, {"name": " ".join(rng.sample(WORDS, 3)), "zip": f"{block:06d}"})
+
+
+def build_resolver(num_blocks: int, rng: random.Random) -> EntityResolver:
+    resolver = EntityResolver(
+        SimplePreprocessor([lowercase, strip_whitespace]),
+        SimpleModelBuilder(["name", "zip"]),
+        JaccardMatcher(threshold=0.5, attribute_weights={"name": 1.0}),
+        SimpleBlocker(lambda e: e.attributes["zip"]),
+    )
+    resolver.train(
+        [make_entity(f"{block}-{i}", block, rng) for block in range(num_blocks) for i in range(BLOCK_SIZE)]
+    )
+    return resolver
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'blocks':>10} {'entities':>10} {'us/query':>10}")
+    for num_blocks in BLOCK_COUNTS:
+        resolver = build_resolver(num_blocks, rng)
+        queries = [make_entity(f"q{i}", rng.randrange(num_blocks), rng) for i in range(NUM_QUERIES)]
+
+        start = time.perf_counter()
+        resolver.resolve(queries)
+        elapsed = time.perf_counter() - start
+
+        print(f"{num_blocks:>10} {len(resolver.preprocessed_entities):>10} {elapsed / NUM_QUERIES * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
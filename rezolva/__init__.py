@@ -1,7 +1,9 @@
 # File: rezolva/__init__.py
 
 from .blockers.simple_blocker import SimpleBlocker
+from .core.async_resolver import AsyncEntityResolver
 from .core.base import Entity
+from .core.entity_store import EntityStore
 from .core.resolver import EntityResolver
 from .model_builders.simple_model_builder import SimpleModelBuilder
 from .preprocessors.simple_preprocessor import SimplePreprocessor
@@ -10,4 +12,12 @@ from .preprocessors.simple_preprocessor import SimplePreprocessor
 __version__ = "0.3.0"
 
 # List of public objects in this package
-__all__ = ["EntityResolver", "Entity", "SimplePreprocessor", "SimpleModelBuilder", "SimpleBlocker"]
+__all__ = [
+    "EntityResolver",
+    "AsyncEntityResolver",
+    "Entity",
+    "EntityStore",
+    "SimplePreprocessor",
+    "SimpleModelBuilder",
+    "SimpleBlocker",
+]
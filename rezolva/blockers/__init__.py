@@ -1,5 +1,9 @@
+from .block_cleaner import BlockCleaner
 from .canopy_blocker import CanopyBlocker
+from .composite_blocker import (IntersectionBlocker, MultiPassBlocker,
+                                UnionBlocker)
 from .lsh_blocker import LSHBlocker
+from .meta_blocker import MetaBlocker
 from .q_gram_blocker import QGramBlocker
 from .simple_blocker import SimpleBlocker
 from .sorted_neighborhood_blocker import SortedNeighborhoodBlocker
@@ -0,0 +1,183 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, List, MutableMapping, Optional, Set
+
+
+def _comparisons(size: int) -> int:
+    return size * (size - 1) // 2
+
+
+class BlockCleaner:
+    """
+    A block-cleaning stage that removes oversized blocks and redundant block assignments.
+
+    Frequent blocking keys (a common q-gram such as " th", or a frequent soundex code) produce huge
+    blocks whose comparisons grow quadratically with their size while they say little about whether
+    two entities match. BlockCleaner works on the blocks of any Blocker, after they are created.
+
+    How BlockCleaner works:
+    1. Block purging: blocks larger than a size limit are dropped. Unless given, the limit is chosen
+       from the block-size distribution: walking from the largest block size down, a size is purged
+       while it exceeds purging_factor times the mean size of the smaller blocks (weighted by their
+       block assignments)
+    2. Block filtering: each entity is kept only in its smallest blocks, either a fixed number of
+       them or a fraction of the blocks it was placed in
+    3. Query entities are looked up in their smallest blocks only, in the same way
+
+    The number of pairwise comparisons in the blocks before and after cleaning, and how many were
+    removed, are reported in `stats`.
+
+    Usage:
+    block_cleaner = BlockCleaner(filter_ratio=0.8)
+    resolver = EntityResolver(preprocessor, model_builder, matcher, blocker, block_cleaner=block_cleaner)
+
+    :param max_block_size: The largest block size kept (chosen from the block-size distribution if None)
+    :param purging_factor: How many times larger than the mean of the smaller blocks a block size can be before
+        it is purged, when the size limit is chosen automatically
+    :param max_blocks_per_entity: The maximum number of blocks each entity is kept in (no limit if None)
+    :param filter_ratio: The fraction of its blocks each entity is kept in (no block filtering if None)
+    """
+
+    def __init__(
+        self,
+        max_block_size: Optional[int] = None,
+        purging_factor: float = 10.0,
+        max_blocks_per_entity: Optional[int] = None,
+        filter_ratio: Optional[float] = None,
+    ):
+        self.max_block_size = max_block_size
+        self.purging_factor = purging_factor
+        self.max_blocks_per_entity = max_blocks_per_entity
+        self.filter_ratio = filter_ratio
+        self.block_size_limit = max_block_size
+        self.purged_keys: Set[Any] = set()
+        self.stats = {
+            "purged_blocks": 0,
+            "filtered_assignments": 0,
+            "comparisons_before": 0,
+            "comparisons_after": 0,
+            "comparisons_removed": 0,
+        }
+
+    def purge_limit(self, blocks: MutableMapping[Any, Set[Any]]) -> int:
+        """
+        Choose the largest block size kept from the distribution of block sizes.
+
+        :param blocks: The blocks by block key, each a set of entity IDs
+        :return: The block size limit
+        """
+        sizes = Counter(len(block) for block in blocks.values())
+        levels = sorted(sizes)
+        assignments = sum(size * count for size, count in sizes.items())
+        squares = sum(size * size * count for size, count in sizes.items())
+        for size in reversed(levels[1:]):
+            assignments -= size * sizes[size]
+            squares -= size * size * sizes[size]
+            # squares / assignments is the mean size of the smaller blocks, weighted by block assignments
+            if size <= self.purging_factor * squares / assignments:
+                return size
+        return levels[0] if levels else 0
+
+    def clean(
+        self,
+        blocks: MutableMapping[Any, Set[Any]],
+        entity_blocks: MutableMapping[Any, Set[Any]],
+        keys: Optional[Iterable[Any]] = None,
+        entity_ids: Optional[Iterable[Any]] = None,
+    ) -> Dict[str, int]:
+        """
+        Purge and filter blocks in place.
+
+        Cleaning all blocks chooses a new size limit. Cleaning only the blocks and entities touched by an
+        update keeps the previous limit, and keeps purged block keys purged.
+
+        :param blocks: The blocks by block key, each a set of entity IDs
+        :param entity_blocks: The block keys of each entity
+        :param keys: The keys of the blocks to purge (all blocks if None)
+        :param entity_ids: The IDs of the entities to filter (all entities if None)
+        :return: The cleaning statistics
+        """
+        if keys is None:
+            self.purged_keys = set()
+            if self.max_block_size is None:
+                self.block_size_limit = self.purge_limit(blocks)
+            keys = list(blocks)
+        else:
+            keys = [key for key in dict.fromkeys(keys) if key in blocks]
+        if entity_ids is None:
+            entity_ids = list(entity_blocks)
+        if self.filter_ratio is None and self.max_blocks_per_entity is None:
+            entity_ids = []
+
+        stats = dict.fromkeys(self.stats, 0)
+        stats["comparisons_before"] = sum(_comparisons(len(blocks[key])) for key in keys)
+
+        for key in keys:
+            block = blocks[key]
+            if key in self.purged_keys or (self.block_size_limit is not None and len(block) > self.block_size_limit):
+                self.purged_keys.add(key)
+                stats["purged_blocks"] += 1
+                for entity_id in block:
+                    self._unassign(entity_blocks, entity_id, key)
+                del blocks[key]
+
+        # Blocks are ranked by their size before filtering, so the result does not depend on the entity order
+        entity_keys = {entity_id: entity_blocks.get(entity_id) for entity_id in entity_ids}
+        sizes = {key: len(blocks[key]) for block_keys in entity_keys.values() if block_keys for key in block_keys}
+        for entity_id, block_keys in entity_keys.items():
+            if not block_keys:
+                continue
+            kept = self._smallest(block_keys, sizes)
+            if len(kept) < len(block_keys):
+                for key in block_keys.difference(kept):
+                    stats["filtered_assignments"] += 1
+                    block = blocks[key]
+                    block.discard(entity_id)
+                    if block:
+                        blocks[key] = block
+                    else:
+                        del blocks[key]
+                entity_blocks[entity_id] = set(kept)
+
+        stats["comparisons_after"] = sum(_comparisons(len(blocks[key])) for key in keys if key in blocks)
+        stats["comparisons_removed"] = stats["comparisons_before"] - stats["comparisons_after"]
+        self.stats = stats
+        return stats
+
+    def filter_keys(self, block_keys: Iterable[Any], blocks: MutableMapping[Any, Set[Any]]) -> List[Any]:
+        """
+        Keep the keys of an entity's smallest blocks, dropping keys of blocks that do not exist.
+
+        :param block_keys: The keys of the entity's blocks
+        :param blocks: The blocks by block key, each a set of entity IDs
+        :return: The kept block keys
+        """
+        if self.filter_ratio is None and self.max_blocks_per_entity is None:
+            return list(block_keys)
+
+        sizes = {}
+        for key in block_keys:
+            block = blocks.get(key)
+            if block:
+                sizes[key] = len(block)
+        return self._smallest(sizes, sizes)
+
+    def _smallest(self, block_keys: Iterable[Any], sizes: Dict[Any, int]) -> List[Any]:
+        block_keys = list(block_keys)
+        limit = len(block_keys)
+        if self.filter_ratio is not None:
+            limit = min(limit, max(1, round(self.filter_ratio * len(block_keys))))
+        if self.max_blocks_per_entity is not None:
+            limit = min(limit, self.max_blocks_per_entity)
+        if limit == len(block_keys):
+            return block_keys
+        return sorted(block_keys, key=sizes.__getitem__)[:limit]
+
+    def _unassign(self, entity_blocks: MutableMapping[Any, Set[Any]], entity_id: Any, key: Any):
+        block_keys = entity_blocks.get(entity_id)
+        if block_keys is None:
+            return
+        block_keys.discard(key)
+        if block_keys:
+            entity_blocks[entity_id] = block_keys
+        else:
+            del entity_blocks[entity_id]
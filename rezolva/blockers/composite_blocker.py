@@ -0,0 +1,156 @@
+import itertools
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from ..core.base import Blocker, Entity
+
+# The blockers and entities of the blocking passes run by each worker process, set once when the worker starts
+_worker_passes = None
+
+
+def _init_worker(blockers: List[Blocker], entities: List[Entity]):
+    global _worker_passes
+    _worker_passes = (blockers, entities)
+
+
+def _create_pass_blocks(index: int) -> Dict[Any, List[Any]]:
+    # Only entity IDs are sent back, the parent process maps them to its own entities
+    blockers, entities = _worker_passes
+    blocks = blockers[index].create_blocks(entities)
+    return {key: [entity.id for entity in block] for key, block in blocks.items()}
+
+
+class _CompositeBlocker(Blocker):
+    def __init__(self, blockers: Sequence[Blocker], n_jobs: Optional[int] = 1, min_parallel_entities: int = 10000):
+        if not blockers:
+            raise ValueError("At least one blocker is required")
+        self.blockers = list(blockers)
+        self.n_jobs = n_jobs
+        self.min_parallel_entities = min_parallel_entities
+
+    def _create_pass_blocks(self, entities: List[Entity]) -> List[Dict[Any, List[Entity]]]:
+        # Starting worker processes costs more than blocking a few entities (e.g. the ones added by update_model)
+        if self.n_jobs == 1 or len(self.blockers) == 1 or len(entities) < self.min_parallel_entities:
+            return [blocker.create_blocks(entities) for blocker in self.blockers]
+
+        # Each pass runs in its own worker, which inherits the blockers and entities when it starts
+        entities_by_id = {entity.id: entity for entity in entities}
+        max_workers = min(self.n_jobs or len(self.blockers), len(self.blockers))
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(self.blockers, entities)
+        ) as executor:
+            results = list(executor.map(_create_pass_blocks, range(len(self.blockers))))
+        return [
+            {key: [entities_by_id[entity_id] for entity_id in block] for key, block in blocks.items()}
+            for blocks in results
+        ]
+
+
+class UnionBlocker(_CompositeBlocker):
+    """
+    A blocker that combines several blockers so that entities sharing a block in any of them are candidates.
+
+    Each blocker keeps its own blocks, with their keys tagged by the position of the blocker so blocks
+    of different blockers never merge. An entity's blocks are the blocks it falls into in every blocker,
+    and EntityResolver takes the union of their entities as candidates, so a pair found by several
+    blockers is still compared once.
+
+    How UnionBlocker works:
+    1. Create the blocks of each blocker, concurrently in worker processes if n_jobs is not 1
+    2. Tag each block key with the position of its blocker
+    3. Return the blocks of all blockers together
+
+    Usage:
+    blocker = UnionBlocker([SortedNeighborhoodBlocker(name_key, 5), SimpleBlocker(zip_key)])
+
+    :param blockers: The blockers to combine
+    :param n_jobs: The number of worker processes creating blocks (1 runs the blockers in this process,
+        None runs every blocker in its own process). The blockers are sent to the workers, so they have to be
+        picklable (e.g. key functions defined at module level rather than lambdas) for n_jobs other than 1.
+    :param min_parallel_entities: The number of entities below which the blockers run in this process whatever n_jobs
+    """
+
+    def create_blocks(self, entities: List[Entity]) -> Dict[Tuple[int, Any], List[Entity]]:
+        blocks = {}
+        for index, pass_blocks in enumerate(self._create_pass_blocks(entities)):
+            for key, block in pass_blocks.items():
+                blocks[(index, key)] = block
+        return blocks
+
+    def block_keys(self, entity: Entity) -> List[Tuple[int, Any]]:
+        return [(index, key) for index, blocker in enumerate(self.blockers) for key in blocker.block_keys(entity)]
+
+
+class IntersectionBlocker(_CompositeBlocker):
+    """
+    A blocker that combines several blockers so that only entities sharing a block in all of them are candidates.
+
+    Two entities share a block in every blocker exactly when they share a combination of block keys,
+    one from each blocker. The blocks are therefore keyed by the combinations of each entity's keys,
+    which stays compact for blockers that place an entity in a few blocks (e.g. exact or phonetic keys)
+    but grows multiplicatively for blockers with many keys per entity.
+
+    How IntersectionBlocker works:
+    1. Create the blocks of each blocker, concurrently in worker processes if n_jobs is not 1
+    2. Collect the block keys of each entity in each blocker
+    3. Place each entity in a block for every combination of its keys, one from each blocker
+
+    Usage:
+    blocker = IntersectionBlocker([SimpleBlocker(surname_soundex), SimpleBlocker(zip_key)])
+
+    :param blockers: The blockers to combine
+    :param n_jobs: The number of worker processes creating blocks (1 runs the blockers in this process,
+        None runs every blocker in its own process). The blockers are sent to the workers, so they have to be
+        picklable (e.g. key functions defined at module level rather than lambdas) for n_jobs other than 1.
+    :param min_parallel_entities: The number of entities below which the blockers run in this process whatever n_jobs
+    """
+
+    def create_blocks(self, entities: List[Entity]) -> Dict[Tuple[Any, ...], List[Entity]]:
+        entity_keys = defaultdict(lambda: [[] for _ in self.blockers])
+        entities_by_id = {}
+        for index, pass_blocks in enumerate(self._create_pass_blocks(entities)):
+            for key, block in pass_blocks.items():
+                for entity in block:
+                    entity_keys[entity.id][index].append(key)
+                    entities_by_id[entity.id] = entity
+
+        blocks = defaultdict(list)
+        for entity_id, keys in entity_keys.items():
+            for combination in itertools.product(*keys):
+                blocks[combination].append(entities_by_id[entity_id])
+        return dict(blocks)
+
+    def block_keys(self, entity: Entity) -> List[Tuple[Any, ...]]:
+        return list(itertools.product(*(blocker.block_keys(entity) for blocker in self.blockers)))
+
+
+class MultiPassBlocker(UnionBlocker):
+    """
+    A blocker that runs several blocking passes and unions their candidates.
+
+    Each pass is either a blocker or a list of blockers that entities have to share a block in all of,
+    so the passes describe an OR of ANDs, e.g. "sorted neighborhood on name OR (soundex on surname AND
+    exact zip)". Several tight passes usually reach the recall of one loose blocker with far fewer
+    candidates. With n_jobs other than 1, the passes over large inputs run concurrently in worker processes.
+
+    Usage:
+    blocker = MultiPassBlocker([name_blocker, [surname_soundex_blocker, zip_blocker]])
+
+    :param passes: The blocking passes, each a blocker or a list of blockers to intersect
+    :param n_jobs: The number of worker processes running passes (1 runs the passes in this process, None runs
+        every pass in its own process). The blockers have to be picklable for n_jobs other than 1.
+    :param min_parallel_entities: The number of entities below which the passes run in this process whatever n_jobs
+    """
+
+    def __init__(
+        self,
+        passes: Sequence[Union[Blocker, Sequence[Blocker]]],
+        n_jobs: Optional[int] = 1,
+        min_parallel_entities: int = 10000,
+    ):
+        super().__init__(
+            [blocker if isinstance(blocker, Blocker) else IntersectionBlocker(blocker) for blocker in passes],
+            n_jobs,
+            min_parallel_entities,
+        )
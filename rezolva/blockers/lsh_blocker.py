@@ -1,7 +1,7 @@
-import hashlib
-from typing import Callable, Dict, List
+from typing import Dict, List, Set
 
 from ..core.base import Blocker, Entity
+from ..utils.minhash import MinHashSigner
 
 
 class LSHBlocker(Blocker):
@@ -20,41 +20,44 @@ class LSHBlocker(Blocker):
     5. Entities that share at least one bucket are considered candidates for comparison
 
     This implementation uses MinHash as the LSH technique, which is especially good for
-    estimating the Jaccard similarity between sets.
+    estimating the Jaccard similarity between sets. Signatures are computed by a MinHashSigner,
+    which hashes each word once and applies all hash functions to it at once, and create_blocks
+    signs all entities in one batch.
 
     :param num_hash_functions: The number of hash functions to use for MinHash
     :param band_size: The size of each band for LSH
     :param attribute: The attribute to use for blocking
+    :param seed: The seed of the random hash functions
     """
 
-    def __init__(self, num_hash_functions: int, band_size: int, attribute: str):
+    def __init__(self, num_hash_functions: int, band_size: int, attribute: str, seed: int = 1):
         self.num_hash_functions = num_hash_functions
         self.band_size = band_size
         self.attribute = attribute
-        self.hash_functions = self._generate_hash_functions()
+        self.signer = MinHashSigner(num_hash_functions, seed)
 
-    def _generate_hash_functions(self):
-        return [
-            lambda x, i=i: int(hashlib.md5(f"{x}{i}".encode()).hexdigest(), 16) % (2**32 - 1)
-            for i in range(self.num_hash_functions)
-        ]
+    def _words(self, entity: Entity) -> Set[str]:
+        return set(entity.attributes.get(self.attribute, "").lower().split())
 
     def _minhash_signature(self, text: str) -> List[int]:
-        words = set(text.lower().split())
-        signature = [min(h(word) for word in words) for h in self.hash_functions]
-        return signature
+        return self.signer.signature(set(text.lower().split()))
+
+    def _signature_band_keys(self, signature: List[int]) -> List[int]:
+        return [hash(tuple(signature[i : i + self.band_size])) for i in range(0, len(signature), self.band_size)]
+
+    def _band_keys(self, entity: Entity) -> List[int]:
+        return self._signature_band_keys(self.signer.signature(self._words(entity)))
 
     def create_blocks(self, entities: List[Entity]) -> Dict[str, List[Entity]]:
         blocks = {}
-        for entity in entities:
-            text = entity.attributes.get(self.attribute, "")
-            signature = self._minhash_signature(text)
-
-            for i in range(0, len(signature), self.band_size):
-                band = tuple(signature[i : i + self.band_size])
-                block_key = hash(band)
+        signatures = self.signer.signatures(self._words(entity) for entity in entities)
+        for entity, signature in zip(entities, signatures):
+            for block_key in self._signature_band_keys(signature):
                 if block_key not in blocks:
                     blocks[block_key] = []
                 blocks[block_key].append(entity)
 
         return blocks
+
+    def block_keys(self, entity: Entity) -> List[int]:
+        return list(dict.fromkeys(self._band_keys(entity)))
@@ -0,0 +1,354 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+
+class MetaBlocker:
+    """
+    A meta-blocking stage that prunes the candidate pairs produced by a blocker before matching.
+
+    Redundancy-heavy blockers (e.g. QGramBlocker or LSHBlocker) place every entity in many blocks,
+    so most candidate pairs share only a few incidental blocks. Meta-blocking treats the blocks as
+    an implicit graph with an edge between every two entities sharing a block, weights each edge by
+    how strongly the blocks suggest a match, and keeps only the heaviest edges.
+
+    How MetaBlocker works:
+    1. When fitted, collect the block statistics used by the weighting and pruning schemes, and keep
+       them up to date as entities are added and removed
+    2. For an entity, walk its blocks and weight the edge to every entity sharing one of them
+    3. Prune the edges below a threshold, which is either global or local to the entity
+    4. Only the entities at the end of the retained edges are passed to the matcher
+
+    Weighting schemes:
+    - "cbs": Common Blocks Scheme, the number of blocks the two entities share
+    - "jaccard": the Jaccard similarity of the two entities' sets of blocks
+    - "ecbs": Enhanced CBS, CBS discounted for entities placed in many blocks
+    - "arcs": Aggregate Reciprocal Comparisons Scheme, the sum of 1 / comparisons of each shared block
+
+    Pruning schemes:
+    - "wep": Weighted Edge Pruning, keeps edges weighing at least the average edge weight
+    - "cep": Cardinality Edge Pruning, keeps the heaviest half-the-block-assignments edges
+    - "wnp": Weighted Node Pruning, keeps each entity's edges weighing at least its average edge weight
+    - "cnp": Cardinality Node Pruning, keeps the k heaviest edges of each entity
+
+    Edge-centric schemes ("wep", "cep") walk the whole blocking graph when fitted, so fitting them costs
+    about as much as deduplicating the training entities. The edges are kept as counts of edge profiles
+    (the numbers of shared and own blocks of the two entities, or the sizes of the shared blocks for
+    "arcs" with "cep"), from which the threshold is taken, so after an update only the edges of the
+    entities it touches are discarded and counted again (see `discard` and `add`). The "arcs" weights of
+    the edges of a block add up to 1, so "arcs" with "wep" only counts the edges and the blocks of at
+    least two entities. Node-centric schemes only count block assignments. The statistics are saved with
+    the model and restored with `load_stats`.
+
+    Usage:
+    resolver = EntityResolver(preprocessor, model_builder, matcher, blocker, meta_blocker=MetaBlocker())
+
+    :param weighting: The edge weighting scheme: "cbs", "jaccard", "ecbs" or "arcs"
+    :param pruning: The edge pruning scheme: "wep", "cep", "wnp" or "cnp"
+    :param k: The number of edges kept per entity by "cnp" (derived from the blocks if None)
+    """
+
+    WEIGHTING_SCHEMES = ("cbs", "jaccard", "ecbs", "arcs")
+    PRUNING_SCHEMES = ("wep", "cep", "wnp", "cnp")
+
+    def __init__(self, weighting: str = "jaccard", pruning: str = "wnp", k: Optional[int] = None):
+        if weighting not in self.WEIGHTING_SCHEMES:
+            raise ValueError(f"Unknown weighting scheme {weighting!r}, expected one of {self.WEIGHTING_SCHEMES}")
+        if pruning not in self.PRUNING_SCHEMES:
+            raise ValueError(f"Unknown pruning scheme {pruning!r}, expected one of {self.PRUNING_SCHEMES}")
+        self.weighting = weighting
+        self.pruning = pruning
+        self.k = k
+        self.num_blocks = 0
+        self.num_entities = 0
+        self.num_assignments = 0
+        self.num_compared_blocks = 0
+        self.edge_profiles: Counter = Counter()
+        self.cardinality = k or 1
+        self.threshold = -math.inf
+
+    @property
+    def node_centric(self) -> bool:
+        return self.pruning in ("wnp", "cnp")
+
+    @property
+    def uses_block_sizes(self) -> bool:
+        # Whether an edge's weight changes when the blocks it is found in change, even if its entities do not
+        return self.pruning == "cep" and self.weighting == "arcs"
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """The fitted statistics, to be saved with the model and restored with `load_stats`."""
+        return {
+            "weighting": self.weighting,
+            "pruning": self.pruning,
+            "num_blocks": self.num_blocks,
+            "num_entities": self.num_entities,
+            "num_assignments": self.num_assignments,
+            "num_compared_blocks": self.num_compared_blocks,
+            "edge_profiles": None if self.node_centric else dict(self.edge_profiles),
+        }
+
+    def load_stats(self, stats: Optional[Dict[str, Any]]) -> bool:
+        """
+        Restore the statistics fitted by a meta-blocker, if they hold what this meta-blocker needs.
+
+        :param stats: The statistics, as returned by `stats`
+        :return: Whether the statistics were restored; if not, the meta-blocker has to be fitted
+        """
+        if not stats:
+            return False
+        if not self.node_centric and (
+            stats["edge_profiles"] is None
+            or stats["weighting"] != self.weighting
+            or (self.weighting == "arcs" and stats["pruning"] != self.pruning)
+        ):
+            return False
+        self.num_blocks = stats["num_blocks"]
+        self.num_entities = stats["num_entities"]
+        self.num_assignments = stats["num_assignments"]
+        self.num_compared_blocks = stats["num_compared_blocks"]
+        self.edge_profiles = Counter(stats["edge_profiles"] or {})
+        self._update_thresholds()
+        return True
+
+    def fit(self, blocks: Mapping[Any, Set[Any]], entity_blocks: Mapping[Any, Set[Any]]):
+        """
+        Collect the block statistics used to weight and prune edges.
+
+        :param blocks: The blocks by block key, each a set of entity IDs
+        :param entity_blocks: The block keys of each entity
+        """
+        self.num_assignments = 0
+        self.num_compared_blocks = 0
+        self.edge_profiles = Counter()
+        self.add(entity_blocks, blocks, entity_blocks, blocks)
+
+    def discard(
+        self,
+        entity_ids: Iterable[Any],
+        blocks: Mapping[Any, Set[Any]],
+        entity_blocks: Mapping[Any, Set[Any]],
+        block_keys: Iterable[Any] = (),
+    ):
+        """
+        Take the block assignments of entities and their edges out of the statistics, before they change.
+
+        Every edge whose weight the change can alter has to have an entity among entity_ids: with "arcs"
+        and "cep" (see `uses_block_sizes`), or when blocks are purged, these include the other entities of
+        the blocks that change.
+
+        :param entity_ids: The IDs of the entities whose blocks are about to change
+        :param blocks: The blocks by block key, each a set of entity IDs
+        :param entity_blocks: The block keys of each entity
+        :param block_keys: The keys of the blocks that are about to change
+        """
+        self._count(entity_ids, block_keys, blocks, entity_blocks, -1)
+
+    def add(
+        self,
+        entity_ids: Iterable[Any],
+        blocks: Mapping[Any, Set[Any]],
+        entity_blocks: Mapping[Any, Set[Any]],
+        block_keys: Iterable[Any] = (),
+    ):
+        """
+        Count the block assignments of entities and their edges in the statistics, after they changed.
+
+        :param entity_ids: The IDs of the entities passed to `discard` before the change
+        :param blocks: The blocks by block key, each a set of entity IDs
+        :param entity_blocks: The block keys of each entity
+        :param block_keys: The keys of the blocks passed to `discard` before the change
+        """
+        self._count(entity_ids, block_keys, blocks, entity_blocks, 1)
+        self.num_blocks = len(blocks)
+        self.num_entities = len(entity_blocks)
+        self._update_thresholds()
+
+    def _count(
+        self,
+        entity_ids: Iterable[Any],
+        block_keys: Iterable[Any],
+        blocks: Mapping[Any, Set[Any]],
+        entity_blocks: Mapping[Any, Set[Any]],
+        sign: int,
+    ):
+        if self.weighting == "arcs" and self.pruning == "wep":
+            self.num_compared_blocks += sign * sum(1 for key in block_keys if len(blocks.get(key) or ()) > 1)
+
+        # Each edge with an entity among entity_ids is counted once, from the first of its entities in rank order
+        rank = {entity_id: i for i, entity_id in enumerate(entity_ids)}
+        for entity_id, entity_rank in rank.items():
+            block_keys = entity_blocks.get(entity_id)
+            if not block_keys:
+                continue
+            self.num_assignments += sign * len(block_keys)
+            if self.node_centric:
+                continue
+            profiles = self._edge_profiles(block_keys, blocks, entity_blocks, entity_id)
+            for candidate_id, profile in profiles.items():
+                if rank.get(candidate_id, math.inf) > entity_rank:
+                    self.edge_profiles[profile] += sign
+                    if not self.edge_profiles[profile]:
+                        del self.edge_profiles[profile]
+
+    def _edge_profiles(
+        self,
+        block_keys: Iterable[Any],
+        blocks: Mapping[Any, Set[Any]],
+        entity_blocks: Mapping[Any, Set[Any]],
+        exclude: Any,
+    ) -> Dict[Any, Tuple[int, ...]]:
+        # What the weight of each edge depends on besides the number of blocks, which changes with every update
+        if self.weighting == "arcs" and self.pruning == "wep":
+            # Only the number of edges is needed
+            candidates = dict.fromkeys(candidate_id for key in block_keys for candidate_id in blocks.get(key) or ())
+            candidates.pop(exclude, None)
+            return dict.fromkeys(candidates, ())
+        if self.weighting == "arcs":
+            block_sizes = defaultdict(list)
+            for key in block_keys:
+                block = blocks.get(key)
+                for candidate_id in block or ():
+                    block_sizes[candidate_id].append(len(block))
+            block_sizes.pop(exclude, None)
+            return {candidate_id: tuple(sorted(sizes)) for candidate_id, sizes in block_sizes.items()}
+
+        common_blocks = Counter()
+        num_entity_blocks = 0
+        for key in block_keys:
+            block = blocks.get(key)
+            if block:
+                num_entity_blocks += 1
+                common_blocks.update(block)
+        common_blocks.pop(exclude, None)
+        profiles = {}
+        for candidate_id, shared in common_blocks.items():
+            num_candidate_blocks = len(entity_blocks.get(candidate_id, ()))
+            profiles[candidate_id] = (
+                shared,
+                min(num_entity_blocks, num_candidate_blocks),
+                max(num_entity_blocks, num_candidate_blocks),
+            )
+        return profiles
+
+    def _profile_weight(self, profile: Tuple[int, ...]) -> float:
+        if self.weighting == "arcs":
+            return sum(1 / max(size * (size - 1) / 2, 1) for size in profile)
+        shared, num_blocks1, num_blocks2 = profile
+        if self.weighting == "cbs":
+            return shared
+        if self.weighting == "jaccard":
+            return shared / (num_blocks1 + num_blocks2 - shared)
+        num_blocks = max(self.num_blocks, 1)
+        return shared * math.log(num_blocks / max(num_blocks1, 1)) * math.log(num_blocks / max(num_blocks2, 1))
+
+    def _update_thresholds(self):
+        if self.k is None:
+            # Each entity keeps about as many edges as the average number of blocks it is placed in
+            self.cardinality = max(1, self.num_assignments // max(self.num_entities, 1) - 1)
+
+        self.threshold = -math.inf
+        if self.node_centric:
+            return
+
+        # Edge-centric thresholds are taken over every edge of the graph, from the counts of their profiles
+        weights = sorted(
+            ((self._profile_weight(profile), count) for profile, count in self.edge_profiles.items()), reverse=True
+        )
+        count = sum(count for _, count in weights)
+        max_edges = max(1, self.num_assignments // 2)
+        if self.pruning == "wep" and self.weighting == "arcs" and count:
+            self.threshold = self.num_compared_blocks / count
+        elif self.pruning == "wep" and count:
+            self.threshold = sum(weight * count for weight, count in weights) / count
+        elif self.pruning == "cep" and count >= max_edges:
+            kept = 0
+            for weight, count in weights:
+                kept += count
+                if kept >= max_edges:
+                    self.threshold = weight
+                    break
+
+    def edge_weights(
+        self,
+        block_keys: Iterable[Any],
+        blocks: Mapping[Any, Set[Any]],
+        entity_blocks: Mapping[Any, Set[Any]],
+        exclude: Any = None,
+    ) -> Dict[Any, float]:
+        """
+        Weight the edges between an entity and every entity sharing one of its blocks.
+
+        :param block_keys: The keys of the entity's blocks
+        :param blocks: The blocks by block key, each a set of entity IDs
+        :param entity_blocks: The block keys of each entity
+        :param exclude: An entity ID to leave out, typically the entity itself
+        :return: A dictionary mapping each neighbouring entity ID to the weight of its edge
+        """
+        common_blocks = Counter()
+        reciprocal_comparisons = defaultdict(float)
+        num_entity_blocks = 0
+        for key in block_keys:
+            block = blocks.get(key)
+            if not block:
+                continue
+            num_entity_blocks += 1
+            common_blocks.update(block)
+            if self.weighting == "arcs":
+                comparisons = max(len(block) * (len(block) - 1) / 2, 1)
+                for candidate_id in block:
+                    reciprocal_comparisons[candidate_id] += 1 / comparisons
+        common_blocks.pop(exclude, None)
+
+        if self.weighting == "cbs":
+            return dict(common_blocks)
+        if self.weighting == "arcs":
+            return {candidate_id: reciprocal_comparisons[candidate_id] for candidate_id in common_blocks}
+        if self.weighting == "jaccard":
+            return {
+                candidate_id: shared / (num_entity_blocks + len(entity_blocks.get(candidate_id, ())) - shared)
+                for candidate_id, shared in common_blocks.items()
+            }
+
+        entity_factor = math.log(max(self.num_blocks, 1) / max(num_entity_blocks, 1))
+        return {
+            candidate_id: shared
+            * entity_factor
+            * math.log(max(self.num_blocks, 1) / max(len(entity_blocks.get(candidate_id, ())), 1))
+            for candidate_id, shared in common_blocks.items()
+        }
+
+    def node_threshold(self, weights: Dict[Any, float]) -> float:
+        """
+        The minimum weight of the edges of an entity that are kept.
+
+        :param weights: The weights of the entity's edges, as returned by edge_weights
+        :return: The threshold of the entity for node-centric schemes, or the global threshold
+        """
+        if not self.node_centric or not weights:
+            return self.threshold
+        if self.pruning == "wnp":
+            return sum(weights.values()) / len(weights)
+        if len(weights) <= self.cardinality:
+            return -math.inf
+        return heapq.nlargest(self.cardinality, weights.values())[-1]
+
+    def retains(self, weight: float, threshold: float) -> bool:
+        # Averages can round just above equal weights, so a weight within rounding of the threshold is kept
+        return weight >= threshold or math.isclose(weight, threshold)
+
+    def prune(self, weights: Dict[Any, float]) -> List[Any]:
+        """
+        Prune an entity's edges, keeping the entities at the end of the retained edges.
+
+        :param weights: The weights of the entity's edges, as returned by edge_weights
+        :return: The retained entity IDs, heaviest edge first
+        """
+        if self.pruning == "cnp":
+            return heapq.nlargest(self.cardinality, weights, key=weights.__getitem__)
+
+        threshold = self.node_threshold(weights)
+        retained = [candidate_id for candidate_id, weight in weights.items() if self.retains(weight, threshold)]
+        return sorted(retained, key=weights.__getitem__, reverse=True)
@@ -51,6 +51,9 @@ class QGramBlocker(Blocker):
 
         return {k: list(v) for k, v in merged_blocks.items()}
 
+    def block_keys(self, entity: Entity) -> List[str]:
+        return list(dict.fromkeys(self._generate_q_grams(self.key_func(entity))))
+
     def _generate_q_grams(self, string: str) -> List[str]:
         string = " " * (self.q - 1) + string + " " * (self.q - 1)
         return [string[i : i + self.q] for i in range(len(string) - self.q + 1)]
@@ -44,3 +44,6 @@ class SimpleBlocker(Blocker):
                 blocks[key] = []
             blocks[key].append(entity)
         return blocks
+
+    def block_keys(self, entity: Entity) -> List[str]:
+        return [self.blocking_key(entity)]
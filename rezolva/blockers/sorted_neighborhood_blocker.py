@@ -54,6 +54,9 @@ class SortedNeighborhoodBlocker(Blocker):
 
         return blocks
 
+    def block_keys(self, entity: Entity) -> List[str]:
+        return [self.key_func(entity)]
+
 
 def default_key_func(entity: Entity) -> str:
     # Example key function: concatenate first characters of each attribute
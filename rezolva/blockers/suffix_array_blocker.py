@@ -44,6 +44,10 @@ class SuffixArrayBlocker(Blocker):
 
         return dict(blocks)
 
+    def block_keys(self, entity: Entity) -> List[str]:
+        key = self.key_func(entity)
+        return list(dict.fromkeys(key[j:] for j in range(len(key) - self.min_suffix_length + 1)))
+
     def _build_suffix_array(self, entities: List[Entity]) -> Dict[str, List[int]]:
         suffix_array = defaultdict(list)
         for i, entity in enumerate(entities):
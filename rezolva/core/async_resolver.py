@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from ..core.base import Entity
+from ..core.resolver import EntityResolver
+
+
+class AsyncEntityResolver:
+    """
+    An asyncio front end to an EntityResolver that micro-batches concurrent requests.
+
+    Online services typically resolve one entity per request. Calling EntityResolver.resolve for
+    each of them blocks the event loop and pays the per-call overhead of the pipeline every time.
+    AsyncEntityResolver instead collects the requests that arrive within a short window into a
+    single batch, resolves the batch on an executor and hands each caller its own result.
+
+    How micro-batching works:
+    1. The first request of a batch starts a timer of max_wait seconds
+    2. Requests arriving before the timer fires join the same batch
+    3. The batch is resolved when the timer fires or as soon as it holds max_batch_size entities
+    4. Each caller's future is resolved with the matches for its own entity
+
+    The window bounds the extra latency a request can pick up while waiting for its batch, and
+    larger batches amortize the cost of dispatching work off the event loop under load.
+
+    Usage:
+    async_resolver = AsyncEntityResolver(resolver, max_batch_size=64, max_wait=0.005)
+    matches = await async_resolver.resolve(entity, top_k=3)
+
+    :param resolver: A trained EntityResolver used to resolve each batch
+    :param max_batch_size: The maximum number of entities resolved in one batch
+    :param max_wait: The maximum time in seconds a request waits for its batch to fill up
+    :param executor: The executor that batches are resolved on (the event loop's default executor if None)
+    """
+
+    def __init__(
+        self,
+        resolver: EntityResolver,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        executor: Optional[Executor] = None,
+    ):
+        self.resolver = resolver
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self._pending: Dict[int, List[Tuple[Entity, asyncio.Future]]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    async def resolve(self, entity: Entity, top_k: int = 1) -> List[Tuple[Entity, float]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # Requests are batched per top_k so that every batch goes through a single resolve call
+        pending = self._pending.setdefault(top_k, [])
+        pending.append((entity, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(top_k)
+        elif len(pending) == 1:
+            self._timers[top_k] = loop.call_later(self.max_wait, self._flush, top_k)
+
+        return await future
+
+    async def resolve_many(
+        self, entities: List[Entity], top_k: int = 1
+    ) -> List[Tuple[Entity, List[Tuple[Entity, float]]]]:
+        matches = await asyncio.gather(*(self.resolve(entity, top_k) for entity in entities))
+        return list(zip(entities, matches))
+
+    def _flush(self, top_k: int):
+        timer = self._timers.pop(top_k, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(top_k, [])
+        if batch:
+            task = asyncio.ensure_future(self._resolve_batch(batch, top_k))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve_batch(self, batch: List[Tuple[Entity, asyncio.Future]], top_k: int):
+        loop = asyncio.get_running_loop()
+        entities = [entity for entity, _ in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, self.resolver.resolve, entities, top_k)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), (_, matches) in zip(batch, results):
+            if not future.done():
+                future.set_result(matches)
@@ -9,14 +9,26 @@ class Entity:
     An entity is a fundamental unit in entity resolution, typically representing a real-world object
     or concept. It contains an identifier and a set of attributes that describe its characteristics.
 
+    Entities define `__slots__`, so they carry no per-instance `__dict__` on top of their attributes.
+
     :param id: A unique identifier for the entity
     :param attributes: A dictionary of attribute names and their corresponding values
     """
 
+    __slots__ = ("id", "attributes")
+
     def __init__(self, id: str, attributes: Dict[str, Any]):
         self.id = id
         self.attributes = attributes
 
+    def __setstate__(self, state: Any):
+        # Entities pickled before __slots__ have a plain dictionary state, slotted ones a (dict, slots) pair
+        if isinstance(state, tuple):
+            dict_state, slots_state = state
+            state = dict(dict_state or {}, **(slots_state or {}))
+        for name, value in state.items():
+            setattr(self, name, value)
+
 
 class Preprocessor(ABC):
     """
@@ -78,14 +90,18 @@ class Matcher(ABC):
     the likelihood that they refer to the same real-world entity. Different matching
     algorithms can be implemented by subclassing this class.
 
-    Subclasses should implement the `match` method to define specific matching logic.
+    Subclasses should implement the `match` method to define specific matching logic. When given
+    `top_k`, `match` only needs to return the k best matches, which lets matchers avoid sorting
+    (and, where possible, scoring) candidates that cannot make the cut.
     """
 
     def __init__(self, clustering_algorithm: Optional[ClusteringAlgorithm] = None):
         self.clustering_algorithm = clustering_algorithm
 
     @abstractmethod
-    def match(self, entity: Entity, candidates: List[Entity]) -> List[Tuple[Entity, float]]:
+    def match(
+        self, entity: Entity, candidates: List[Entity], top_k: Optional[int] = None
+    ) -> List[Tuple[Entity, float]]:
         pass
 
     def apply_clustering(self, matches: List[Tuple[Entity, float]]) -> List[List[Tuple[Entity, float]]]:
@@ -104,12 +120,17 @@ class Blocker(ABC):
     block are compared, significantly reducing the computational cost of entity resolution.
 
     Subclasses should implement the `create_blocks` method to define specific blocking logic.
+    Subclasses that can compute the block keys of a single entity on their own should also
+    override `block_keys`, which lets the resolver look up a query's blocks without re-blocking.
     """
 
     @abstractmethod
     def create_blocks(self, entities: List[Entity]) -> Dict[Any, List[Entity]]:
         pass
 
+    def block_keys(self, entity: Entity) -> List[Any]:
+        return list(self.create_blocks([entity]).keys())
+
 
 class DataLoader(ABC):
     """
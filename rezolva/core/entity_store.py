@@ -0,0 +1,145 @@
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List
+
+from ..core.base import Entity
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "_MISSING"
+
+    def __repr__(self):
+        return "<missing>"
+
+
+# Marks a cell of a column whose entity does not have that attribute
+_MISSING = _Missing()
+
+
+class EntityStore(MutableMapping):
+    """
+    A compact, columnar store of entities keyed by entity ID.
+
+    Holding millions of Entity objects costs an object and an attribute dictionary per entity, which
+    dominates memory at scale. EntityStore keeps one value list per attribute instead, with attribute
+    names interned once for the whole store and each entity addressed by an integer row ID. Repeated
+    string values can also be interned so that identical values share a single object.
+
+    EntityStore is a mutable mapping from entity ID to Entity, so it can be used anywhere a dictionary
+    of entities is expected (e.g. as EntityResolver.preprocessed_entities or a model's "entities").
+    Entities are materialized on access; `get_value` reads a single attribute without materializing.
+
+    How EntityStore works:
+    1. Each new attribute name gets its own column, backfilled for the rows stored before it
+    2. Each new entity gets a row ID, reusing the rows of deleted entities first
+    3. An entity's attribute values are written to its row in every column
+    4. Reading an entity back collects its row from every column it has a value in
+
+    Usage:
+    store = EntityStore()
+    store[entity.id] = entity
+    entity = store[entity.id]
+
+    :param intern_values: Whether to intern string attribute values so repeated values share memory
+    """
+
+    def __init__(self, intern_values: bool = True):
+        self.intern_values = intern_values
+        self._ids: List[Any] = []
+        self._rows: Dict[Any, int] = {}
+        self._free_rows: List[int] = []
+        self._columns: Dict[str, List[Any]] = {}
+
+    def add(self, entity: Entity) -> int:
+        self[entity.id] = entity
+        return self._rows[entity.id]
+
+    def row(self, entity_id: Any) -> int:
+        return self._rows[entity_id]
+
+    def entity_at(self, row: int) -> Entity:
+        entity_id = self._ids[row]
+        if entity_id is _MISSING:
+            raise KeyError(row)
+        return self._materialize(entity_id, row)
+
+    def get_value(self, entity_id: Any, attribute: str, default: Any = None) -> Any:
+        column = self._columns.get(attribute)
+        if column is None:
+            return default
+        value = column[self._rows[entity_id]]
+        return default if value is _MISSING else value
+
+    @property
+    def attribute_names(self) -> List[str]:
+        return list(self._columns)
+
+    def __setitem__(self, entity_id: Any, entity: Entity):
+        row = self._rows.get(entity_id)
+        if row is None:
+            row = self._allocate_row(entity_id)
+        else:
+            for column in self._columns.values():
+                column[row] = _MISSING
+
+        for name, value in entity.attributes.items():
+            column = self._columns.get(name)
+            if column is None:
+                column = self._add_column(name)
+            if self.intern_values and type(value) is str:
+                value = sys.intern(value)
+            column[row] = value
+
+    def __getitem__(self, entity_id: Any) -> Entity:
+        return self._materialize(entity_id, self._rows[entity_id])
+
+    def __delitem__(self, entity_id: Any):
+        row = self._rows.pop(entity_id)
+        self._ids[row] = _MISSING
+        for column in self._columns.values():
+            column[row] = _MISSING
+        self._free_rows.append(row)
+
+    def __contains__(self, entity_id: Any) -> bool:
+        return entity_id in self._rows
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def clear(self):
+        self._ids = []
+        self._rows = {}
+        self._free_rows = []
+        self._columns = {}
+
+    def _allocate_row(self, entity_id: Any) -> int:
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._ids[row] = entity_id
+        else:
+            row = len(self._ids)
+            self._ids.append(entity_id)
+            for column in self._columns.values():
+                column.append(_MISSING)
+        self._rows[entity_id] = row
+        return row
+
+    def _add_column(self, name: str) -> List[Any]:
+        name = sys.intern(name) if type(name) is str else name
+        column = [_MISSING] * len(self._ids)
+        self._columns[name] = column
+        return column
+
+    def _materialize(self, entity_id: Any, row: int) -> Entity:
+        attributes = {}
+        for name, column in self._columns.items():
+            value = column[row]
+            if value is not _MISSING:
+                attributes[name] = value
+        return Entity(entity_id, attributes)
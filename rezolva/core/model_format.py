@@ -0,0 +1,613 @@
+import ast
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..core.base import Entity
+
+MAGIC = b"RZLVMDL\x00"
+FORMAT_VERSION = 1
+
+# Magic, format version and the length of the JSON header that follows
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGNMENT = 8
+
+SHARD_SIZE = 1 << 16
+
+
+def _encode_key(key: Any) -> bytes:
+    # Entity IDs, block keys and terms are stored in a deterministic encoding so they can be
+    # looked up by their bytes; strings and integers are tagged for fast decoding
+    if type(key) is str:
+        return b"s" + key.encode("utf-8")
+    if type(key) is int:
+        return b"i" + str(key).encode("ascii")
+    return b"r" + repr(key).encode("utf-8")
+
+
+def _decode_key(data: bytes) -> Any:
+    tag, body = data[:1], data[1:]
+    if tag == b"s":
+        return body.decode("utf-8")
+    if tag == b"i":
+        return int(body)
+    return ast.literal_eval(body.decode("utf-8"))
+
+
+def _check_key(key: Any, encoded: bytes):
+    if encoded[:1] == b"r":
+        try:
+            decoded = ast.literal_eval(encoded[1:].decode("utf-8"))
+        except (ValueError, SyntaxError):
+            decoded = None
+        if decoded != key:
+            raise TypeError(f"Cannot store key {key!r}: keys must be built from Python literals")
+
+
+def _hash_key(encoded: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+
+def is_model_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _SectionWriter:
+    def __init__(self):
+        self.sections: List[Tuple[str, str, bytes]] = []
+
+    def add_array(self, name: str, values: array):
+        self.sections.append((name, values.typecode, values.tobytes()))
+
+    def add_bytes(self, name: str, data: bytes):
+        self.sections.append((name, "B", bytes(data)))
+
+    def add_blob(self, name: str, records: List[bytes]):
+        # Records are concatenated into one blob, with the start of each record (and the end of the
+        # last one) in a separate offsets array
+        offsets = array("Q", [0])
+        position = 0
+        for record in records:
+            position += len(record)
+            offsets.append(position)
+        self.add_array(f"{name}.offsets", offsets)
+        self.add_bytes(f"{name}.data", b"".join(records))
+
+    def add_key_table(self, name: str, keys: List[Any]):
+        encoded = []
+        for key in keys:
+            data = _encode_key(key)
+            _check_key(key, data)
+            encoded.append(data)
+        self.add_blob(name, encoded)
+
+        # Rows sorted by key hash, so a key is found by binary search without building a dictionary
+        hashes = [_hash_key(data) for data in encoded]
+        order = sorted(range(len(encoded)), key=hashes.__getitem__)
+        self.add_array(f"{name}.hashes", array("Q", [hashes[row] for row in order]))
+        self.add_array(f"{name}.order", array("I", order))
+
+    def write(self, path: str, header: Dict[str, Any]):
+        # Section offsets are relative to the start of the data, which follows the padded header
+        table = {}
+        position = 0
+        for name, typecode, data in self.sections:
+            table[name] = [position, len(data), typecode]
+            position += len(data) + (-len(data) % _ALIGNMENT)
+        header = dict(header, sections=table, byteorder=sys.byteorder)
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_bytes += b" " * (-(_PREAMBLE.size + len(header_bytes)) % _ALIGNMENT)
+
+        # Write to a temporary file and rename it, so processes that map the old file keep valid pages
+        temp_path = f"{path}.tmp{os.getpid()}"
+        with open(temp_path, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for _, _, data in self.sections:
+                f.write(data)
+                f.write(b"\x00" * (-len(data) % _ALIGNMENT))
+        os.replace(temp_path, path)
+
+
+class _ModelFile(ABC):
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            preamble = f.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size or not preamble.startswith(MAGIC):
+                raise ValueError(f"{path} is not a rezolva model file")
+            _, version, header_length = _PREAMBLE.unpack(preamble)
+            if version > FORMAT_VERSION:
+                raise ValueError(
+                    f"{path} uses model format version {version}, newer than the supported {FORMAT_VERSION}"
+                )
+            self.header = json.loads(f.read(header_length))
+        self.data_start = _PREAMBLE.size + header_length
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {self.header['byteorder']}-endian machine")
+        self.stats = None
+
+    def __enter__(self) -> "_ModelFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @abstractmethod
+    def section(self, name: str, resident: bool = False):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+
+class _MappedFile(_ModelFile):
+    def __init__(self, path: str):
+        super().__init__(path)
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        self.sections: List[memoryview] = []
+
+    def section(self, name: str, resident: bool = False) -> memoryview:
+        offset, length, typecode = self.header["sections"][name]
+        offset += self.data_start
+        section = self.view[offset : offset + length].cast(typecode)
+        self.sections.append(section)
+        return section
+
+    def close(self):
+        # The map can only be closed once no view of it is left, so the views handed out are released first
+        for section in self.sections:
+            section.release()
+        self.sections = []
+        self.view.release()
+        self.mmap.close()
+
+
+class _ShardedFile(_ModelFile):
+    """
+    A model file read in fixed-size shards on demand, keeping a bounded number of them in memory.
+
+    Shards are evicted in least recently used order, so the memory used by the file stays bounded
+    by max_shards * shard_size however large the file is. Sections read as resident are loaded in
+    full up front instead.
+    """
+
+    def __init__(self, path: str, shard_size: int, max_shards: int):
+        super().__init__(path)
+        self.file = open(path, "rb")
+        self.shard_size = shard_size
+        self.max_shards = max_shards
+        self.shards: "OrderedDict[int, bytes]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def section(self, name: str, resident: bool = False):
+        offset, length, typecode = self.header["sections"][name]
+        offset += self.data_start
+        if resident:
+            return memoryview(self._pread(length, offset)).cast(typecode)
+        return _ShardedSection(self, offset, length, typecode)
+
+    def close(self):
+        with self.lock:
+            self.shards.clear()
+        self.file.close()
+
+    def read(self, start: int, end: int) -> bytes:
+        if start >= end:
+            return b""
+        first, last = start // self.shard_size, (end - 1) // self.shard_size
+        if first == last:
+            base = first * self.shard_size
+            return self._shard(first)[start - base : end - base]
+        parts = []
+        for index in range(first, last + 1):
+            base = index * self.shard_size
+            parts.append(self._shard(index)[max(start - base, 0) : end - base])
+        return b"".join(parts)
+
+    def _shard(self, index: int) -> bytes:
+        with self.lock:
+            shard = self.shards.get(index)
+            if shard is not None:
+                self.shards.move_to_end(index)
+                self.stats["hits"] += 1
+                return shard
+
+            self.stats["misses"] += 1
+            shard = self._pread(self.shard_size, index * self.shard_size)
+            self.shards[index] = shard
+            if len(self.shards) > self.max_shards:
+                self.shards.popitem(last=False)
+                self.stats["evictions"] += 1
+            return shard
+
+    def _pread(self, length: int, offset: int) -> bytes:
+        # Positional reads keep file offsets independent between threads and forked worker processes
+        if hasattr(os, "pread"):
+            return os.pread(self.file.fileno(), length, offset)
+        with self.lock:
+            self.file.seek(offset)
+            return self.file.read(length)
+
+
+class _ShardedSection:
+    # A typed array over part of a sharded file, supporting len, indexing and contiguous slicing
+    def __init__(self, file: _ShardedFile, offset: int, length: int, typecode: str):
+        self.file = file
+        self.offset = offset
+        self.itemsize = array(typecode).itemsize
+        self.length = length // self.itemsize
+        self.typecode = typecode
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(self.length)
+            stop = max(start, stop)
+            data = self.file.read(self.offset + start * self.itemsize, self.offset + stop * self.itemsize)
+            return memoryview(data).cast(self.typecode)
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        start = self.offset + index * self.itemsize
+        return memoryview(self.file.read(start, start + self.itemsize)).cast(self.typecode)[0]
+
+
+class _Blob:
+    def __init__(self, file: _ModelFile, name: str, resident: bool = False):
+        self.offsets = file.section(f"{name}.offsets", resident)
+        self.data = file.section(f"{name}.data")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> bytes:
+        return self.data[self.offsets[row] : self.offsets[row + 1]].tobytes()
+
+
+class _KeyTable:
+    def __init__(self, file: _ModelFile, name: str, resident: bool = False):
+        self.keys = _Blob(file, name, resident)
+        self.hashes = file.section(f"{name}.hashes", resident)
+        self.order = file.section(f"{name}.order", resident)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def key_at(self, row: int) -> Any:
+        return _decode_key(self.keys[row])
+
+    def find(self, key: Any) -> Optional[int]:
+        encoded = _encode_key(key)
+        key_hash = _hash_key(encoded)
+        index = bisect_left(self.hashes, key_hash)
+        while index < len(self.hashes) and self.hashes[index] == key_hash:
+            row = self.order[index]
+            if self.keys[row] == encoded:
+                return row
+            index += 1
+        return None
+
+
+class _MappedMapping(MutableMapping):
+    """
+    A mutable mapping backed by a read-only table of a memory-mapped model file.
+
+    Values are decoded from the file on every access. Writes go to an in-memory overlay and
+    deletions are recorded as masked keys, so the file itself is never modified.
+    """
+
+    def __init__(self, file: _ModelFile, table: _KeyTable):
+        self._file = file
+        self._table = table
+        self._overlay: Dict[Any, Any] = {}
+        self._masked = set()
+
+    @property
+    def shard_stats(self) -> Optional[Dict[str, int]]:
+        # Hits, misses and evictions of the resident shards when the file is loaded lazily
+        return self._file.stats
+
+    def _has_row(self, row: int) -> bool:
+        return True
+
+    @abstractmethod
+    def _decode(self, key: Any, row: int) -> Any:
+        pass
+
+    def _find(self, key: Any) -> Optional[int]:
+        if key in self._masked:
+            return None
+        row = self._table.find(key)
+        return row if row is not None and self._has_row(row) else None
+
+    def _base_length(self) -> int:
+        return len(self._table)
+
+    def __getitem__(self, key: Any) -> Any:
+        if key in self._overlay:
+            return self._overlay[key]
+        row = self._find(key)
+        if row is None:
+            raise KeyError(key)
+        return self._decode(key, row)
+
+    def __setitem__(self, key: Any, value: Any):
+        if key not in self._overlay and self._find(key) is not None:
+            self._masked.add(key)
+        self._overlay[key] = value
+
+    def __delitem__(self, key: Any):
+        if key in self._overlay:
+            del self._overlay[key]
+        elif self._find(key) is not None:
+            self._masked.add(key)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._overlay or self._find(key) is not None
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in range(len(self._table)):
+            if self._has_row(row):
+                key = self._table.key_at(row)
+                if key not in self._masked:
+                    yield key
+        yield from self._overlay
+
+    def __len__(self) -> int:
+        return self._base_length() - len(self._masked) + len(self._overlay)
+
+
+class MappedEntities(_MappedMapping):
+    """Entities of a model file by entity ID, with attributes decoded from the file on access."""
+
+    def __init__(self, file: _ModelFile):
+        super().__init__(file, _KeyTable(file, "entity_ids"))
+        self._attributes = _Blob(file, "entity_attributes")
+
+    def _decode(self, key: Any, row: int) -> Entity:
+        return Entity(key, pickle.loads(self._attributes[row]))
+
+
+class MappedBlocks(_MappedMapping):
+    """Blocks of a model file by block key, each a set of entity IDs decoded from its postings on access."""
+
+    def __init__(self, file: _ModelFile, entity_ids: _KeyTable):
+        # The block directory is kept in memory, so looking up a block only reads its key and postings
+        super().__init__(file, _KeyTable(file, "block_keys", resident=True))
+        self._entity_ids = entity_ids
+        self._offsets = file.section("block_postings.offsets", resident=True)
+        self._rows = file.section("block_postings.rows")
+
+    def _decode(self, key: Any, row: int) -> set:
+        rows = self._rows[self._offsets[row] : self._offsets[row + 1]]
+        return {self._entity_ids.key_at(entity_row) for entity_row in rows}
+
+
+class MappedEntityBlocks(_MappedMapping):
+    """The entity -> block keys reverse index of a model file, decoded on access."""
+
+    def __init__(self, file: _ModelFile, entity_ids: _KeyTable, block_keys: _KeyTable):
+        super().__init__(file, entity_ids)
+        self._block_keys = block_keys
+        self._offsets = file.section("entity_blocks.offsets")
+        self._rows = file.section("entity_blocks.rows")
+        self._length = file.header["num_indexed_entities"]
+
+    def _has_row(self, row: int) -> bool:
+        return self._offsets[row + 1] > self._offsets[row]
+
+    def _base_length(self) -> int:
+        return self._length
+
+    def _decode(self, key: Any, row: int) -> set:
+        rows = self._rows[self._offsets[row] : self._offsets[row + 1]]
+        return {self._block_keys.key_at(block_row) for block_row in rows}
+
+
+class MappedVectors(_MappedMapping):
+    """Sparse entity vectors of a model file by entity ID, each decoded into a term -> weight dictionary."""
+
+    def __init__(self, file: _ModelFile, entity_ids: _KeyTable):
+        super().__init__(file, entity_ids)
+        self._terms = _Blob(file, "vector_terms")
+        self._present = file.section("vectors.present")
+        self._offsets = file.section("vectors.offsets")
+        self._term_rows = file.section("vectors.terms")
+        self._weights = file.section("vectors.weights")
+        self._length = file.header["num_vectors"]
+
+    def _has_row(self, row: int) -> bool:
+        return bool(self._present[row])
+
+    def _base_length(self) -> int:
+        return self._length
+
+    def _decode(self, key: Any, row: int) -> Dict[str, float]:
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return {
+            _decode_key(self._terms[term_row]): weight
+            for term_row, weight in zip(self._term_rows[start:end], self._weights[start:end])
+        }
+
+
+def _columnar_vectors(model: Any, entity_rows: Dict[Any, int]) -> bool:
+    # Only term -> weight vectors of known entities are stored as flat arrays
+    if not isinstance(model, dict) or not isinstance(model.get("vectors"), dict):
+        return False
+    for entity_id, vector in model["vectors"].items():
+        if entity_id not in entity_rows or not isinstance(vector, dict):
+            return False
+        if not all(type(term) is str and isinstance(weight, (int, float)) for term, weight in vector.items()):
+            return False
+    return True
+
+
+def write_model(
+    path: str,
+    model: Any,
+    preprocessed_entities: Dict[Any, Entity],
+    blocks: Dict[Any, set],
+    entity_blocks: Dict[Any, set],
+    meta_blocker_stats: Optional[Dict[str, Any]] = None,
+):
+    """
+    Write a trained model to a memory-mappable model file.
+
+    The file starts with a magic number, a format version and a JSON header listing its sections.
+    Every section is a flat array or an offset-indexed blob aligned to 8 bytes:
+    - Entity IDs, block keys and vector terms are key tables: the encoded keys in an offset-indexed
+      blob, plus the key hashes in sorted order so a key is found by binary search
+    - Entity attributes are an offset-indexed blob with one serialized record per entity
+    - Block postings and the entity -> block reverse index hold entity and block row numbers
+    - Term -> weight model vectors hold term row numbers and weights, one range per entity
+    - The rest of the model is serialized in a single section, without the shared entities
+    - The statistics fitted by a meta-blocker, if any, are serialized in their own section
+
+    :param path: The path of the model file
+    :param model: The model built by the model builder
+    :param preprocessed_entities: The preprocessed entities by entity ID
+    :param blocks: The blocks by block key, each a set of entity IDs
+    :param entity_blocks: The block keys of each entity
+    :param meta_blocker_stats: The statistics of the meta-blocker fitted on the blocks
+    """
+    writer = _SectionWriter()
+    entity_ids = list(preprocessed_entities)
+    entity_rows = {entity_id: row for row, entity_id in enumerate(entity_ids)}
+    writer.add_key_table("entity_ids", entity_ids)
+    writer.add_blob(
+        "entity_attributes",
+        [pickle.dumps(preprocessed_entities[entity_id].attributes, protocol=4) for entity_id in entity_ids],
+    )
+
+    block_keys = list(blocks)
+    block_rows = {key: row for row, key in enumerate(block_keys)}
+    writer.add_key_table("block_keys", block_keys)
+    offsets, rows = array("Q", [0]), array("I")
+    for key in block_keys:
+        rows.extend(entity_rows[entity_id] for entity_id in blocks[key])
+        offsets.append(len(rows))
+    writer.add_array("block_postings.offsets", offsets)
+    writer.add_array("block_postings.rows", rows)
+
+    offsets, rows = array("Q", [0]), array("I")
+    for entity_id in entity_ids:
+        rows.extend(block_rows[key] for key in entity_blocks.get(entity_id, ()))
+        offsets.append(len(rows))
+    writer.add_array("entity_blocks.offsets", offsets)
+    writer.add_array("entity_blocks.rows", rows)
+
+    header = {
+        "num_entities": len(entity_ids),
+        "num_blocks": len(block_keys),
+        "num_indexed_entities": sum(1 for entity_id in entity_ids if entity_blocks.get(entity_id)),
+        "shared_entities": False,
+        "columnar_vectors": False,
+        "meta_blocker_stats": meta_blocker_stats is not None,
+    }
+
+    rest = model
+    if isinstance(model, dict):
+        rest = dict(model)
+        # The sparse matrix of a vector model duplicates its vectors, and is rebuilt from them when needed
+        rest.pop("matrix", None)
+        entities = model.get("entities")
+        if entities is not None and entities.keys() == preprocessed_entities.keys():
+            # The model's entities are the preprocessed entities, so they are stored once and shared
+            del rest["entities"]
+            header["shared_entities"] = True
+
+        if _columnar_vectors(model, entity_rows):
+            vectors = rest.pop("vectors")
+            terms = sorted({term for vector in vectors.values() for term in vector})
+            term_rows = {term: row for row, term in enumerate(terms)}
+            writer.add_blob("vector_terms", [_encode_key(term) for term in terms])
+
+            present = array("B", bytes(len(entity_ids)))
+            offsets, vector_terms, weights = array("Q", [0]), array("I"), array("d")
+            for row, entity_id in enumerate(entity_ids):
+                vector = vectors.get(entity_id)
+                if vector is not None:
+                    present[row] = 1
+                    vector_terms.extend(term_rows[term] for term in vector)
+                    weights.extend(vector.values())
+                offsets.append(len(weights))
+            writer.add_array("vectors.present", present)
+            writer.add_array("vectors.offsets", offsets)
+            writer.add_array("vectors.terms", vector_terms)
+            writer.add_array("vectors.weights", weights)
+            header["columnar_vectors"] = True
+            header["num_vectors"] = len(vectors)
+
+    writer.add_bytes("model", pickle.dumps(rest, protocol=4))
+    if meta_blocker_stats is not None:
+        writer.add_bytes("meta_blocker_stats", pickle.dumps(meta_blocker_stats, protocol=4))
+    writer.write(path, header)
+
+
+def read_model(
+    path: str, lazy: bool = False, max_shards: int = 1024, shard_size: int = SHARD_SIZE
+) -> Dict[str, Any]:
+    """
+    Read a model file written by write_model.
+
+    Only the header and the remainder of the model are decoded up front. Entities, blocks, the
+    reverse index and model vectors are returned as mappings that decode each value from the file
+    on access, so loading takes constant time in the number of entities.
+
+    By default the file is memory-mapped, and processes that read the same file share its pages
+    through the operating system's page cache. With lazy=True the block directory (block keys,
+    their hashes and postings offsets) is read into memory, and everything else is read in shards
+    of shard_size bytes on first access, keeping at most max_shards of them resident in LRU order.
+    This bounds the memory used for a model larger than the available RAM.
+
+    :param path: The path of the model file
+    :param lazy: Whether to read the file in shards on demand instead of memory-mapping it
+    :param max_shards: The maximum number of shards kept in memory when lazy
+    :param shard_size: The size of a shard in bytes when lazy
+    :return: A dictionary with the "model", "preprocessed_entities", "blocks", "entity_blocks",
+        "meta_blocker_stats" (None if none were saved) and the open "file", whose close method releases
+        the map or file handle once the model is no longer used
+    """
+    file = _ShardedFile(path, shard_size, max_shards) if lazy else _MappedFile(path)
+    preprocessed_entities = MappedEntities(file)
+    blocks = MappedBlocks(file, preprocessed_entities._table)
+    entity_blocks = MappedEntityBlocks(file, preprocessed_entities._table, blocks._table)
+
+    model = pickle.loads(file.section("model", resident=True))
+    if file.header["shared_entities"]:
+        model["entities"] = preprocessed_entities
+    if file.header["columnar_vectors"]:
+        model["vectors"] = MappedVectors(file, preprocessed_entities._table)
+    meta_blocker_stats = None
+    if file.header.get("meta_blocker_stats"):
+        meta_blocker_stats = pickle.loads(file.section("meta_blocker_stats", resident=True))
+
+    return {
+        "model": model,
+        "preprocessed_entities": preprocessed_entities,
+        "blocks": blocks,
+        "entity_blocks": entity_blocks,
+        "meta_blocker_stats": meta_blocker_stats,
+        "file": file,
+    }
@@ -1,9 +1,29 @@
+import inspect
 import itertools
-from collections import defaultdict
-from typing import Any, Dict, List, Optional, Tuple
+import os
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from ..blockers.block_cleaner import BlockCleaner
+from ..blockers.meta_blocker import MetaBlocker
 from ..core.base import (Blocker, DataLoader, DataSaver, Entity, Matcher,
                          ModelBuilder, Preprocessor)
+from ..core.entity_store import EntityStore
+from ..core.model_format import is_model_file, read_model, write_model
+
+# The trained resolver held by each iter_resolve/bulk_resolve worker process, set once when the worker starts
+_worker_resolver = None
+
+
+def _init_worker(resolver: "EntityResolver"):
+    global _worker_resolver
+    _worker_resolver = resolver
+
+
+def _resolve_batch(batch: List[Entity], top_k: int) -> List[List[Tuple[Entity, float]]]:
+    # Only the matches are sent back, the parent process pairs them with its own input entities
+    return [matches for _, matches in _worker_resolver.resolve(batch, top_k)]
 
 
 class EntityResolver:
@@ -18,57 +38,94 @@ class EntityResolver:
     How EntityResolver works:
     1. Preprocess input entities using the specified preprocessor
     2. Build or update the resolution model using the model builder
-    3. Create blocks of potentially matching entities using the blocker
-    4. Compare entities within each block using the matcher
-    5. Return the matched entities above a specified threshold
+    3. Create blocks of potentially matching entities using the blocker, keeping a reverse
+       index from each entity to the keys of the blocks it belongs to
+    4. Look up every block of each query entity by its block keys and take the union of their
+       entities as candidates, optionally keeping only those sharing the most blocks with the query
+       or pruning them with a meta-blocking stage (oversized blocks can be purged and each entity
+       kept in its smallest blocks only by a block-cleaning stage)
+    5. Compare each query entity with each of its candidates once using the matcher
+    6. Return the matched entities above a specified threshold
 
     :param preprocessor: An instance of a Preprocessor subclass
     :param model_builder: An instance of a ModelBuilder subclass
     :param matcher: An instance of a Matcher subclass
     :param blocker: An instance of a Blocker subclass
+    :param max_candidates: The maximum number of candidates compared per query entity, ranked by the
+        number of blocks they share with it (all candidates are compared if None)
+    :param entity_store: An EntityStore to hold the preprocessed entities in columnar form instead of a
+        dictionary of Entity objects; it also replaces the "entities" of dictionary-based models
+    :param meta_blocker: A MetaBlocker that prunes the candidates of each entity before matching
+    :param block_cleaner: A BlockCleaner that purges oversized blocks and filters each entity's blocks
     """
 
-    def __init__(self, preprocessor: Preprocessor, model_builder: ModelBuilder, matcher: Matcher, blocker: Blocker):
+    def __init__(
+        self,
+        preprocessor: Preprocessor,
+        model_builder: ModelBuilder,
+        matcher: Matcher,
+        blocker: Blocker,
+        max_candidates: Optional[int] = None,
+        entity_store: Optional[EntityStore] = None,
+        meta_blocker: Optional[MetaBlocker] = None,
+        block_cleaner: Optional[BlockCleaner] = None,
+    ):
         self.preprocessor = preprocessor
         self.model_builder = model_builder
         self.matcher = matcher
         self.blocker = blocker
+        self.max_candidates = max_candidates
+        self.entity_store = entity_store
+        self.meta_blocker = meta_blocker
+        self.block_cleaner = block_cleaner
         self.model = None
         self.preprocessed_entities = {}
         self.blocks = {}
+        self.entity_blocks = {}
+        self._top_k_matcher = None
+        self._accepts_top_k = False
+        self._model_file = None
 
     def train(self, entities: List[Entity]):
-        self.preprocessed_entities = {e.id: self.preprocessor.preprocess(e) for e in entities}
-        self.model = self.model_builder.train(list(self.preprocessed_entities.values()))
-        self.blocks = self.blocker.create_blocks(list(self.preprocessed_entities.values()))
+        preprocessed_entities = {e.id: self.preprocessor.preprocess(e) for e in entities}
+        preprocessed_list = list(preprocessed_entities.values())
+        self.model = self.model_builder.train(preprocessed_list)
 
-        for block, entities in self.blocks.items():
-            self.blocks[block] = {e.id for e in entities}  # Store entity IDs instead of Entity objects
+        self.blocks = {}
+        self.entity_blocks = {}
+        self._index_blocks(self.blocker.create_blocks(preprocessed_list))
+        if self.block_cleaner is not None:
+            self.block_cleaner.clean(self.blocks, self.entity_blocks)
 
         # Train the matcher if it has a train method
         if hasattr(self.matcher, "train") and callable(getattr(self.matcher, "train")):
-            self.matcher.train(list(self.preprocessed_entities.values()))
+            self.matcher.train(preprocessed_list)
+
+        if self.entity_store is not None:
+            self.entity_store.clear()
+            self.entity_store.update(preprocessed_entities)
+            preprocessed_entities = self.entity_store
+        self.preprocessed_entities = preprocessed_entities
+        self._share_entity_store()
+        self._fit_meta_blocker()
 
     def resolve(self, entities: List[Entity], top_k: int = 1) -> List[Tuple[Entity, List[Tuple[Entity, float]]]]:
         if not self.model:
             raise ValueError("Model not trained. Call train() first.")
 
-        new_preprocessed = {e.id: self.preprocessor.preprocess(e) for e in entities}
-        new_blocks = self.blocker.create_blocks(list(new_preprocessed.values()))
+        # Entities are paired with their preprocessed copies by position, as a batch (e.g. of concurrent
+        # requests) can hold different entities with the same ID
+        new_preprocessed = [self.preprocessor.preprocess(e) for e in entities]
 
         results = []
-        for entity in entities:
-            preprocessed_entity = new_preprocessed[entity.id]
-            entity_block = next(
-                (block for block, block_entities in new_blocks.items() if preprocessed_entity in block_entities), None
-            )
+        for entity, preprocessed_entity in zip(entities, new_preprocessed):
+            candidates = self._generate_candidates(preprocessed_entity)
 
-            if entity_block is None:
+            if not candidates:
                 results.append((entity, []))
                 continue
 
-            candidates = self.blocks.get(entity_block, set())
-            matches = self._find_matches(preprocessed_entity, candidates)
+            matches = self._find_matches(preprocessed_entity, candidates, top_k)
 
             if hasattr(self.matcher, "clustering_algorithm") and self.matcher.clustering_algorithm is not None:
                 top_matches = list(itertools.chain(*[cluster[:top_k] for cluster in matches]))
@@ -79,53 +136,334 @@ class EntityResolver:
 
         return results
 
-    def _find_matches(self, entity: Entity, candidates: set) -> List[Tuple[Entity, float]]:
+    def deduplicate(self) -> Iterator[Tuple[Entity, Entity, float]]:
+        """
+        Find the duplicates within the trained entities, yielding each matched pair once.
+
+        Resolving the training entities against the model would compare every pair twice, once in
+        each direction, and once more for every additional block the pair shares. Instead, entities
+        are walked in a fixed order and each is compared only with the entities after it in its
+        blocks, collected into a set so a pair sharing several blocks is still compared once. With a
+        meta_blocker, only the pairs whose edge is kept for either of its entities are compared.
+
+        :return: An iterator of (entity, match, score) tuples, streamed as each entity is compared
+        """
+        if not self.model:
+            raise ValueError("Model not trained. Call train() first.")
+
+        rank = {entity_id: i for i, entity_id in enumerate(self.preprocessed_entities)}
+        thresholds = None
+        if self.meta_blocker is not None and self.meta_blocker.node_centric:
+            # An edge is kept if it is heavy enough for either entity, so every entity's threshold is needed first
+            thresholds = {
+                entity_id: self.meta_blocker.node_threshold(self._edge_weights(entity_id)) for entity_id in rank
+            }
+
+        for entity_id, entity_rank in rank.items():
+            if self.meta_blocker is None:
+                candidates = set()
+                for key in self.entity_blocks.get(entity_id, ()):
+                    for candidate_id in self.blocks.get(key, ()):
+                        if rank.get(candidate_id, -1) > entity_rank:
+                            candidates.add(candidate_id)
+            else:
+                weights = self._edge_weights(entity_id)
+                threshold = thresholds[entity_id] if thresholds else self.meta_blocker.node_threshold(weights)
+                candidates = [
+                    candidate_id
+                    for candidate_id, weight in weights.items()
+                    if rank.get(candidate_id, -1) > entity_rank
+                    and (
+                        self.meta_blocker.retains(weight, threshold)
+                        or (thresholds and self.meta_blocker.retains(weight, thresholds[candidate_id]))
+                    )
+                ]
+            if not candidates:
+                continue
+
+            entity = self.preprocessed_entities[entity_id]
+            for match, score in self._find_matches(entity, sorted(candidates, key=rank.__getitem__)):
+                yield entity, match, score
+
+    def _generate_candidates(self, entity: Entity) -> List[Any]:
+        block_keys = self.blocker.block_keys(entity)
+        if self.block_cleaner is not None:
+            block_keys = self.block_cleaner.filter_keys(block_keys, self.blocks)
+
+        if self.meta_blocker is not None:
+            weights = self.meta_blocker.edge_weights(block_keys, self.blocks, self.entity_blocks)
+            candidates = self.meta_blocker.prune(weights)
+            return candidates[: self.max_candidates] if self.max_candidates is not None else candidates
+
+        # Union of every block the entity falls into, counting how many of them each candidate shares
+        co_occurrences = Counter()
+        for key in block_keys:
+            block = self.blocks.get(key)
+            if block:
+                co_occurrences.update(block)
+
+        if self.max_candidates is not None:
+            return [candidate_id for candidate_id, _ in co_occurrences.most_common(self.max_candidates)]
+        return list(co_occurrences)
+
+    def _edge_weights(self, entity_id: Any) -> Dict[Any, float]:
+        return self.meta_blocker.edge_weights(
+            self.entity_blocks.get(entity_id, ()), self.blocks, self.entity_blocks, exclude=entity_id
+        )
+
+    def _fit_meta_blocker(self):
+        if self.meta_blocker is not None:
+            self.meta_blocker.fit(self.blocks, self.entity_blocks)
+
+    def _discard_meta_blocker_edges(self, entity_ids: Iterable[Any], keys: Iterable[Any]) -> List[Any]:
+        # Only the edges of the entities whose blocks change are counted again after an update. Block sizes
+        # change for the other entities of the blocks it touches too, and purging drops those blocks for them
+        if self.meta_blocker is None:
+            return []
+        changed_entities = dict.fromkeys(entity_ids)
+        if self.block_cleaner is not None or self.meta_blocker.uses_block_sizes:
+            for key in keys:
+                changed_entities.update(dict.fromkeys(self.blocks.get(key, ())))
+        changed_entities = list(changed_entities)
+        self.meta_blocker.discard(changed_entities, self.blocks, self.entity_blocks, keys)
+        return changed_entities
+
+    def _add_meta_blocker_edges(self, changed_entities: List[Any], keys: Iterable[Any]):
+        if self.meta_blocker is not None:
+            self.meta_blocker.add(changed_entities, self.blocks, self.entity_blocks, keys)
+
+    def _find_matches(
+        self, entity: Entity, candidates: List[Any], top_k: Optional[int] = None
+    ) -> List[Tuple[Entity, float]]:
         candidate_entities = {
             id: self.preprocessed_entities[id] for id in candidates if id in self.preprocessed_entities
         }
-        matches = self.matcher.match(entity, {"entities": candidate_entities})
 
         if hasattr(self.matcher, "clustering_algorithm") and self.matcher.clustering_algorithm is not None:
+            # Clusters are cut to top_k after matching, so the matcher has to return every match
+            matches = self.matcher.match(entity, {"entities": candidate_entities})
             return list(itertools.chain(*matches)) if matches and isinstance(matches[0], list) else matches
+        elif self._matcher_accepts_top_k():
+            return self.matcher.match(entity, {"entities": candidate_entities}, top_k=top_k)
         else:
-            return matches
+            return self.matcher.match(entity, {"entities": candidate_entities})
+
+    def _matcher_accepts_top_k(self) -> bool:
+        # Custom matchers written against the original match(entity, model) signature are still supported.
+        # The signature is inspected once per matcher, as the matcher can be replaced after construction
+        if self._top_k_matcher is not self.matcher:
+            try:
+                parameters = inspect.signature(self.matcher.match).parameters.values()
+                accepts_top_k = any(p.name == "top_k" or p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters)
+            except (TypeError, ValueError):
+                accepts_top_k = False
+            self._top_k_matcher, self._accepts_top_k = self.matcher, accepts_top_k
+        return self._accepts_top_k
 
     def update_model(self, new_entities: List[Entity]):
         new_preprocessed = {e.id: self.preprocessor.preprocess(e) for e in new_entities}
-        self.preprocessed_entities.update(new_preprocessed)
+        # The model is updated first, as it may share its entities with the preprocessed entities
         self.model = self.model_builder.update(self.model, list(new_preprocessed.values()))
+        self.preprocessed_entities.update(new_preprocessed)
+        self._share_entity_store()
+        if hasattr(self.matcher, "update"):
+            self.matcher.update(list(new_preprocessed.values()))
 
         new_blocks = self.blocker.create_blocks(list(new_preprocessed.values()))
-        for key, entities in new_blocks.items():
-            if key not in self.blocks:
-                self.blocks[key] = set()
-            self.blocks[key].update(e.id for e in entities)
+        changed_entities = self._discard_meta_blocker_edges(new_preprocessed, new_blocks)
+        self._index_blocks(new_blocks)
+        if self.block_cleaner is not None:
+            self.block_cleaner.clean(self.blocks, self.entity_blocks, keys=new_blocks, entity_ids=new_preprocessed)
+        self._add_meta_blocker_edges(changed_entities, new_blocks)
+
+    def remove_entities(self, entity_ids: Iterable[Any]):
+        """
+        Remove entities from the trained model without retraining it.
+
+        Each entity is dropped from the blocks listed for it in the reverse index (blocks left empty
+        are deleted), from the preprocessed entities, and from the model through the model builder's
+        `remove` hook. Model builders without a `remove` hook are retrained on the remaining entities.
+        Matchers with a `remove` hook drop what they keep for the entities, e.g. cached signatures.
+
+        :param entity_ids: The IDs of the entities to remove; unknown IDs are ignored
+        """
+        entity_ids = [entity_id for entity_id in dict.fromkeys(entity_ids) if entity_id in self.preprocessed_entities]
+        if not entity_ids:
+            return
+
+        changed_keys = {key for entity_id in entity_ids for key in self.entity_blocks.get(entity_id, ())}
+        changed_entities = self._discard_meta_blocker_edges(entity_ids, changed_keys)
+        for entity_id in entity_ids:
+            for key in self.entity_blocks.pop(entity_id, ()):
+                block = self.blocks.get(key)
+                if block is not None:
+                    block.discard(entity_id)
+                    if block:
+                        self.blocks[key] = block
+                    else:
+                        del self.blocks[key]
+
+        if hasattr(self.model_builder, "remove"):
+            # The model may share the entity store, so it is updated before the entities are dropped
+            self.model = self.model_builder.remove(self.model, entity_ids)
+            for entity_id in entity_ids:
+                self.preprocessed_entities.pop(entity_id, None)
+        else:
+            for entity_id in entity_ids:
+                self.preprocessed_entities.pop(entity_id, None)
+            self.model = self.model_builder.train(list(self.preprocessed_entities.values()))
+        if hasattr(self.matcher, "remove"):
+            self.matcher.remove(entity_ids)
+        self._share_entity_store()
+        self._add_meta_blocker_edges(changed_entities, changed_keys)
+
+    def upsert_entities(self, entities: List[Entity]):
+        """
+        Add new entities to the model and replace existing entities with the same IDs.
+
+        :param entities: The entities to add or replace
+        """
+        self.remove_entities([e.id for e in entities if e.id in self.preprocessed_entities])
+        self.update_model(entities)
+
+    def _share_entity_store(self):
+        # Let dictionary-based models read their entities from the store rather than keeping their own copies
+        if (
+            self.entity_store is not None
+            and self.preprocessed_entities is self.entity_store
+            and isinstance(self.model, dict)
+            and "entities" in self.model
+        ):
+            self.model["entities"] = self.entity_store
+
+    def _index_blocks(self, blocks: Dict[Any, List[Entity]]):
+        # Store entity IDs instead of Entity objects, and record the reverse entity -> block keys mapping.
+        # Sets are written back as the blocks of a loaded model file are decoded into new sets on access
+        for key, entities in blocks.items():
+            block = self.blocks.get(key, set())
+            for entity in entities:
+                block.add(entity.id)
+                block_keys = self.entity_blocks.get(entity.id, set())
+                block_keys.add(key)
+                self.entity_blocks[entity.id] = block_keys
+            self.blocks[key] = block
 
     def bulk_resolve(
-        self, entities: List[Entity], batch_size: int = 100, top_k: int = 1
+        self, entities: List[Entity], batch_size: int = 100, top_k: int = 1, n_jobs: Optional[int] = 1
     ) -> List[Tuple[Entity, List[Tuple[Entity, float]]]]:
-        results = []
-        for i in range(0, len(entities), batch_size):
-            batch = entities[i : i + batch_size]
-            results.extend(self.resolve(batch, top_k))
-        return results
+        """
+        Resolve entities in batches, optionally spreading the batches across a pool of worker processes.
+
+        See `iter_resolve` for how batches are distributed; this collects all of its results in a list.
+
+        :param entities: The entities to resolve
+        :param batch_size: The number of entities resolved per batch
+        :param top_k: The number of top matches to return for each entity
+        :param n_jobs: The number of worker processes to use (1 resolves in this process, None uses all CPUs)
+        :return: A list of (entity, matches) tuples in the same order as the input entities
+        """
+        return list(self.iter_resolve(entities, batch_size, top_k, n_jobs))
+
+    def iter_resolve(
+        self, entities: Iterable[Entity], batch_size: int = 100, top_k: int = 1, n_jobs: Optional[int] = 1
+    ) -> Iterator[Tuple[Entity, List[Tuple[Entity, float]]]]:
+        """
+        Lazily resolve entities from any iterable, yielding results batch by batch as they finish.
+
+        Entities are pulled from the input one batch at a time, so memory use depends on the batch size
+        and not on the size of the input, and results can be written out while the input is still being read.
+
+        With n_jobs other than 1, each worker receives a copy of this resolver (including its model,
+        preprocessed entities and blocks) once when it starts, and only the batches and their matches
+        are sent between processes afterwards. A bounded number of batches is in flight at any time.
+        Results are yielded in input order either way.
+
+        :param entities: An iterable of entities to resolve
+        :param batch_size: The number of entities resolved per batch
+        :param top_k: The number of top matches to return for each entity
+        :param n_jobs: The number of worker processes to use (1 resolves in this process, None uses all CPUs)
+        :return: An iterator of (entity, matches) tuples in the same order as the input entities
+        """
+        batches = self._iter_batches(entities, batch_size)
+
+        if n_jobs == 1:
+            for batch in batches:
+                yield from self.resolve(batch, top_k)
+            return
+
+        max_in_flight = 2 * (n_jobs or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(self,)) as executor:
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append((batch, executor.submit(_resolve_batch, batch, top_k)))
+                if len(in_flight) >= max_in_flight:
+                    batch, future = in_flight.popleft()
+                    yield from zip(batch, future.result())
+            while in_flight:
+                batch, future = in_flight.popleft()
+                yield from zip(batch, future.result())
+
+    def _iter_batches(self, entities: Iterable[Entity], batch_size: int) -> Iterator[List[Entity]]:
+        iterator = iter(entities)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
 
     def save_model(self, path: str):
-        import pickle
+        """
+        Save the trained model, preprocessed entities and blocks to a versioned model file.
+
+        Block postings, entity IDs and model vectors are stored as flat arrays and entity attributes
+        as an offset-indexed blob, so that load_model can memory-map the file (see model_format). The
+        statistics fitted by the meta-blocker are saved too, so loading does not fit it again.
 
-        with open(path, "wb") as f:
-            pickle.dump(
-                {"model": self.model, "preprocessed_entities": self.preprocessed_entities, "blocks": self.blocks}, f
-            )
+        :param path: The path of the model file
+        """
+        meta_blocker_stats = self.meta_blocker.stats if self.meta_blocker is not None else None
+        write_model(path, self.model, self.preprocessed_entities, self.blocks, self.entity_blocks, meta_blocker_stats)
 
-    def load_model(self, path: str):
-        import pickle
+    def load_model(self, path: str, lazy: bool = False, max_shards: int = 1024):
+        """
+        Load a model saved with save_model.
+
+        The file is memory-mapped rather than read: entities, blocks and model vectors are decoded from
+        the mapped pages as queries touch them, and worker processes loading the same file share its
+        pages. With lazy=True only the header and the block directory are read up front, and the rest
+        of the file is read in shards on first access through a bounded LRU of resident shards, so a
+        model larger than the available memory can be served. Changes made after loading
+        (update_model, remove_entities) are kept in memory only. The file of a previously loaded model is
+        closed, so the previous model cannot be used anymore. Files pickled by earlier versions are still
+        loaded in full.
+
+        :param path: The path of the model file
+        :param lazy: Whether to read the model file in shards on demand instead of memory-mapping it
+        :param max_shards: The maximum number of shards kept in memory when lazy
+        """
+        if is_model_file(path):
+            data = read_model(path, lazy=lazy, max_shards=max_shards)
+        else:
+            import pickle
 
-        with open(path, "rb") as f:
-            data = pickle.load(f)
-            self.model = data["model"]
-            self.preprocessed_entities = data["preprocessed_entities"]
-            self.blocks = data["blocks"]
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        if self._model_file is not None:
+            self._model_file.close()
+        self._model_file = data.get("file")
+        self.model = data["model"]
+        self.preprocessed_entities = data["preprocessed_entities"]
+        self.blocks = data["blocks"]
+        self.entity_blocks = data.get("entity_blocks")
+        if self.entity_blocks is None:
+            self.entity_blocks = defaultdict(set)
+            for key, block in self.blocks.items():
+                for entity_id in block:
+                    self.entity_blocks[entity_id].add(key)
+            self.entity_blocks = dict(self.entity_blocks)
+        # The meta-blocker's statistics are saved with the model, so only models saved without them are fitted
+        if self.meta_blocker is not None and not self.meta_blocker.load_stats(data.get("meta_blocker_stats")):
+            self._fit_meta_blocker()
 
     def get_stats(self) -> Dict[str, Any]:
         return {
@@ -137,4 +475,6 @@ class EntityResolver:
             "model_size": (
                 self.model_builder.get_model_size(self.model) if hasattr(self.model_builder, "get_model_size") else None
             ),
+            "block_cleaning": self.block_cleaner.stats if self.block_cleaner is not None else None,
+            "shard_stats": self.blocks.shard_stats if hasattr(self.blocks, "shard_stats") else None,
         }
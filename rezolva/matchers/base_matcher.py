@@ -1,8 +1,47 @@
-from typing import Dict, List, Tuple
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from ..core.base import ClusteringAlgorithm, Entity, Matcher
 
 
+class TopKMatches:
+    """
+    Collects matches while keeping only the top_k highest-scoring ones.
+
+    Matches are kept in a bounded min-heap, so collecting the best k out of n candidates costs
+    O(n log k) instead of sorting every passing candidate. Once the heap is full, `min_score` is
+    the score a new match has to beat, which matchers can use as a raised threshold to skip work
+    on candidates that can no longer make the cut. Among equal scores, earlier matches win, as
+    with a stable sort.
+
+    :param top_k: The maximum number of matches to keep (all matches are kept if None)
+    """
+
+    def __init__(self, top_k: Optional[int] = None):
+        self.top_k = top_k
+        self._heap = []
+        self._count = 0
+
+    @property
+    def min_score(self) -> float:
+        if self.top_k is None or len(self._heap) < self.top_k:
+            return float("-inf")
+        if self.top_k == 0:
+            return float("inf")
+        return self._heap[0][0]
+
+    def add(self, candidate: Entity, score: float):
+        self._count += 1
+        item = (score, -self._count, candidate)
+        if self.top_k is None or len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, item)
+        elif self.top_k > 0 and score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def sorted(self) -> List[Tuple[Entity, float]]:
+        return [(candidate, score) for score, _, candidate in sorted(self._heap, reverse=True)]
+
+
 class BaseAttributeMatcher(Matcher):
     """
     A base class for attribute-based matchers.
@@ -10,9 +49,23 @@ class BaseAttributeMatcher(Matcher):
     This class provides a foundation for matchers that compare entities based on their attributes.
     It implements a basic matching algorithm and allows for attribute weighting.
 
+    When matching, attributes are compared in a plan ordered by weight per unit of comparison cost,
+    and a candidate is abandoned as soon as its best still-achievable score (assuming every remaining
+    attribute is a perfect match) falls below the threshold or the current top-k floor. Expensive
+    comparisons therefore only run for candidates that are still in contention. The number of
+    comparisons made and abandoned early is recorded in `comparison_stats`.
+
+    Matchers with a `similarity_many(query, candidates, min_similarity)` batch comparator compare
+    blocks of at least `min_batch_candidates` candidates one attribute at a time across all the
+    candidates still in contention, so the comparator can prepare the query once for all of them.
+
     :param threshold: The similarity threshold above which entities are considered a match
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
+    :param attribute_costs: A dictionary mapping attribute names to their relative comparison cost
+        (estimated from the length of the query value if not given)
+    :param min_batch_candidates: The number of candidates from which a block is compared through the
+        similarity_many batch comparator, for matchers that have one
     """
 
     def __init__(
@@ -20,19 +73,170 @@ class BaseAttributeMatcher(Matcher):
         threshold: float = 0.7,
         attribute_weights: Dict[str, float] = None,
         clustering_algorithm: ClusteringAlgorithm = None,
+        attribute_costs: Dict[str, float] = None,
+        min_batch_candidates: int = 32,
     ):
         super().__init__(clustering_algorithm)
         self.threshold = threshold
         self.attribute_weights = attribute_weights or {}
+        self.attribute_costs = attribute_costs or {}
+        self.min_batch_candidates = min_batch_candidates
+        self.comparison_stats = {"comparisons": 0, "abandoned": 0, "attribute_comparisons_skipped": 0}
+
+    def match(self, entity: Entity, model: dict, top_k: Optional[int] = None) -> List[Tuple[Entity, float]]:
+        matches = TopKMatches(top_k)
+        self._match_candidates(entity, model["entities"].values(), matches)
+        return self.apply_clustering(matches.sorted())
+
+    def reset_comparison_stats(self):
+        for key in self.comparison_stats:
+            self.comparison_stats[key] = 0
+
+    def _match_candidates(self, entity: Entity, candidates: Iterable[Entity], matches: TopKMatches):
+        plan = self._compile_comparison_plan(entity)
+        candidates = [candidate for candidate in candidates if candidate.id != entity.id]
+        if hasattr(self, "similarity_many") and len(candidates) >= self.min_batch_candidates:
+            self._match_candidates_batch(plan, candidates, matches)
+            return
+
+        for candidate in candidates:
+            similarity = self._calculate_planned_similarity(plan, candidate, max(self.threshold, matches.min_score))
+            if similarity is not None and similarity >= self.threshold:
+                matches.add(candidate, similarity)
+
+    def _match_candidates_batch(
+        self, plan: Tuple[List[Tuple[str, float, Any]], float, bool], candidates: List[Entity], matches: TopKMatches
+    ):
+        """
+        Follow a comparison plan for many candidates at once, one attribute at a time.
+
+        Each attribute of the candidates still in contention is compared with the matcher's
+        `similarity_many` batch comparator, and candidates are abandoned on the same bound as in
+        `_calculate_planned_similarity`, against the top-k floor when the batch starts.
+
+        :param plan: The comparison plan from `_compile_comparison_plan`
+        :param candidates: The candidate entities to compare
+        :param matches: The matches collected so far
+        """
+        steps, total_weight, can_abandon = plan
+        self.comparison_stats["comparisons"] += len(candidates)
+        min_score = max(self.threshold, matches.min_score)
+
+        remaining_weight = total_weight
+        alive = list(range(len(candidates)))
+        achieved = [0.0] * len(candidates)
+        similarities = [{} for _ in candidates]
+        for i, (attr, weight, value) in enumerate(steps):
+            remaining_weight -= weight
+            # The same bound as in _calculate_planned_similarity, with the loosest one passed to the comparator
+            bound = float("-inf")
+            if can_abandon and weight > 0:
+                bound = ((min_score - 1e-9) * total_weight - remaining_weight) / weight
+            min_similarities = [bound - achieved[k] / weight if weight > 0 else bound for k in alive]
+            batch_similarities = self.similarity_many(
+                value,
+                [str(candidates[k].attributes.get(attr, "")) for k in alive],
+                min(min_similarities, default=bound),
+            )
+
+            still_alive = []
+            for k, similarity, min_similarity in zip(alive, batch_similarities, min_similarities):
+                similarities[k][attr] = similarity
+                achieved[k] += similarity * weight
+                if similarity < min_similarity or (
+                    can_abandon and (achieved[k] + remaining_weight) / total_weight < min_score - 1e-9
+                ):
+                    self.comparison_stats["abandoned"] += 1
+                    self.comparison_stats["attribute_comparisons_skipped"] += len(steps) - i - 1
+                else:
+                    still_alive.append(k)
+            alive = still_alive
+
+        for k in alive:
+            if steps:
+                similarity = (
+                    sum(similarities[k][attr] * weight for attr, weight in self.attribute_weights.items())
+                    / total_weight
+                )
+            else:
+                similarity = 0.0
+            if similarity >= self.threshold:
+                matches.add(candidates[k], similarity)
+
+    def _compile_comparison_plan(self, entity: Entity) -> Tuple[List[Tuple[str, float, Any]], float, bool]:
+        # Compare the attributes contributing the most weight per unit of cost first
+        steps = []
+        for attr, weight in self.attribute_weights.items():
+            value = str(entity.attributes.get(attr, ""))
+            cost = self.attribute_costs.get(attr, len(value) + 1)
+            priority = weight / cost if cost > 0 else float("inf")
+            steps.append((priority, attr, weight, value))
+        steps.sort(key=lambda step: step[0], reverse=True)
+
+        total_weight = sum(self.attribute_weights.values())
+        can_abandon = total_weight > 0 and all(weight >= 0 for weight in self.attribute_weights.values())
+        return [(attr, weight, value) for _, attr, weight, value in steps], total_weight, can_abandon
+
+    def _calculate_planned_similarity(
+        self, plan: Tuple[List[Tuple[str, float, Any]], float, bool], candidate: Entity, min_score: float
+    ) -> Optional[float]:
+        """
+        Calculate the weighted similarity of a candidate following a comparison plan.
+
+        Returns None if the candidate was abandoned because it can no longer reach min_score. The
+        bound assumes attribute similarities lie in [0, 1] and is only applied with non-negative weights.
+
+        :param plan: The comparison plan from `_compile_comparison_plan`
+        :param candidate: The candidate entity to compare
+        :param min_score: The score the candidate has to reach to be worth completing
+        :return: The weighted similarity, or None if the comparison was abandoned
+        """
+        steps, total_weight, can_abandon = plan
+        self.comparison_stats["comparisons"] += 1
+        if not steps:
+            return 0.0
+
+        remaining_weight = total_weight
+        achieved = 0.0
+        similarities = {}
+        for i, (attr, weight, value) in enumerate(steps):
+            remaining_weight -= weight
+            # The similarity this attribute needs for the candidate to reach min_score, even if every
+            # remaining attribute is a perfect match; a small tolerance keeps float rounding in the bound
+            # from abandoning a candidate at the cut-off
+            min_similarity = float("-inf")
+            if can_abandon and weight > 0:
+                min_similarity = ((min_score - 1e-9) * total_weight - achieved - remaining_weight) / weight
+            similarity = self._compare_attribute(attr, value, candidate, min_similarity)
+            similarities[attr] = similarity
+            achieved += similarity * weight
+            if similarity < min_similarity or (
+                can_abandon and (achieved + remaining_weight) / total_weight < min_score - 1e-9
+            ):
+                self.comparison_stats["abandoned"] += 1
+                self.comparison_stats["attribute_comparisons_skipped"] += len(steps) - i - 1
+                return None
+
+        # Sum in attribute order so scores are identical to _calculate_weighted_similarity
+        return sum(similarities[attr] * weight for attr, weight in self.attribute_weights.items()) / total_weight
+
+    def _compare_attribute(self, attr: str, value: Any, candidate: Entity, min_similarity: float) -> float:
+        # Matchers that prepare the query values in their comparison plan also override this comparison
+        return self._calculate_bounded_similarity(value, str(candidate.attributes.get(attr, "")), min_similarity)
+
+    def _calculate_bounded_similarity(self, val1: str, val2: str, min_similarity: float) -> float:
+        """
+        Calculate the similarity of two values, or any value below min_similarity if it is lower.
+
+        Comparisons that can tell early that two values are too dissimilar (e.g. from a bound on an edit
+        distance) override this to stop there, as the candidate is then abandoned whatever the exact value.
 
-    def match(self, entity: Entity, model: dict) -> List[Tuple[Entity, float]]:
-        matches = []
-        for candidate in model["entities"].values():
-            if candidate.id != entity.id:
-                similarity = self._calculate_weighted_similarity(entity, candidate)
-                if similarity >= self.threshold:
-                    matches.append((candidate, similarity))
-        return self.apply_clustering(sorted(matches, key=lambda x: x[1], reverse=True))
+        :param val1: The first value
+        :param val2: The second value
+        :param min_similarity: The similarity below which the exact value is not needed
+        :return: The similarity, exact if it is at least min_similarity
+        """
+        return self._calculate_attribute_similarity(val1, val2)
 
     def _calculate_weighted_similarity(self, entity1: Entity, entity2: Entity) -> float:
         similarities = []
@@ -1,9 +1,16 @@
 # rezolva/matchers/bayesian_matcher.py
 
+import bisect
 import math
-from typing import Dict, List, Tuple
+import random
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
 
 from ..core.base import ClusteringAlgorithm, Entity, Matcher
+from .base_matcher import TopKMatches
+
+# The attribute, value, words, level weights and exact agreement weight of each attribute of a query entity
+_Query = List[Tuple[str, Any, FrozenSet[str], List[float], float]]
 
 
 class BayesianMatcher(Matcher):
@@ -28,9 +35,35 @@ class BayesianMatcher(Matcher):
     - Can be computationally expensive for large datasets or many attributes
     - Assumes independence between attributes, which may not always hold
 
+    With fellegi_sunter=True, the matcher follows the Fellegi-Sunter model instead. Each attribute of
+    attribute_weights is compared at a discrete agreement level: disagreement, partial agreement for
+    each Jaccard similarity of the words in agreement_thresholds, and exact agreement. Missing values are
+    neutral. The probability of each level among matches (m) and non-matches (u), and the proportion of
+    matches, are estimated by expectation-maximization over the comparison vectors of sampled pairs of
+    training entities (random pairs and pairs sharing a word). Identical vectors are counted once, so
+    each iteration costs one pass over the distinct vectors. As matches are rare among random pairs,
+    their proportion among all pairs is estimated from the pairs sharing a word. The log-likelihood
+    ratio log(m / u) of every level is then precomputed, and with term_frequency_adjustments the weight
+    of an exact agreement on a value uses the frequency of that value (from the value-frequency table)
+    as u, so agreeing on a rare value counts for more. Scoring a pair adds up the weights of its levels
+    and turns the total into the posterior probability of a match, which is compared with the threshold.
+
+    How Fellegi-Sunter Matching works:
+    1. Sample pairs of training entities and count their distinct comparison vectors
+    2. Estimate m, u and the proportion of matches by expectation-maximization over the vectors
+    3. Precompute the log-likelihood weight of each agreement level, and of each value for exact agreement
+    4. Score a pair by looking up and adding the weights of its agreement levels
+
     :param threshold: The probability threshold above which entities are considered a match
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
+        (in Fellegi-Sunter mode, only the attributes are used)
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
+    :param fellegi_sunter: Whether to score pairs with the Fellegi-Sunter model
+    :param agreement_thresholds: The Jaccard similarities of the words above which two values partially agree
+    :param max_pairs: The maximum number of training pairs sampled for expectation-maximization
+    :param max_iterations: The maximum number of expectation-maximization iterations
+    :param term_frequency_adjustments: Whether to weight exact agreement by the frequency of the value
+    :param seed: The seed of the training pair sampling
     """
 
     def __init__(
@@ -38,11 +71,31 @@ class BayesianMatcher(Matcher):
         threshold: float = 0.5,
         attribute_weights: Dict[str, float] = None,
         clustering_algorithm: ClusteringAlgorithm = None,
+        fellegi_sunter: bool = False,
+        agreement_thresholds: Sequence[float] = (0.5,),
+        max_pairs: int = 10000,
+        max_iterations: int = 50,
+        term_frequency_adjustments: bool = True,
+        seed: int = 1,
     ):
         super().__init__(clustering_algorithm)
         self.threshold = threshold
         self.attribute_weights = attribute_weights or {}
         self.attribute_probabilities = {}
+        self.fellegi_sunter = fellegi_sunter
+        self.agreement_thresholds = sorted(agreement_thresholds)
+        self.max_pairs = max_pairs
+        self.max_iterations = max_iterations
+        self.term_frequency_adjustments = term_frequency_adjustments
+        self.seed = seed
+
+        # The Fellegi-Sunter parameters, by attribute and agreement level (0 is disagreement, the last is exact)
+        self.match_proportion = 0.0
+        self.m_probabilities: Dict[str, List[float]] = {}
+        self.u_probabilities: Dict[str, List[float]] = {}
+        self.level_weights: Dict[str, List[float]] = {}
+        self.exact_weights: Dict[str, Dict[Any, float]] = {}
+        self._words: Dict[str, FrozenSet[str]] = {}
 
     def train(self, entities: List[Entity]):
         total_entities = len(entities)
@@ -56,14 +109,284 @@ class BayesianMatcher(Matcher):
             for value, count in value_counts.items():
                 self.attribute_probabilities[attr][value] = count / total_entities
 
-    def match(self, entity: Entity, model: Dict) -> List[Tuple[Entity, float]]:
-        matches = []
+        if self.fellegi_sunter:
+            self._train_fellegi_sunter(entities)
+
+    def match(self, entity: Entity, model: Dict, top_k: Optional[int] = None) -> List[Tuple[Entity, float]]:
+        matches = TopKMatches(top_k)
+        if self.fellegi_sunter:
+            self._match_fellegi_sunter(entity, model["entities"], matches)
+            return self.apply_clustering(matches.sorted())
+
         for candidate_id, candidate in model["entities"].items():
             if candidate_id != entity.id:
                 similarity = self._calculate_similarity(entity, candidate)
                 if similarity >= self.threshold:
-                    matches.append((candidate, similarity))
-        return self.apply_clustering(sorted(matches, key=lambda x: x[1], reverse=True))
+                    matches.add(candidate, similarity)
+        return self.apply_clustering(matches.sorted())
+
+    def match_probability(self, entity1: Entity, entity2: Entity) -> float:
+        """
+        Calculate the Fellegi-Sunter posterior probability that two entities match.
+
+        :param entity1: The first entity
+        :param entity2: The second entity
+        :return: The probability of a match
+        """
+        self._check_trained()
+        return self._posterior(self._match_weight(self._prepare(entity1), entity2))
+
+    def _match_fellegi_sunter(self, entity: Entity, candidates: Dict[Any, Entity], matches: TopKMatches):
+        self._check_trained()
+        query = self._prepare(entity)
+        # The threshold as a total weight, so the posterior probability is only computed for matches
+        min_weight = self._log_odds(self.threshold) - self._log_odds(self.match_proportion) - 1e-9
+        for candidate_id, candidate in candidates.items():
+            if candidate_id != entity.id:
+                weight = self._match_weight(query, candidate)
+                if weight >= min_weight:
+                    probability = self._posterior(weight)
+                    if probability >= self.threshold:
+                        matches.add(candidate, probability)
+
+    def _train_fellegi_sunter(self, entities: List[Entity]):
+        attributes = list(self.attribute_weights)
+        self._words = {}
+        for entity in entities:
+            for attr in attributes:
+                value = entity.attributes.get(attr, "")
+                if value not in self._words:
+                    self._words[value] = self._word_set(value)
+
+        rng = random.Random(self.seed)
+        num_levels = len(self.agreement_thresholds) + 2
+        random_pairs = self._random_pairs(entities, rng)
+        random_patterns = Counter(self._comparison_vector(*pair) for pair in random_pairs)
+        word_patterns, word_pattern_weights = Counter(), Counter()
+        for entity1, entity2, weight in self._word_pairs(entities, attributes, rng):
+            pattern = self._comparison_vector(entity1, entity2)
+            word_patterns[pattern] += 1
+            word_pattern_weights[pattern] += weight
+
+        # u starts from the levels of random pairs, which are nearly all non-matches, and m favours agreement
+        initial_m = [2**level for level in range(num_levels)]
+        self.m_probabilities = {attr: self._normalize(initial_m) for attr in attributes}
+        self.u_probabilities = {
+            attr: self._normalize(
+                [
+                    1 + sum(count for pattern, count in random_patterns.items() if pattern[a] == level)
+                    for level in range(num_levels)
+                ]
+            )
+            for a, attr in enumerate(attributes)
+        }
+        self.match_proportion = 0.1
+        self._expectation_maximization(random_patterns + word_patterns)
+
+        # Matches are too rare among random pairs to count them there, so the proportion of matches among
+        # all pairs (the prior of the posterior probability) is the proportion among the pairs sharing a
+        # word, where nearly all matches are, times the proportion of random pairs sharing a word. The
+        # pairs sharing a word were not drawn uniformly, so they are weighted by their inverse odds of being drawn
+        shared = sum(1 for entity1, entity2 in random_pairs if self._shared_words(entity1, entity2))
+        if word_patterns and shared:
+            self._expectation_maximization(word_pattern_weights, update_probabilities=False)
+            self.match_proportion = max(self.match_proportion * shared / len(random_pairs), 1e-9)
+        else:
+            self._expectation_maximization(random_patterns, update_probabilities=False)
+
+        self.level_weights = {
+            attr: [math.log(m / u) for m, u in zip(self.m_probabilities[attr], self.u_probabilities[attr])]
+            for attr in attributes
+        }
+        self.exact_weights = {}
+        if self.term_frequency_adjustments:
+            for attr in attributes:
+                m_exact = self.m_probabilities[attr][-1]
+                self.exact_weights[attr] = {
+                    value: math.log(m_exact / frequency)
+                    for value, frequency in self.attribute_probabilities[attr].items()
+                    if self._words.get(value)
+                }
+
+    def _expectation_maximization(self, patterns: Counter, update_probabilities: bool = True):
+        """
+        Estimate m, u and the proportion of matches from the counts of the comparison vectors.
+
+        :param patterns: The number of sampled pairs with each comparison vector
+        :param update_probabilities: Whether to estimate m and u too, or only the proportion of matches
+        """
+        attributes = list(self.attribute_weights)
+        num_levels = len(self.agreement_thresholds) + 2
+        total = sum(patterns.values())
+        if not total:
+            return
+        for _ in range(self.max_iterations):
+            # Expectation: the probability that the pairs with each vector are matches
+            m_counts = [[0.0] * num_levels for _ in attributes]
+            u_counts = [[0.0] * num_levels for _ in attributes]
+            matches = 0.0
+            for pattern, count in patterns.items():
+                match = count * self._pattern_match_probability(pattern)
+                matches += match
+                for a, level in enumerate(pattern):
+                    if level is not None:
+                        m_counts[a][level] += match
+                        u_counts[a][level] += count - match
+
+            # Maximization: the proportions that make these expectations most likely
+            change = abs(self.match_proportion - matches / total)
+            self.match_proportion = min(max(matches / total, 1e-6), 1 - 1e-6)
+            for a, attr in enumerate(attributes if update_probabilities else ()):
+                m_probabilities, u_probabilities = self._smooth(m_counts[a]), self._smooth(u_counts[a])
+                change = max(
+                    change,
+                    max(abs(x - y) for x, y in zip(m_probabilities, self.m_probabilities[attr])),
+                    max(abs(x - y) for x, y in zip(u_probabilities, self.u_probabilities[attr])),
+                )
+                self.m_probabilities[attr], self.u_probabilities[attr] = m_probabilities, u_probabilities
+            if change < 1e-6:
+                break
+
+    def _pattern_match_probability(self, pattern: Tuple[Optional[int], ...]) -> float:
+        m_likelihood, u_likelihood = self.match_proportion, 1 - self.match_proportion
+        for attr, level in zip(self.attribute_weights, pattern):
+            if level is not None:
+                m_likelihood *= self.m_probabilities[attr][level]
+                u_likelihood *= self.u_probabilities[attr][level]
+        return m_likelihood / (m_likelihood + u_likelihood)
+
+    def _random_pairs(self, entities: List[Entity], rng: random.Random) -> List[Tuple[Entity, Entity]]:
+        if len(entities) < 2:
+            return []
+        pairs = []
+        for _ in range(self.max_pairs // 2):
+            i, j = rng.sample(range(len(entities)), 2)
+            pairs.append((entities[i], entities[j]))
+        return pairs
+
+    def _word_pairs(
+        self, entities: List[Entity], attributes: List[str], rng: random.Random
+    ) -> List[Tuple[Entity, Entity, float]]:
+        # Pairs sharing a word in some attribute, among which the matches are, drawn from a random word
+        # so that rare words, shared by few pairs, are as likely as common ones. Each pair comes with the
+        # inverse of its odds of being drawn (up to a constant factor)
+        postings = {}
+        for i, entity in enumerate(entities):
+            for attr in attributes:
+                for word in self._words[entity.attributes.get(attr, "")]:
+                    postings.setdefault((attr, word), []).append(i)
+        keys = [key for key, posting in postings.items() if len(posting) > 1]
+        if not keys:
+            return []
+        pairs = []
+        for _ in range(self.max_pairs - self.max_pairs // 2):
+            i, j = rng.sample(postings[rng.choice(keys)], 2)
+            odds = 0.0
+            for attr in attributes:
+                words1 = self._words[entities[i].attributes.get(attr, "")]
+                words2 = self._words[entities[j].attributes.get(attr, "")]
+                for word in words1 & words2:
+                    odds += 2 / (len(postings[attr, word]) * (len(postings[attr, word]) - 1))
+            pairs.append((entities[i], entities[j], 1 / odds))
+        return pairs
+
+    def _shared_words(self, entity1: Entity, entity2: Entity) -> int:
+        return sum(
+            len(self._words[entity1.attributes.get(attr, "")] & self._words[entity2.attributes.get(attr, "")])
+            for attr in self.attribute_weights
+        )
+
+    def _comparison_vector(self, entity1: Entity, entity2: Entity) -> Tuple[Optional[int], ...]:
+        return tuple(
+            self._agreement_level(entity1.attributes.get(attr, ""), entity2.attributes.get(attr, ""))
+            for attr in self.attribute_weights
+        )
+
+    def _agreement_level(self, value1: Any, value2: Any, words1: Optional[FrozenSet[str]] = None) -> Optional[int]:
+        # None for a missing value, 0 for disagreement, then each partial agreement, and exact agreement last
+        if words1 is None:
+            words1 = self._words.get(value1)
+            if words1 is None:
+                words1 = self._word_set(value1)
+        words2 = self._words.get(value2)
+        if words2 is None:
+            words2 = self._word_set(value2)
+        if not words1 or not words2:
+            return None
+        if value1 == value2:
+            return len(self.agreement_thresholds) + 1
+        intersection = len(words1 & words2)
+        similarity = intersection / (len(words1) + len(words2) - intersection)
+        return bisect.bisect_right(self.agreement_thresholds, similarity)
+
+    def _prepare(self, entity: Entity) -> _Query:
+        # The query's values, words and weights, looked up once for all of its candidates
+        prepared = []
+        for attr in self.attribute_weights:
+            value = entity.attributes.get(attr, "")
+            words = self._words.get(value)
+            weights = self.level_weights[attr]
+            exact_weight = self.exact_weights.get(attr, {}).get(value, weights[-1])
+            prepared.append((attr, value, words if words is not None else self._word_set(value), weights, exact_weight))
+        return prepared
+
+    def _match_weight(self, query: _Query, candidate: Entity) -> float:
+        # The weights of the agreement levels, as in _agreement_level but with the query prepared
+        thresholds, known_words = self.agreement_thresholds, self._words
+        weight = 0.0
+        for attr, value, words, weights, exact_weight in query:
+            if not words:
+                continue
+            candidate_value = candidate.attributes.get(attr, "")
+            if candidate_value == value:
+                weight += exact_weight
+                continue
+            candidate_words = known_words.get(candidate_value)
+            if candidate_words is None:
+                candidate_words = self._word_set(candidate_value)
+            if not candidate_words:
+                continue
+            if thresholds:
+                intersection = len(words & candidate_words)
+                similarity = intersection / (len(words) + len(candidate_words) - intersection)
+                weight += weights[bisect.bisect_right(thresholds, similarity)]
+            else:
+                weight += weights[0]
+        return weight
+
+    def _posterior(self, weight: float) -> float:
+        log_odds = self._log_odds(self.match_proportion) + weight
+        if log_odds < 0:
+            odds = math.exp(log_odds)
+            return odds / (1 + odds)
+        return 1 / (1 + math.exp(-log_odds))
+
+    def _check_trained(self):
+        if not self.level_weights:
+            raise ValueError("BayesianMatcher needs to be trained first. Call train() with your entities.")
+
+    @staticmethod
+    def _log_odds(probability: float) -> float:
+        if probability <= 0:
+            return float("-inf")
+        if probability >= 1:
+            return float("inf")
+        return math.log(probability / (1 - probability))
+
+    @classmethod
+    def _smooth(cls, counts: List[float]) -> List[float]:
+        # Levels never seen get the same small probability among matches and non-matches, i.e. no weight
+        total = sum(counts)
+        return cls._normalize([count + 1e-6 * total + 1e-12 for count in counts])
+
+    @staticmethod
+    def _normalize(values: Sequence[float]) -> List[float]:
+        total = sum(values)
+        return [value / total for value in values]
+
+    @staticmethod
+    def _word_set(value: Any) -> FrozenSet[str]:
+        return frozenset(str(value).lower().split())
 
     def _calculate_similarity(self, entity1: Entity, entity2: Entity) -> float:
         total_similarity = 0
@@ -1,8 +1,9 @@
 import math
-from typing import Dict, List, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from ..core.base import ClusteringAlgorithm, Entity
-from .base_matcher import BaseAttributeMatcher
+from ..utils.sparse_matrix import SparseMatrix
+from .base_matcher import BaseAttributeMatcher, TopKMatches
 
 
 class CosineSimilarityMatcher(BaseAttributeMatcher):
@@ -26,9 +27,15 @@ class CosineSimilarityMatcher(BaseAttributeMatcher):
     - Doesn't consider the magnitude of attributes, which might be important in some cases
     - Can be computationally expensive for high-dimensional data
 
+    With a vector model (see SimpleVectorModelBuilder), the vectors are scored through the model's
+    SparseMatrix, whose rows are normalized once, so a query is normalized once and each candidate
+    costs one sparse dot product. match_batch and self_match score each query against all rows at
+    once through the columns of its terms, streaming the top matches of one query at a time.
+
     :param threshold: The similarity threshold above which entities are considered a match
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
+    :param attribute_costs: A dictionary mapping attribute names to their relative comparison cost
     """
 
     def __init__(
@@ -36,44 +43,79 @@ class CosineSimilarityMatcher(BaseAttributeMatcher):
         threshold: float = 0.5,
         attribute_weights: Dict[str, float] = None,
         clustering_algorithm: ClusteringAlgorithm = None,
+        attribute_costs: Dict[str, float] = None,
     ):
-        super().__init__(threshold, attribute_weights, clustering_algorithm)
+        super().__init__(threshold, attribute_weights, clustering_algorithm, attribute_costs)
 
-    def match(self, entity: Entity, model: dict) -> List[Tuple[Entity, float]]:
-        matches = []
+    def match(self, entity: Entity, model: dict, top_k: Optional[int] = None) -> List[Tuple[Entity, float]]:
+        matches = TopKMatches(top_k)
         if "vectors" in model:  # Vector-based approach
-            entity_vector = model["vectors"].get(entity.id)
-            if entity_vector is None:
-                entity_vector = self._vectorize_entity(entity, model)
-
-            for candidate_id, candidate_vector in model["vectors"].items():
-                if candidate_id != entity.id:
-                    similarity = self._cosine_similarity_vectors(entity_vector, candidate_vector)
-                    if similarity >= self.threshold:
-                        matches.append((model["entities"][candidate_id], similarity))
-        else:  # String-based approach
+            matrix = self._vector_matrix(model)
+            query = matrix.normalize(self._entity_vector(entity, model))
             for candidate_id, candidate in model["entities"].items():
-                if candidate_id != entity.id:
-                    similarity = self._calculate_weighted_similarity(entity, candidate)
+                if candidate_id != entity.id and candidate_id in matrix:
+                    similarity = matrix.dot(query, candidate_id)
                     if similarity >= self.threshold:
-                        matches.append((candidate, similarity))
-
-        return self.apply_clustering(sorted(matches, key=lambda x: x[1], reverse=True))
-
-    def _calculate_weighted_similarity(self, entity1: Entity, entity2: Entity) -> float:
-        similarities = []
-        weights = []
-        for attr, weight in self.attribute_weights.items():
-            val1 = str(entity1.attributes.get(attr, ""))
-            val2 = str(entity2.attributes.get(attr, ""))
-            similarity = self._calculate_attribute_similarity(val1, val2)
-            similarities.append(similarity)
-            weights.append(weight)
-
-        if not similarities:
-            return 0.0
-
-        return sum(s * w for s, w in zip(similarities, weights)) / sum(weights)
+                        matches.add(candidate, similarity)
+        else:  # String-based approach
+            self._match_candidates(entity, model["entities"].values(), matches)
+
+        return self.apply_clustering(matches.sorted())
+
+    def match_batch(
+        self, entities: Iterable[Entity], model: dict, top_k: Optional[int] = None
+    ) -> List[List[Tuple[Entity, float]]]:
+        """
+        Match a batch of entities against the entities of a vector model.
+
+        Each query is scored against all vectors at once through the columns of its terms, and only the
+        candidates sharing a term with it are scored, so a threshold of 0 does not match the others.
+
+        :param entities: The entities to match
+        :param model: A vector model, its "entities" are the candidates
+        :param top_k: The maximum number of matches of each entity (all matches if None)
+        :return: The matches of each entity
+        """
+        return [self._match_vectors(entity, model, top_k) for entity in entities]
+
+    def self_match(
+        self, model: dict, top_k: Optional[int] = None
+    ) -> Iterator[Tuple[Entity, List[Tuple[Entity, float]]]]:
+        """
+        Match every entity of a vector model with the others, without materializing the full similarity matrix.
+
+        Only the accumulated scores of one entity are held at a time, and its top matches are yielded
+        before the next entity is scored.
+
+        :param model: A vector model
+        :param top_k: The maximum number of matches of each entity (all matches if None)
+        :return: An iterator of (entity, matches) tuples
+        """
+        for entity in model["entities"].values():
+            yield entity, self._match_vectors(entity, model, top_k)
+
+    def _match_vectors(self, entity: Entity, model: dict, top_k: Optional[int]) -> List[Tuple[Entity, float]]:
+        matrix = self._vector_matrix(model)
+        matches = TopKMatches(top_k)
+        for candidate_id, similarity in matrix.scores(matrix.normalize(self._entity_vector(entity, model))):
+            if candidate_id != entity.id and similarity >= self.threshold:
+                candidate = model["entities"].get(candidate_id)
+                if candidate is not None:
+                    matches.add(candidate, similarity)
+        return self.apply_clustering(matches.sorted())
+
+    def _vector_matrix(self, model: dict) -> SparseMatrix:
+        matrix = model.get("matrix")
+        if matrix is None:
+            # Models without a matrix (built by hand or loaded from a file) get one on first use
+            matrix = model["matrix"] = SparseMatrix.from_vectors(model["vectors"])
+        return matrix
+
+    def _entity_vector(self, entity: Entity, model: dict) -> Dict[Any, float]:
+        entity_vector = model["vectors"].get(entity.id)
+        if entity_vector is None:
+            entity_vector = self._vectorize_entity(entity, model)
+        return entity_vector
 
     def _calculate_attribute_similarity(self, val1: str, val2: str) -> float:
         return self._cosine_similarity(val1, val2)
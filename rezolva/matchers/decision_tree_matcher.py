@@ -1,7 +1,8 @@
 import random
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from ..core.base import ClusteringAlgorithm, Entity, Matcher
+from .base_matcher import TopKMatches
 
 
 class DecisionTreeNode:
@@ -49,14 +50,16 @@ class DecisionTreeMatcher(Matcher):
     def train(self, pairs: List[Tuple[Entity, Entity]], labels: List[bool]):
         self.tree = self._build_tree(pairs, labels, 0)
 
-    def match(self, entity: Entity, candidates: List[Entity]) -> List[Tuple[Entity, float]]:
-        matches = []
+    def match(
+        self, entity: Entity, candidates: List[Entity], top_k: Optional[int] = None
+    ) -> List[Tuple[Entity, float]]:
+        matches = TopKMatches(top_k)
         for candidate in candidates:
             if candidate.id != entity.id:
                 similarity = self._predict(entity, candidate)
                 if similarity > 0.5:
-                    matches.append((candidate, similarity))
-        return self.apply_clustering(sorted(matches, key=lambda x: x[1], reverse=True))
+                    matches.add(candidate, similarity)
+        return self.apply_clustering(matches.sorted())
 
     def _build_tree(self, pairs: List[Tuple[Entity, Entity]], labels: List[bool], depth: int) -> DecisionTreeNode:
         if depth == self.max_depth or len(set(labels)) == 1:
@@ -1,4 +1,9 @@
-from .base_matcher import BaseAttributeMatcher
+import itertools
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from ..core.base import ClusteringAlgorithm, Entity
+from ..utils.set_similarity_join import SetSimilarityJoin
+from .base_matcher import BaseAttributeMatcher, TopKMatches
 
 
 class JaccardMatcher(BaseAttributeMatcher):
@@ -22,14 +27,130 @@ class JaccardMatcher(BaseAttributeMatcher):
     - Doesn't consider the frequency of items, only their presence or absence
     - May not work well for very short text where small differences have a large impact
 
+    Training indexes the word sets of one attribute in a SetSimilarityJoin (PPJoin+ prefix filtering).
+    With non-negative weights, a candidate can only reach the threshold if the Jaccard similarity of
+    each attribute a reaches 1 - (1 - threshold) * total_weight / weight(a), so the attribute with the
+    highest such bound is indexed for it. Blocks of at least `min_batch_candidates` candidates are then
+    narrowed down to the indexed candidates found by looking up the query in the index (candidates that
+    are not indexed are all compared), and `self_join` finds the matching pairs among many entities
+    without comparing every pair. Without a positive bound, e.g. with a low threshold spread over
+    several attributes, every candidate is compared.
+
     :param threshold: The similarity threshold above which entities are considered a match
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
+    :param attribute_costs: A dictionary mapping attribute names to their relative comparison cost
+    :param min_batch_candidates: The number of candidates from which a block is matched through the set-similarity join
     """
 
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        attribute_weights: Dict[str, float] = None,
+        clustering_algorithm: ClusteringAlgorithm = None,
+        attribute_costs: Dict[str, float] = None,
+        min_batch_candidates: int = 32,
+    ):
+        super().__init__(threshold, attribute_weights, clustering_algorithm, attribute_costs, min_batch_candidates)
+        self.join: Optional[SetSimilarityJoin] = None
+        self.join_attribute: Optional[str] = None
+
+    def train(self, entities: List[Entity]):
+        self.join_attribute, join_threshold = self._join_bound()
+        self.join = None
+        if self.join_attribute is not None:
+            self.join = SetSimilarityJoin(join_threshold)
+            self.join.build(self._attribute_sets(entities, self.join_attribute))
+
+    def update(self, entities: List[Entity]):
+        """
+        Index the word sets of new or changed entities.
+
+        :param entities: The entities to index
+        """
+        if self.join is not None:
+            self.join.add(self._attribute_sets(entities, self.join_attribute))
+
+    def remove(self, entity_ids: Iterable[Any]):
+        """
+        Drop removed entities from the index.
+
+        :param entity_ids: The IDs of the removed entities
+        """
+        if self.join is not None:
+            self.join.remove(entity_ids)
+
+    def match(self, entity: Entity, model: dict, top_k: Optional[int] = None) -> List[Tuple[Entity, float]]:
+        candidates = model["entities"]
+        attr, join_threshold = self._join_bound()
+        if (
+            self.join is None
+            or attr != self.join_attribute
+            or join_threshold < self.join.threshold
+            or len(candidates) < self.min_batch_candidates
+        ):
+            return super().match(entity, model, top_k)
+
+        found = dict(self.join.query(self._words(str(entity.attributes.get(attr, ""))), join_threshold))
+        selected = [
+            candidate
+            for candidate_id, candidate in candidates.items()
+            if candidate_id in found or candidate_id not in self.join
+        ]
+        matches = TopKMatches(top_k)
+        self._match_candidates(entity, selected, matches)
+        return self.apply_clustering(matches.sorted())
+
+    def self_join(self, entities: Iterable[Entity]) -> Iterator[Tuple[Entity, Entity, float]]:
+        """
+        Find the matching pairs among entities, each pair once.
+
+        The word sets of the most selective attribute are joined with a SetSimilarityJoin, and only the
+        pairs it finds are scored on every attribute. Without a positive bound for any attribute, every
+        pair is scored.
+
+        :param entities: The entities to match with each other
+        :return: An iterator of (entity, match, score) tuples
+        """
+        entities = {entity.id: entity for entity in entities}
+        attr, join_threshold = self._join_bound()
+        if attr is None:
+            pairs = itertools.combinations(entities, 2)
+        else:
+            join = SetSimilarityJoin(join_threshold)
+            join.build(self._attribute_sets(entities.values(), attr))
+            pairs = ((id1, id2) for id1, id2, _ in join.self_join())
+
+        for id1, id2 in pairs:
+            similarity = self._calculate_weighted_similarity(entities[id1], entities[id2])
+            if similarity >= self.threshold:
+                yield entities[id1], entities[id2], similarity
+
+    def _join_bound(self) -> Tuple[Optional[str], float]:
+        # The attribute with the highest Jaccard similarity every match needs, if it is positive
+        total_weight = sum(self.attribute_weights.values())
+        if total_weight <= 0 or any(weight < 0 for weight in self.attribute_weights.values()):
+            return None, 0.0
+        bounds = {
+            attr: 1 - (1 - self.threshold) * total_weight / weight - 1e-9
+            for attr, weight in self.attribute_weights.items()
+            if weight > 0
+        }
+        attr = max(bounds, key=bounds.get, default=None)
+        if attr is None or bounds[attr] <= 0:
+            return None, 0.0
+        return attr, min(bounds[attr], 1.0)
+
+    def _attribute_sets(self, entities: Iterable[Entity], attr: str) -> Dict[Any, FrozenSet[str]]:
+        return {entity.id: self._words(str(entity.attributes.get(attr, ""))) for entity in entities}
+
+    @staticmethod
+    def _words(value: str) -> FrozenSet[str]:
+        return frozenset(value.lower().split())
+
     def _calculate_attribute_similarity(self, val1: str, val2: str) -> float:
-        set1 = set(val1.lower().split())
-        set2 = set(val2.lower().split())
+        set1 = self._words(val1)
+        set2 = self._words(val2)
 
         if not set1 and not set2:
             return 1.0
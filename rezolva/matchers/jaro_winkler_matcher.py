@@ -1,3 +1,8 @@
+import bisect
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..core.base import ClusteringAlgorithm
 from .base_matcher import BaseAttributeMatcher
 
 
@@ -22,14 +27,131 @@ class JaroWinklerMatcher(BaseAttributeMatcher):
     - May not be suitable for long strings or sentences
     - Can be computationally expensive for large datasets
 
+    Pairs that cannot reach the similarity needed by the comparison plan are skipped on an exact upper
+    bound: at most as many characters as the shorter string has can match, and the common prefix is
+    known, which bounds the Jaro-Winkler similarity from the two lengths alone. Optionally, the
+    characters of the candidate that do not occur in the query at all tighten the bound.
+    similarity_many groups the distinct candidate values by length and only compares the values whose
+    length lies in the window that can reach the needed similarity.
+
     :param threshold: The similarity threshold above which entities are considered a match
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
+    :param attribute_costs: A dictionary mapping attribute names to their relative comparison cost
+    :param character_bound: Whether to also bound the similarity by the characters both strings have in common
+    :param min_batch_candidates: The number of candidates from which a block is compared through similarity_many
     """
 
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        attribute_weights: Dict[str, float] = None,
+        clustering_algorithm: ClusteringAlgorithm = None,
+        attribute_costs: Dict[str, float] = None,
+        character_bound: bool = False,
+        min_batch_candidates: int = 32,
+    ):
+        super().__init__(threshold, attribute_weights, clustering_algorithm, attribute_costs, min_batch_candidates)
+        self.character_bound = character_bound
+
+    def similarity_many(
+        self, query: str, candidates: Sequence[str], min_similarity: float = float("-inf")
+    ) -> List[float]:
+        """
+        Calculate the similarity of a query with each of many candidate values.
+
+        The distinct candidate values are indexed by length, and only the lengths within the window that
+        can reach min_similarity are compared. Values outside it get their Jaro similarity bound, below min_similarity.
+
+        :param query: The query value
+        :param candidates: The candidate values
+        :param min_similarity: The similarity below which the exact value is not needed
+        :return: The similarity with each candidate, exact if it is at least min_similarity
+        """
+        by_length = {}
+        for candidate in candidates:
+            by_length.setdefault(len(candidate), {})[candidate] = None
+        lengths = sorted(by_length)
+
+        low, high = 0, len(lengths)
+        window = self._length_window(len(query), min_similarity)
+        if window is not None:
+            low, high = bisect.bisect_left(lengths, window[0]), bisect.bisect_right(lengths, window[1])
+
+        similarities = {}
+        for length in lengths[:low] + lengths[high:]:
+            # Any value below min_similarity will do, and the Jaro bound from the lengths alone is below it
+            matches = min(len(query), length)
+            bound = (matches / len(query) + matches / length + 1) / 3 if matches else 0.0
+            similarities.update(dict.fromkeys(by_length[length], bound))
+        query_characters = self._character_table(query) if self.character_bound else None
+        for length in lengths[low:high]:
+            for candidate in by_length[length]:
+                similarities[candidate] = self._bounded_similarity(query, candidate, min_similarity, query_characters)
+        return [similarities[candidate] for candidate in candidates]
+
     def _calculate_attribute_similarity(self, val1: str, val2: str) -> float:
         return self._jaro_winkler_similarity(val1, val2)
 
+    def _calculate_bounded_similarity(self, val1: str, val2: str, min_similarity: float) -> float:
+        return self._bounded_similarity(val1, val2, min_similarity)
+
+    def _bounded_similarity(
+        self, val1: str, val2: str, min_similarity: float, characters: Optional[Dict[int, None]] = None
+    ) -> float:
+        if min_similarity > 0:
+            bound = self._similarity_bound(val1, val2, characters)
+            if bound < min_similarity:
+                return bound
+        return self._jaro_winkler_similarity(val1, val2)
+
+    def _similarity_bound(self, s1: str, s2: str, characters: Optional[Dict[int, None]] = None) -> float:
+        """
+        Calculate an upper bound of the Jaro-Winkler similarity without matching the characters.
+
+        At most min(len(s1), len(s2)) characters match (and, with character_bound, no character of s2
+        that does not occur in s1), and with no transpositions the Jaro similarity is at most
+        (m / len(s1) + m / len(s2) + 1) / 3. The Winkler adjustment increases with the Jaro similarity,
+        so applying it with the actual common prefix keeps the bound exact.
+
+        :param s1: The first string
+        :param s2: The second string
+        :param characters: The translation table deleting the characters of s1, if already built
+        :return: The upper bound
+        """
+        if not s1 or not s2:
+            return self._jaro_winkler_similarity(s1, s2)
+        matches = min(len(s1), len(s2))
+        if self.character_bound:
+            if characters is None:
+                characters = self._character_table(s1)
+            # The characters of s2 left after deleting those of s1 cannot match
+            matches = min(matches, len(s2) - len(s2.translate(characters)))
+            if matches == 0:
+                return 0.0
+
+        jaro_bound = (matches / len(s1) + matches / len(s2) + 1) / 3
+        prefix_length = 0
+        for char1, char2 in zip(s1, s2):
+            if char1 != char2 or prefix_length == 4:
+                break
+            prefix_length += 1
+        return jaro_bound + (prefix_length * 0.1 * (1 - jaro_bound))
+
+    @staticmethod
+    def _character_table(s: str) -> Dict[int, None]:
+        return dict.fromkeys(map(ord, set(s)))
+
+    @staticmethod
+    def _length_window(length: int, min_similarity: float) -> Optional[Tuple[int, int]]:
+        # With a common prefix of at most 4 characters, a similarity of min_similarity needs a Jaro
+        # similarity of at least (min_similarity - 0.4) / 0.6, i.e. a length ratio of at least
+        # 5 * min_similarity - 4
+        min_ratio = 5 * min_similarity - 4
+        if min_ratio <= 0:
+            return None
+        return math.ceil(length * min_ratio - 1e-9), math.floor(length / min_ratio + 1e-9)
+
     def _jaro_winkler_similarity(self, s1: str, s2: str) -> float:
         jaro_distance = self._jaro_distance(s1, s2)
         prefix_length = 0
@@ -47,31 +169,37 @@ class JaroWinklerMatcher(BaseAttributeMatcher):
         if not s1 or not s2:
             return 0.0
         match_distance = (max(len(s1), len(s2)) // 2) - 1
-        s1_matches = [0] * len(s1)
-        s2_matches = [0] * len(s2)
-        matches = 0
-        transpositions = 0
-        for i in range(len(s1)):
-            start = max(0, i - match_distance)
-            end = min(i + match_distance + 1, len(s2))
-            for j in range(start, end):
-                if s2_matches[j]:
-                    continue
-                if s1[i] != s2[j]:
-                    continue
-                s1_matches[i] = 1
-                s2_matches[j] = 1
-                matches += 1
-                break
+        if match_distance < 0:
+            return 0.0
+
+        # The positions of each character in s2, and the positions not matched yet, as the bits of integers,
+        # so the first unmatched occurrence of a character within the match window is found in a few operations
+        positions = {}
+        for j, c in enumerate(s2):
+            positions[c] = positions.get(c, 0) | (1 << j)
+        window = (1 << (2 * match_distance + 1)) - 1
+        unmatched = (1 << len(s2)) - 1
+        s1_matches = []
+        for i, c in enumerate(s1):
+            found = positions.get(c, 0) & unmatched
+            if found:
+                if i >= match_distance:
+                    found &= window << (i - match_distance)
+                else:
+                    found &= window >> (match_distance - i)
+                if found:
+                    unmatched ^= found & -found
+                    s1_matches.append(c)
+        matches = len(s1_matches)
         if matches == 0:
             return 0.0
-        k = 0
-        for i in range(len(s1)):
-            if not s1_matches[i]:
-                continue
-            while not s2_matches[k]:
-                k += 1
-            if s1[i] != s2[k]:
+
+        # The matched characters of both strings are compared in order
+        s2_matches = ((1 << len(s2)) - 1) ^ unmatched
+        transpositions = 0
+        for c in s1_matches:
+            lowest = s2_matches & -s2_matches
+            s2_matches ^= lowest
+            if c != s2[lowest.bit_length() - 1]:
                 transpositions += 1
-            k += 1
         return ((matches / len(s1)) + (matches / len(s2)) + ((matches - transpositions / 2) / matches)) / 3.0
@@ -1,3 +1,6 @@
+import math
+from typing import Dict, List, Optional, Sequence
+
 from .base_matcher import BaseAttributeMatcher
 
 
@@ -23,28 +26,153 @@ class LevenshteinMatcher(BaseAttributeMatcher):
     - Can be computationally expensive for long strings
     - Doesn't consider semantic similarity, only syntactic
 
+    When matching, the similarity an attribute needs for a candidate to still reach the threshold (or
+    the top-k floor) fixes the largest edit distance worth computing. Pairs whose lengths differ by
+    more are rejected outright, and the distance computation stops as soon as it is certain to exceed
+    it. Distances are computed with Myers' bit-parallel algorithm, one column of the matrix per few
+    integer operations, when the shorter string has at most 64 characters, and otherwise with dynamic
+    programming over a band of 2k + 1 cells around the diagonal.
+
     :param threshold: The similarity threshold above which entities are considered a match
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
     """
 
+    def similarity_many(
+        self, query: str, candidates: Sequence[str], min_similarity: float = float("-inf")
+    ) -> List[float]:
+        """
+        Calculate the similarity of a query with each of many candidate values.
+
+        The query is encoded once as the pattern of Myers' algorithm (when it has at most 64 characters),
+        and each distinct candidate value is compared once.
+
+        :param query: The query value
+        :param candidates: The candidate values
+        :param min_similarity: The similarity below which the exact value is not needed
+        :return: The similarity with each candidate, exact if it is at least min_similarity
+        """
+        pattern = self._pattern(query) if 0 < len(query) <= 64 else None
+        similarities = {}
+        results = []
+        for candidate in candidates:
+            similarity = similarities.get(candidate)
+            if similarity is None:
+                similarity = self._bounded_similarity(query, candidate, min_similarity, pattern)
+                similarities[candidate] = similarity
+            results.append(similarity)
+        return results
+
     def _calculate_attribute_similarity(self, val1: str, val2: str) -> float:
-        distance = self._levenshtein_distance(val1, val2)
+        return self._bounded_similarity(val1, val2, float("-inf"))
+
+    def _calculate_bounded_similarity(self, val1: str, val2: str, min_similarity: float) -> float:
+        return self._bounded_similarity(val1, val2, min_similarity)
+
+    def _bounded_similarity(
+        self, val1: str, val2: str, min_similarity: float, pattern: Optional[Dict[str, int]] = None
+    ) -> float:
         max_length = max(len(val1), len(val2))
-        return 1 - (distance / max_length) if max_length > 0 else 1
+        if max_length == 0:
+            return 1
+        if min_similarity > 1:
+            return 0.0
+
+        max_distance = None
+        if min_similarity > 0:
+            # The largest distance whose similarity still reaches min_similarity
+            max_distance = math.floor((1 - min_similarity) * max_length + 1e-9)
+        distance = self._levenshtein_distance(val1, val2, max_distance, pattern)
+        return 1 - (distance / max_length)
+
+    def _levenshtein_distance(
+        self, s1: str, s2: str, max_distance: Optional[int] = None, pattern: Optional[Dict[str, int]] = None
+    ) -> int:
+        """
+        Calculate the Levenshtein distance of two strings, stopping once it exceeds max_distance.
 
-    def _levenshtein_distance(self, s1: str, s2: str) -> int:
+        :param s1: The first string
+        :param s2: The second string
+        :param max_distance: The largest distance of interest (no limit if None)
+        :param pattern: The bit vectors of s1 from `_pattern`, to use s1 as the pattern of Myers' algorithm
+        :return: The distance, or max_distance + 1 if the distance is larger
+        """
+        if max_distance is not None and abs(len(s1) - len(s2)) > max_distance:
+            return max_distance + 1
+        if len(s1) == 0 or len(s2) == 0:
+            return max(len(s1), len(s2))
+        if pattern is not None:
+            return self._myers_distance(s2, s1, max_distance, pattern)
         if len(s1) < len(s2):
-            return self._levenshtein_distance(s2, s1)
-        if len(s2) == 0:
-            return len(s1)
-        previous_row = range(len(s2) + 1)
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        return previous_row[-1]
+            s1, s2 = s2, s1
+        if len(s2) <= 64:
+            return self._myers_distance(s1, s2, max_distance)
+        return self._banded_distance(s1, s2, max_distance)
+
+    @staticmethod
+    def _pattern(s: str) -> Dict[str, int]:
+        # The positions of each character of the pattern, as the bits of an integer
+        peq = {}
+        for i, c in enumerate(s):
+            peq[c] = peq.get(c, 0) | (1 << i)
+        return peq
+
+    def _myers_distance(
+        self, s1: str, s2: str, max_distance: Optional[int], pattern: Optional[Dict[str, int]] = None
+    ) -> int:
+        # Myers' bit-parallel algorithm: each column of the DP matrix (one cell per character of the
+        # pattern s2) is encoded as bit vectors of its +1 and -1 vertical differences, and the next
+        # column is computed with a handful of integer operations
+        peq = self._pattern(s2) if pattern is None else pattern
+        mask = (1 << len(s2)) - 1
+        last = 1 << (len(s2) - 1)
+        pv, mv, distance = mask, 0, len(s2)
+        remaining = len(s1)
+        for c in s1:
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            if ph & last:
+                distance += 1
+            elif mh & last:
+                distance -= 1
+            remaining -= 1
+            # Each remaining character lowers the distance by one at most
+            if max_distance is not None and distance - remaining > max_distance:
+                return max_distance + 1
+            ph = (ph << 1) | 1
+            mh <<= 1
+            pv = (mh | ~(xv | ph)) & mask
+            mv = ph & xv & mask
+        return distance
+
+    def _banded_distance(self, s1: str, s2: str, max_distance: Optional[int]) -> int:
+        # Only the cells within max_distance of the diagonal can lead to a distance of at most
+        # max_distance, so each row is computed over a band of 2 * max_distance + 1 cells
+        n, m = len(s1), len(s2)
+        limit = n if max_distance is None else max_distance
+        exceeded = limit + 1
+        previous = [j if j <= limit else exceeded for j in range(m + 1)]
+        current = [exceeded] * (m + 1)
+        for i in range(1, n + 1):
+            low, high = max(1, i - limit), min(m, i + limit)
+            current[low - 1] = i if low == 1 else exceeded
+            row_min = current[low - 1]
+            c1 = s1[i - 1]
+            for j in range(low, high + 1):
+                distance = previous[j - 1] + (c1 != s2[j - 1])
+                if previous[j] + 1 < distance:
+                    distance = previous[j] + 1
+                if current[j - 1] + 1 < distance:
+                    distance = current[j - 1] + 1
+                if distance > exceeded:
+                    distance = exceeded
+                current[j] = distance
+                if distance < row_min:
+                    row_min = distance
+            if row_min > limit:
+                return exceeded
+            previous, current = current, previous
+        return previous[m] if previous[m] <= limit else exceeded
@@ -1,7 +1,8 @@
-import hashlib
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 from ..core.base import ClusteringAlgorithm, Entity, Matcher
+from ..utils.minhash import MinHashSigner, matching_values, pack_signature
+from .base_matcher import TopKMatches
 
 
 class MinHashMatcher(Matcher):
@@ -16,6 +17,11 @@ class MinHashMatcher(Matcher):
     2. Apply multiple hash functions to each feature set to create MinHash signatures
     3. Compare MinHash signatures to estimate Jaccard similarity
 
+    The signatures of the entities the matcher is trained on are computed once, packed into one
+    integer per attribute, and cached by entity ID, so matching only signs the query entity and
+    counts equal hash values of packed signatures with a few integer operations, independently of
+    the number of words of the candidates.
+
     Advantages:
     - Efficient for large datasets
     - Can handle high-dimensional data well
@@ -29,6 +35,7 @@ class MinHashMatcher(Matcher):
     :param num_hash_functions: The number of hash functions to use for MinHash
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
+    :param seed: The seed of the random hash functions
     """
 
     def __init__(
@@ -37,48 +44,82 @@ class MinHashMatcher(Matcher):
         num_hash_functions: int = 100,
         attribute_weights: Dict[str, float] = None,
         clustering_algorithm: ClusteringAlgorithm = None,
+        seed: int = 1,
     ):
         super().__init__(clustering_algorithm)
         self.threshold = threshold
         self.num_hash_functions = num_hash_functions
         self.attribute_weights = attribute_weights or {}
-        self.hash_functions = self._generate_hash_functions()
+        self.signer = MinHashSigner(num_hash_functions, seed)
+        self.signatures: Dict[Any, Tuple[int, ...]] = {}
 
-    def _generate_hash_functions(self):
-        return [
-            lambda x, i=i: int(hashlib.md5(f"{x}{i}".encode()).hexdigest(), 16) % (2**32 - 1)
-            for i in range(self.num_hash_functions)
-        ]
+    def train(self, entities: List[Entity]):
+        self.signatures = {}
+        self.update(entities)
 
-    def _minhash_signature(self, text: str) -> List[int]:
-        words = set(text.lower().split())
-        signature = [min(h(word) for word in words) for h in self.hash_functions]
-        return signature
+    def update(self, entities: List[Entity]):
+        """
+        Compute and cache the signatures of new or changed entities.
+
+        :param entities: The entities to sign
+        """
+        entities = list(entities)
+        for entity, signatures in zip(entities, self._sign(entities)):
+            self.signatures[entity.id] = signatures
 
-    def match(self, entity: Entity, candidates: List[Entity]) -> List[Tuple[Entity, float]]:
-        matches = []
-        entity_signatures = {
-            attr: self._minhash_signature(str(entity.attributes.get(attr, ""))) for attr in self.attribute_weights
-        }
+    def remove(self, entity_ids: Iterable[Any]):
+        """
+        Drop the cached signatures of removed entities.
+
+        :param entity_ids: The IDs of the removed entities
+        """
+        for entity_id in entity_ids:
+            self.signatures.pop(entity_id, None)
+
+    def _minhash_signature(self, text: str) -> List[int]:
+        return self.signer.signature(set(text.lower().split()))
+
+    def _sign(self, entities: List[Entity]) -> List[Tuple[int, ...]]:
+        # Each attribute is signed in one batch, and its signatures are packed for comparison
+        attribute_signatures = [
+            [
+                pack_signature(signature)
+                for signature in self.signer.signatures(
+                    set(str(entity.attributes.get(attr, "")).lower().split()) for entity in entities
+                )
+            ]
+            for attr in self.attribute_weights
+        ]
+        return list(zip(*attribute_signatures)) if attribute_signatures else [() for _ in entities]
+
+    def match(
+        self, entity: Entity, candidates: Union[Dict, List[Entity]], top_k: Optional[int] = None
+    ) -> List[Tuple[Entity, float]]:
+        matches = TopKMatches(top_k)
+        # The resolver passes its candidates in a model dictionary, they can also be given as a list
+        if isinstance(candidates, dict):
+            candidates = list(candidates["entities"].values())
+        candidates = [candidate for candidate in candidates if candidate.id != entity.id]
+
+        # Candidates signed during training are not signed again, the others are signed in one batch
+        missing = [candidate for candidate in candidates if candidate.id not in self.signatures]
+        signed = dict(zip((candidate.id for candidate in missing), self._sign(missing)))
+        entity_signatures = self._sign([entity])[0]
 
         for candidate in candidates:
-            if candidate.id != entity.id:
-                similarity = self._calculate_weighted_similarity(entity_signatures, candidate)
-                if similarity >= self.threshold:
-                    matches.append((candidate, similarity))
-
-        return self.apply_clustering(sorted(matches, key=lambda x: x[1], reverse=True))
-
-    def _calculate_weighted_similarity(self, entity_signatures: Dict[str, List[int]], candidate: Entity) -> float:
-        similarities = []
-        weights = []
-
-        for attr, weight in self.attribute_weights.items():
-            candidate_signature = self._minhash_signature(str(candidate.attributes.get(attr, "")))
-            similarity = (
-                sum(a == b for a, b in zip(entity_signatures[attr], candidate_signature)) / self.num_hash_functions
-            )
-            similarities.append(similarity)
-            weights.append(weight)
-
-        return sum(s * w for s, w in zip(similarities, weights)) / sum(weights)
+            candidate_signatures = signed[candidate.id] if candidate.id in signed else self.signatures[candidate.id]
+            similarity = self._calculate_weighted_similarity(entity_signatures, candidate_signatures)
+            if similarity >= self.threshold:
+                matches.add(candidate, similarity)
+
+        return self.apply_clustering(matches.sorted())
+
+    def _calculate_weighted_similarity(
+        self, entity_signatures: Tuple[int, ...], candidate_signatures: Tuple[int, ...]
+    ) -> float:
+        weights = self.attribute_weights.values()
+        matching = sum(
+            weight * matching_values(signature1, signature2, self.num_hash_functions)
+            for weight, signature1, signature2 in zip(weights, entity_signatures, candidate_signatures)
+        )
+        return matching / (self.num_hash_functions * sum(weights))
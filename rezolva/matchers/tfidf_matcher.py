@@ -1,5 +1,6 @@
 import math
-from typing import Dict, List
+from array import array
+from typing import Any, Dict, Iterable, List, Tuple
 
 from ..core.base import ClusteringAlgorithm, Entity
 from .base_matcher import BaseAttributeMatcher
@@ -16,6 +17,11 @@ class TfIdfMatcher(BaseAttributeMatcher):
     1. Compute TF-IDF vectors for all entities in the dataset
     2. For each comparison, calculate the similarity between TF-IDF vectors (often using cosine similarity)
 
+    Training also precomputes the TF-IDF vector of each attribute of each training entity, as arrays of
+    term IDs and weights normalized to unit length. The cosine similarity of a query with a trained
+    candidate is then a single sparse dot product with the query's vector, built once per query,
+    without processing the candidate's text again.
+
     Advantages:
     - Considers both the frequency of terms in a document and their importance in the entire corpus
     - Reduces the impact of common words that don't contribute much to similarity
@@ -28,6 +34,7 @@ class TfIdfMatcher(BaseAttributeMatcher):
     :param threshold: The similarity threshold above which entities are considered a match
     :param attribute_weights: A dictionary mapping attribute names to their importance in matching
     :param clustering_algorithm: A ClusteringAlgorithm object for clustring matched results
+    :param attribute_costs: A dictionary mapping attribute names to their relative comparison cost
     """
 
     def __init__(
@@ -35,10 +42,13 @@ class TfIdfMatcher(BaseAttributeMatcher):
         threshold: float = 0.3,
         attribute_weights: Dict[str, float] = None,
         clustering_algorithm: ClusteringAlgorithm = None,
+        attribute_costs: Dict[str, float] = None,
     ):
-        super().__init__(threshold, attribute_weights, clustering_algorithm)
+        super().__init__(threshold, attribute_weights, clustering_algorithm, attribute_costs)
         self.idf = {}
         self.doc_count = 0
+        self.term_ids: Dict[str, int] = {}
+        self.vectors: Dict[Any, Dict[str, Tuple[array, array]]] = {}
 
     def train(self, entities: List[Entity]):
         self.doc_count = len(entities)
@@ -50,13 +60,68 @@ class TfIdfMatcher(BaseAttributeMatcher):
             for word in words:
                 word_doc_count[word] = word_doc_count.get(word, 0) + 1
         self.idf = {word: math.log(self.doc_count / count) for word, count in word_doc_count.items()}
+        self.term_ids = {word: term_id for term_id, word in enumerate(self.idf)}
+        self.vectors = {}
+        self.update(entities)
+
+    def update(self, entities: List[Entity]):
+        """
+        Precompute the normalized TF-IDF vectors of new or changed entities, with the trained IDF.
+
+        :param entities: The entities to vectorize
+        """
+        for entity in entities:
+            self.vectors[entity.id] = {
+                attr: self._vectorize(str(entity.attributes.get(attr, ""))) for attr in self.attribute_weights
+            }
+
+    def remove(self, entity_ids: Iterable[Any]):
+        """
+        Drop the precomputed vectors of removed entities.
+
+        :param entity_ids: The IDs of the removed entities
+        """
+        for entity_id in entity_ids:
+            self.vectors.pop(entity_id, None)
+
+    def _compile_comparison_plan(self, entity: Entity) -> Tuple[List[Tuple[str, float, Any]], float, bool]:
+        self._check_trained()
+        steps, total_weight, can_abandon = super()._compile_comparison_plan(entity)
+        # The query vectors are built once, as term weights by term ID for the dot products
+        steps = [(attr, weight, dict(zip(*self._vectorize(value)))) for attr, weight, value in steps]
+        return steps, total_weight, can_abandon
+
+    def _compare_attribute(self, attr: str, value: Dict[int, float], candidate: Entity, min_similarity: float) -> float:
+        vectors = self.vectors.get(candidate.id)
+        if vectors is not None:
+            terms, weights = vectors[attr]
+        else:
+            terms, weights = self._vectorize(str(candidate.attributes.get(attr, "")))
+        return self._dot_product(value, terms, weights)
 
     def _calculate_attribute_similarity(self, val1: str, val2: str) -> float:
+        self._check_trained()
+        return self._dot_product(dict(zip(*self._vectorize(val1))), *self._vectorize(val2))
+
+    def _check_trained(self):
         if not self.idf:
             raise ValueError("TfIdfMatcher needs to be trained first. Call train() with your entities.")
-        tfidf1 = self._calculate_tfidf(val1)
-        tfidf2 = self._calculate_tfidf(val2)
-        return self._cosine_similarity(tfidf1, tfidf2)
+
+    def _vectorize(self, text: str) -> Tuple[array, array]:
+        # Terms unknown to the trained IDF, or in every document, have no weight and are left out
+        tfidf = {word: weight for word, weight in self._calculate_tfidf(text).items() if weight > 0}
+        magnitude = math.sqrt(sum(weight**2 for weight in tfidf.values()))
+        terms = array("l", (self.term_ids[word] for word in tfidf))
+        weights = array("d", (weight / magnitude for weight in tfidf.values()))
+        return terms, weights
+
+    @staticmethod
+    def _dot_product(query: Dict[int, float], terms: array, weights: array) -> float:
+        if not query:
+            return 0.0
+        get = query.get
+        # The vectors have unit length, rounding can only take their dot product a little over 1
+        return min(1.0, sum(weight * get(term, 0.0) for term, weight in zip(terms, weights)))
 
     def _calculate_tfidf(self, text: str) -> dict:
         words = text.lower().split()
@@ -65,12 +130,3 @@ class TfIdfMatcher(BaseAttributeMatcher):
             word_count[word] = word_count.get(word, 0) + 1
         max_count = max(word_count.values()) if word_count else 1
         return {word: (count / max_count) * self.idf.get(word, 0) for word, count in word_count.items()}
-
-    def _cosine_similarity(self, vec1: dict, vec2: dict) -> float:
-        intersection = set(vec1.keys()) & set(vec2.keys())
-        dot_product = sum(vec1[x] * vec2[x] for x in intersection)
-        magnitude1 = math.sqrt(sum(v**2 for v in vec1.values()))
-        magnitude2 = math.sqrt(sum(v**2 for v in vec2.values()))
-        if magnitude1 * magnitude2 == 0:
-            return 0
-        return dot_product / (magnitude1 * magnitude2)
@@ -1,5 +1,5 @@
 import re
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 from ..core.base import Entity, ModelBuilder
 
@@ -54,3 +54,17 @@ class InvertedIndexModelBuilder(ModelBuilder):
 
     def _tokenize(self, text: str) -> List[str]:
         return re.findall(r"\w+", text.lower())
+
+    def remove(self, model: Any, entity_ids: Iterable[Any]) -> Any:
+        for entity_id in entity_ids:
+            entity = model["entities"].pop(entity_id, None)
+            if entity is None:
+                continue
+            for attr in self.attributes:
+                for token in self._tokenize(entity.attributes.get(attr, "")):
+                    postings = model["index"].get(token)
+                    if postings is not None:
+                        postings.discard(entity_id)
+                        if not postings:
+                            del model["index"][token]
+        return model
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 from ..core.base import Entity, ModelBuilder
 
@@ -52,6 +52,20 @@ class PhoneticModelBuilder(ModelBuilder):
                 model["phonetic_index"][phonetic_code].add(entity.id)
         return model
 
+    def remove(self, model: Any, entity_ids: Iterable[Any]) -> Any:
+        for entity_id in entity_ids:
+            entity = model["entities"].pop(entity_id, None)
+            if entity is None:
+                continue
+            for attr in self.attributes:
+                phonetic_code = self._soundex(str(entity.attributes.get(attr, "")))
+                postings = model["phonetic_index"].get(phonetic_code)
+                if postings is not None:
+                    postings.discard(entity_id)
+                    if not postings:
+                        del model["phonetic_index"][phonetic_code]
+        return model
+
     def _soundex(self, s: str) -> str:
         if not s:
             return "0000"
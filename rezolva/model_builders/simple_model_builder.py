@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 from ..core.base import Entity, ModelBuilder
 
@@ -56,3 +56,17 @@ class SimpleModelBuilder(ModelBuilder):
                         model["index"][attr][value] = set()
                     model["index"][attr][value].add(entity.id)
         return model
+
+    def remove(self, model: Any, entity_ids: Iterable[Any]) -> Any:
+        for entity_id in entity_ids:
+            entity = model["entities"].pop(entity_id, None)
+            if entity is None:
+                continue
+            for attr in self.attributes:
+                value = entity.attributes.get(attr, "").lower()
+                postings = model["index"].get(attr, {}).get(value)
+                if postings is not None:
+                    postings.discard(entity_id)
+                    if not postings:
+                        del model["index"][attr][value]
+        return model
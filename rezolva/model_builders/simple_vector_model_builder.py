@@ -1,8 +1,9 @@
 import math
 from collections import Counter
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 from ..core.base import Entity, ModelBuilder
+from ..utils.sparse_matrix import SparseMatrix
 
 
 class SimpleVectorModelBuilder(ModelBuilder):
@@ -22,6 +23,15 @@ class SimpleVectorModelBuilder(ModelBuilder):
     - A dictionary of entity vectors
     - The global vocabulary
     - IDF values for each term in the vocabulary
+    - Document frequencies and postings (entity IDs) for each term, and the current number of documents
+    - The vectors as a SparseMatrix with unit-length rows, used to score vectors in batches
+
+    Adding and removing entities updates the document frequencies, postings and number of documents
+    of the terms they contain, and vectorizes only the added entities. The IDF of every term depends on
+    the number of documents, so the IDF values and the vectors are only recomputed for all entities
+    once the documents added or removed since the last recomputation exceed reweight_ratio times the
+    number of documents. Until then, the vectors keep the IDF values they were computed with (new terms
+    get theirs when first added), and the cost of recomputing is spread over the updates that called for it.
 
     This model is particularly useful for cosine similarity-based matching and can handle
     partial matches and fuzzy matching more effectively than simple index-based models.
@@ -31,17 +41,20 @@ class SimpleVectorModelBuilder(ModelBuilder):
     model = builder.train(entities)
 
     :param attributes: A list of attribute names to be vectorized
+    :param reweight_ratio: The fraction of the documents that can be added or removed before the IDF values
+        and vectors are recomputed (0 recomputes them on every update, like retraining)
     :inherits: ModelBuilder
     """
 
-    def __init__(self, attributes: List[str]):
+    def __init__(self, attributes: List[str], reweight_ratio: float = 0.1):
         self.attributes = attributes
+        self.reweight_ratio = reweight_ratio
         self.vocabulary = set()
 
     def train(self, entities: List[Entity]) -> Any:
-        model = {"entities": {}, "vectors": {}, "idf": {}}
+        model = {"entities": {}, "vectors": {}, "idf": {}, "doc_freq": {}, "postings": {}, "num_docs": 0}
 
-        # Build vocabulary and document frequency
+        # Build vocabulary, document frequency and postings
         doc_freq = Counter()
         for entity in entities:
             model["entities"][entity.id] = entity
@@ -51,28 +64,112 @@ class SimpleVectorModelBuilder(ModelBuilder):
                 self.vocabulary.update(terms)
                 entity_terms.update(terms)
             doc_freq.update(entity_terms)
+            for term in entity_terms:
+                if term not in model["postings"]:
+                    model["postings"][term] = set()
+                model["postings"][term].add(entity.id)
+        model["doc_freq"] = dict(doc_freq)
+        model["num_docs"] = len(entities)
+
+        # Calculate IDF and TF-IDF vectors
+        self._reweight(model)
+        return model
 
-        # Calculate IDF
-        num_docs = len(entities)
-        model["idf"] = {term: math.log(num_docs / (freq + 1)) for term, freq in doc_freq.items()}
-
-        # Calculate TF-IDF vectors
-        for entity in entities:
-            vector = {}
-            term_freq = Counter()
-            for attr in self.attributes:
-                term_freq.update(str(entity.attributes.get(attr, "")).lower().split())
+    def update(self, model: Any, new_entities: List[Entity]) -> Any:
+        if "postings" not in model:
+            # Models built before postings were recorded can only be rebuilt
+            return self.train(list(model["entities"].values()) + new_entities)
 
-            for term, freq in term_freq.items():
-                tf = freq / sum(term_freq.values())
-                vector[term] = tf * model["idf"][term]
+        new_entities = list({entity.id: entity for entity in new_entities}.values())
+        replaced = [entity.id for entity in new_entities if entity.id in model["entities"]]
+        if replaced:
+            model = self.remove(model, replaced)
 
-            model["vectors"][entity.id] = vector
+        new_terms = set()
+        for entity in new_entities:
+            model["entities"][entity.id] = entity
+            for term in self._terms(entity):
+                self.vocabulary.add(term)
+                if term not in model["doc_freq"]:
+                    model["doc_freq"][term] = 0
+                    model["postings"][term] = set()
+                model["doc_freq"][term] += 1
+                model["postings"][term].add(entity.id)
+                if term not in model["idf"]:
+                    new_terms.add(term)
+        model["num_docs"] += len(new_entities)
+        # Replaced entities were counted as stale when they were removed, so they are not counted again
+        model["stale_docs"] = model.get("stale_docs", 0) + len(new_entities) - len(replaced)
+        if self._needs_reweight(model):
+            self._reweight(model)
+            return model
+
+        for term in new_terms:
+            model["idf"][term] = self._idf(model["num_docs"], model["doc_freq"][term])
+        vectors = {entity.id: self._vectorize(entity, model["idf"]) for entity in new_entities}
+        model["vectors"].update(vectors)
+        if "matrix" in model:
+            model["matrix"].set_rows(vectors)
+        return model
 
+    def remove(self, model: Any, entity_ids: Iterable[Any]) -> Any:
+        if "postings" not in model:
+            # Models built before postings were recorded can only be rebuilt
+            removed = set(entity_ids)
+            return self.train([e for entity_id, e in model["entities"].items() if entity_id not in removed])
+
+        entity_ids = list(entity_ids)
+        num_removed = 0
+        for entity_id in entity_ids:
+            entity = model["entities"].pop(entity_id, None)
+            if entity is None:
+                continue
+            num_removed += 1
+            model["vectors"].pop(entity_id, None)
+            for term in self._terms(entity):
+                model["doc_freq"][term] -= 1
+                model["postings"][term].discard(entity_id)
+                if model["doc_freq"][term] == 0:
+                    del model["doc_freq"][term]
+                    del model["postings"][term]
+                    model["idf"].pop(term, None)
+
+        model["num_docs"] -= num_removed
+        model["stale_docs"] = model.get("stale_docs", 0) + num_removed
+        if self._needs_reweight(model):
+            self._reweight(model)
+        elif "matrix" in model:
+            model["matrix"].remove_rows(entity_ids)
         return model
 
-    def update(self, model: Any, new_entities: List[Entity]) -> Any:
-        # For simplicity, we're retraining the entire model here.
-        # In a real-world scenario, you might want to implement incremental updates.
-        all_entities = list(model["entities"].values()) + new_entities
-        return self.train(all_entities)
+    def _needs_reweight(self, model: Any) -> bool:
+        return model["stale_docs"] > self.reweight_ratio * model["num_docs"]
+
+    def _reweight(self, model: Any):
+        model["idf"] = {term: self._idf(model["num_docs"], freq) for term, freq in model["doc_freq"].items()}
+        model["vectors"] = {
+            entity_id: self._vectorize(entity, model["idf"]) for entity_id, entity in model["entities"].items()
+        }
+        model["matrix"] = SparseMatrix.from_vectors(model["vectors"])
+        model["stale_docs"] = 0
+
+    @staticmethod
+    def _idf(num_docs: int, freq: int) -> float:
+        return math.log(num_docs / (freq + 1))
+
+    def _terms(self, entity: Entity) -> set:
+        terms = set()
+        for attr in self.attributes:
+            terms.update(str(entity.attributes.get(attr, "")).lower().split())
+        return terms
+
+    def _vectorize(self, entity: Entity, idf: Dict[str, float]) -> Dict[str, float]:
+        vector = {}
+        term_freq = Counter()
+        for attr in self.attributes:
+            term_freq.update(str(entity.attributes.get(attr, "")).lower().split())
+
+        for term, freq in term_freq.items():
+            tf = freq / sum(term_freq.values())
+            vector[term] = tf * idf[term]
+        return vector
@@ -0,0 +1,149 @@
+import hashlib
+import random
+import sys
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+# Every hash function computes its value in its own 128-bit slot of one big integer, so a single
+# multiplication hashes a token with all of them at once
+_SLOT_BITS = 128
+_HASH_BITS = 32
+MAX_HASH = (1 << _HASH_BITS) - 1
+
+# The hash values are the low 32-bit words of the slots, every fourth word of the integer's bytes
+_WORD_STEP = 4 if sys.byteorder == "little" else -4
+
+# int.bit_count is only available from Python 3.10
+_bit_count = getattr(int, "bit_count", None) or (lambda value: bin(value).count("1"))
+
+
+def hash_token(token: str) -> int:
+    """
+    Hash a token to a 32-bit integer, the same in every process and Python version.
+
+    :param token: The token to hash
+    :return: The token hash
+    """
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little")
+
+
+def pack_signature(signature: List[int]) -> int:
+    """
+    Pack a signature into one integer, with each hash value in its own 32-bit word.
+
+    :param signature: The signature
+    :return: The packed signature
+    """
+    return int.from_bytes(array("I", signature).tobytes(), sys.byteorder)
+
+
+def matching_values(packed1: int, packed2: int, num_hash_functions: int) -> int:
+    """
+    Count the hash values two packed signatures share, comparing all their words at once.
+
+    :param packed1: The first packed signature
+    :param packed2: The second packed signature
+    :param num_hash_functions: The signature length
+    :return: The number of hash functions with the same value in both signatures
+    """
+    low, high = _word_masks(num_hash_functions)
+    difference = packed1 ^ packed2
+    # The high bit of a word is set when any bit of the word is, and then cleared by the inversion
+    nonzero = ((difference & low) + low) | difference
+    return _bit_count(~nonzero & high)
+
+
+@lru_cache(maxsize=None)
+def _word_masks(num_hash_functions: int) -> Tuple[int, int]:
+    low = int.from_bytes(b"\xff\xff\xff\x7f" * num_hash_functions, "little")
+    high = int.from_bytes(b"\x00\x00\x00\x80" * num_hash_functions, "little")
+    return low, high
+
+
+class MinHashSigner:
+    """
+    Compute MinHash signatures with all hash functions at once.
+
+    Each token is hashed once to a 32-bit integer x. The hash functions are the multiply-add-shift
+    universal hashes h(x) = ((a * x + b) mod 2^64) >> 32, with random 64-bit a and b. Rather than
+    evaluating them one by one, the multipliers and increments are packed into big integers with one
+    128-bit slot per hash function, so that a token is hashed with every function by one multiplication
+    and one addition, and the running minimum of every function is updated with a few bitwise operations.
+
+    How MinHashSigner works:
+    1. Hash each token of a set to a 32-bit integer, once per token for a batch of sets
+    2. Hash it with every hash function: r = ((A * x + B) >> 32) & MASK, where A and B pack a and b
+    3. Take the slot-wise minimum of r and the minimum so far, by subtracting them with a guard bit
+       set in each slot and turning the borrow of each slot into a selection mask
+    4. Unpack the slots into the signature
+
+    Sets without tokens get a signature of MAX_HASH values.
+
+    Usage:
+    signer = MinHashSigner(128)
+    signatures = signer.signatures([{"apple", "iphone"}, {"samsung", "galaxy"}])
+
+    :param num_hash_functions: The number of hash functions, i.e. the signature length
+    :param seed: The seed of the random hash functions, signers with the same seed compute the same signatures
+    """
+
+    def __init__(self, num_hash_functions: int, seed: int = 1):
+        self.num_hash_functions = num_hash_functions
+        self.seed = seed
+        rng = random.Random(seed)
+        self.multipliers = [rng.getrandbits(64) for _ in range(num_hash_functions)]
+        self.increments = [rng.getrandbits(64) for _ in range(num_hash_functions)]
+
+        self._multiplier = self._pack(self.multipliers)
+        self._increment = self._pack(self.increments)
+        self._mask = self._pack([MAX_HASH] * num_hash_functions)
+        self._guard = self._pack([1 << _HASH_BITS] * num_hash_functions)
+        self._num_bytes = num_hash_functions * _SLOT_BITS // 8
+
+    @staticmethod
+    def _pack(values: List[int]) -> int:
+        return int.from_bytes(b"".join(value.to_bytes(_SLOT_BITS // 8, "little") for value in values), "little")
+
+    def signature(self, tokens: Iterable[str]) -> List[int]:
+        """
+        Compute the MinHash signature of a set of tokens.
+
+        :param tokens: The tokens
+        :return: The minimum hash value of the tokens for each hash function
+        """
+        return self._signature({hash_token(token) for token in tokens})
+
+    def signatures(self, token_sets: Iterable[Iterable[str]]) -> List[List[int]]:
+        """
+        Compute the MinHash signatures of a batch of token sets, hashing each distinct token once.
+
+        :param token_sets: The token sets
+        :return: The signature of each token set
+        """
+        token_hashes: Dict[str, int] = {}
+        signatures = []
+        for tokens in token_sets:
+            hashes = set()
+            for token in tokens:
+                token_hash = token_hashes.get(token)
+                if token_hash is None:
+                    token_hash = token_hashes[token] = hash_token(token)
+                hashes.add(token_hash)
+            signatures.append(self._signature(hashes))
+        return signatures
+
+    def _signature(self, token_hashes: Iterable[int]) -> List[int]:
+        multiplier, increment, mask, guard = self._multiplier, self._increment, self._mask, self._guard
+        minimum = None
+        for token_hash in token_hashes:
+            values = ((multiplier * token_hash + increment) >> _HASH_BITS) & mask
+            if minimum is None:
+                minimum = values
+                continue
+            # The guard bit of a slot survives the subtraction exactly where minimum >= values
+            borrow = ((minimum | guard) - values) & guard
+            minimum ^= (minimum ^ values) & (borrow - (borrow >> _HASH_BITS))
+        if minimum is None:
+            return [MAX_HASH] * self.num_hash_functions
+        return memoryview(minimum.to_bytes(self._num_bytes, sys.byteorder)).cast("I")[::_WORD_STEP].tolist()
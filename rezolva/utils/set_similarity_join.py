@@ -0,0 +1,289 @@
+import bisect
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+# How many times the suffix filter splits the suffixes of a candidate pair before giving up
+_MAX_SUFFIX_DEPTH = 2
+
+
+class SetSimilarityJoin:
+    """
+    Find the token sets whose Jaccard similarity is at least a threshold, without comparing every pair.
+
+    Tokens are numbered in order of increasing frequency and each set is stored as its sorted token
+    numbers, so the first tokens of a set (its prefix) are its rarest. Two sets with a Jaccard similarity
+    of at least t share at least alpha = ceil(t / (1 + t) * (|x| + |y|)) tokens, so they share a token
+    among their first |x| - ceil(t * |x|) + 1 tokens. Only the prefixes are indexed, and a candidate pair
+    is only verified if it passes the PPJoin+ filters.
+
+    How SetSimilarityJoin works:
+    1. Number the tokens by increasing frequency and index each set under the tokens of its prefix
+    2. Look up the tokens of the query's prefix in the index, keeping the sets whose length can reach the
+       threshold (length filter)
+    3. On each shared token, bound the overlap from the tokens left after it in both sets and drop the
+       sets that cannot reach alpha (positional filter)
+    4. Optionally, when a set is first found, split the remaining tokens of both sets around a token
+       and bound their Hamming distance from the sizes of the parts (suffix filter)
+    5. Verify the remaining candidates by intersecting the sets
+
+    Numbers are only assigned to new tokens as they are added, so adding sets after `build` keeps the
+    order of the existing tokens (the results stay exact, but the filters are less selective if the
+    frequencies drift far from the initial ones). Tokens unknown to the index come first in a query.
+
+    Usage:
+    join = SetSimilarityJoin(0.5)
+    join.build({"1": {"apple", "iphone", "12"}, "2": {"apple", "iphone", "13"}})
+    matches = join.query({"apple", "iphone", "12", "pro"})
+    pairs = list(join.self_join())
+
+    :param threshold: The Jaccard similarity the sets have to reach, greater than 0
+    :param suffix_filter: Whether to apply the suffix filter, which only pays off when verifying a candidate
+        costs more than the filter (large sets, as the sets are intersected natively)
+    """
+
+    def __init__(self, threshold: float, suffix_filter: bool = False):
+        if not 0 < threshold <= 1:
+            raise ValueError("The threshold must be greater than 0 and at most 1")
+        self.threshold = threshold
+        self.suffix_filter = suffix_filter
+        self.token_ids: Dict[Any, int] = {}
+        self.records: Dict[Any, Tuple[int, ...]] = {}
+        self._sets: Dict[Any, frozenset] = {}
+        self._index: Dict[int, Dict[Any, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, record_id: Any) -> bool:
+        return record_id in self.records
+
+    def build(self, token_sets: Mapping[Any, Iterable[Any]]):
+        """
+        Index token sets from scratch, numbering their tokens by increasing frequency.
+
+        :param token_sets: The token sets by ID
+        """
+        token_sets = {record_id: set(tokens) for record_id, tokens in token_sets.items()}
+        frequencies = Counter(token for tokens in token_sets.values() for token in tokens)
+        ordered = sorted(frequencies, key=lambda token: (frequencies[token], str(token)))
+        self.token_ids = {token: token_id for token_id, token in enumerate(ordered)}
+        self.records, self._sets, self._index = {}, {}, {}
+        self.add(token_sets)
+
+    def add(self, token_sets: Mapping[Any, Iterable[Any]]):
+        """
+        Index more token sets, replacing the sets with the same IDs.
+
+        :param token_sets: The token sets by ID
+        """
+        for record_id, tokens in token_sets.items():
+            self._discard(record_id)
+            token_ids = self.token_ids
+            record = tuple(sorted(token_ids.setdefault(token, len(token_ids)) for token in set(tokens)))
+            self.records[record_id] = record
+            self._sets[record_id] = frozenset(record)
+            for position in range(self._prefix_length(len(record), self.threshold)):
+                self._index.setdefault(record[position], {})[record_id] = position
+
+    def remove(self, record_ids: Iterable[Any]):
+        """
+        Remove token sets, ignoring unknown IDs.
+
+        :param record_ids: The IDs of the sets to remove
+        """
+        for record_id in record_ids:
+            self._discard(record_id)
+
+    def query(self, tokens: Iterable[Any], threshold: Optional[float] = None) -> List[Tuple[Any, float]]:
+        """
+        Find the indexed sets similar to a query set.
+
+        :param tokens: The query tokens
+        :param threshold: The Jaccard similarity to reach, at least the threshold of the index (by default equal)
+        :return: The (ID, Jaccard similarity) of every indexed set reaching the threshold
+        """
+        threshold = self._check_threshold(threshold)
+        query = self._encode(tokens)
+        if not query:
+            return [(record_id, 1.0) for record_id, record in self.records.items() if not record]
+
+        index, records = self._index, self.records
+        length = len(query)
+        min_length, max_length = threshold * length - 1e-9, length / threshold + 1e-9
+        min_overlaps = _MinOverlaps(length, threshold)
+        overlaps = {}
+        for i in range(self._prefix_length(length, threshold)):
+            for record_id, j in index.get(query[i], {}).items():
+                overlap = overlaps.get(record_id, 0)
+                if overlap < 0:
+                    continue
+                record = records[record_id]
+                if overlap == 0 and not min_length <= len(record) <= max_length:
+                    overlaps[record_id] = -1
+                    continue
+                overlaps[record_id] = self._probe(query, record, i, j, overlap, min_overlaps[len(record)])
+        return self._verify(self._sets, frozenset(query), overlaps, threshold)
+
+    def self_join(self, threshold: Optional[float] = None) -> Iterator[Tuple[Any, Any, float]]:
+        """
+        Find every pair of indexed sets reaching the threshold, each pair once.
+
+        The sets are joined in order of length, each against an index of the shorter sets before it. As
+        those are at most as long, only the first |x| - ceil(2t / (1 + t) * |x|) + 1 tokens of a set
+        have to be indexed for the sets after it.
+
+        :param threshold: The Jaccard similarity to reach, at least the threshold of the index (by default equal)
+        :return: An iterator of (ID, ID, Jaccard similarity) tuples, the shorter set first
+        """
+        threshold = self._check_threshold(threshold)
+        ordered = sorted(self.records, key=lambda record_id: len(self.records[record_id]))
+        empty = [record_id for record_id in ordered if not self.records[record_id]]
+        for k, record_id in enumerate(empty):
+            for other_id in empty[k + 1 :]:
+                yield record_id, other_id, 1.0
+
+        index: Dict[int, List[Tuple[Any, int]]] = {}
+        starts: Dict[int, int] = {}
+        for record_id in ordered[len(empty) :]:
+            query = self.records[record_id]
+            length = len(query)
+            min_length = threshold * length - 1e-9
+            min_overlaps = _MinOverlaps(length, threshold)
+            overlaps = {}
+            for i in range(self._prefix_length(length, threshold)):
+                postings = index.get(query[i])
+                if not postings:
+                    continue
+                # Postings are in order of length, so the ones too short for this and every later set are skipped
+                start = starts.get(query[i], 0)
+                while start < len(postings) and len(self.records[postings[start][0]]) < min_length:
+                    start += 1
+                starts[query[i]] = start
+                for other_id, j in postings[start:]:
+                    overlap = overlaps.get(other_id, 0)
+                    if overlap >= 0:
+                        other = self.records[other_id]
+                        overlaps[other_id] = self._probe(query, other, i, j, overlap, min_overlaps[len(other)])
+            for other_id, similarity in self._verify(self._sets, self._sets[record_id], overlaps, threshold):
+                yield other_id, record_id, similarity
+
+            index_length = length - math.ceil(2 * threshold / (1 + threshold) * length - 1e-9) + 1
+            for position in range(index_length):
+                index.setdefault(query[position], []).append((record_id, position))
+
+    def _probe(self, query: Sequence[int], record: Sequence[int], i: int, j: int, overlap: int, alpha: int) -> int:
+        # The overlap found so far after the shared token at query[i] == record[j], or -1 if the pair is pruned
+        if overlap + 1 + min(len(query) - i, len(record) - j) - 1 < alpha:
+            return -1
+        if overlap == 0 and self.suffix_filter:
+            # The tokens before the first shared one are all different
+            max_hamming = len(query) + len(record) - 2 * alpha - (i + j)
+            if _suffix_hamming_bound(query[i + 1 :], record[j + 1 :], max_hamming, 1) > max_hamming:
+                return -1
+        return overlap + 1
+
+    @staticmethod
+    def _verify(
+        sets: Dict[Any, frozenset], query: frozenset, overlaps: Dict[Any, int], threshold: float
+    ) -> List[Tuple[Any, float]]:
+        results = []
+        for record_id, overlap in overlaps.items():
+            if overlap > 0:
+                record = sets[record_id]
+                intersection = len(query & record)
+                similarity = intersection / (len(query) + len(record) - intersection)
+                if similarity >= threshold:
+                    results.append((record_id, similarity))
+        return results
+
+    def _encode(self, tokens: Iterable[Any]) -> Tuple[int, ...]:
+        # Unknown tokens come first with negative numbers, as the rarest tokens
+        token_ids = {}
+        unknown = 0
+        for token in set(tokens):
+            token_id = self.token_ids.get(token)
+            if token_id is None:
+                unknown += 1
+                token_id = -unknown
+            token_ids[token] = token_id
+        return tuple(sorted(token_ids.values()))
+
+    def _check_threshold(self, threshold: Optional[float]) -> float:
+        if threshold is None:
+            return self.threshold
+        if threshold < self.threshold:
+            raise ValueError("The threshold cannot be lower than the threshold the index was built for")
+        return threshold
+
+    def _discard(self, record_id: Any):
+        record = self.records.pop(record_id, None)
+        if record is not None:
+            del self._sets[record_id]
+            for position in range(self._prefix_length(len(record), self.threshold)):
+                postings = self._index[record[position]]
+                del postings[record_id]
+                if not postings:
+                    del self._index[record[position]]
+
+    @staticmethod
+    def _prefix_length(length: int, threshold: float) -> int:
+        return length - math.ceil(threshold * length - 1e-9) + 1 if length else 0
+
+
+class _MinOverlaps(dict):
+    # The overlap a set of a given length needs with a query of a given length to reach the threshold
+    def __init__(self, length: int, threshold: float):
+        super().__init__()
+        self.length = length
+        self.ratio = threshold / (1 + threshold)
+
+    def __missing__(self, length: int) -> int:
+        alpha = self[length] = math.ceil(self.ratio * (self.length + length) - 1e-9)
+        return alpha
+
+
+def _suffix_hamming_bound(x: Sequence[int], y: Sequence[int], max_hamming: int, depth: int) -> int:
+    """
+    Bound the Hamming distance of two sorted token sequences from below (the PPJoin+ suffix filter).
+
+    y is split around its middle token, and x around the same token by binary search. Tokens on the
+    left of one can only match tokens on the left of the other, so the differences in size of the
+    two sides bound the distance. The token can only be found in a window of x around the middle
+    that depends on max_hamming; outside it, the bound exceeds max_hamming. The sides are split again
+    up to a fixed depth while the bound stays within max_hamming.
+
+    :param x: The first sequence
+    :param y: The second sequence
+    :param max_hamming: The Hamming distance above which the exact bound is not needed
+    :param depth: The number of splits so far
+    :return: A lower bound of the Hamming distance, exact enough to compare with max_hamming
+    """
+    if not x or not y:
+        return abs(len(x) - len(y))
+    size_difference = abs(len(x) - len(y))
+    middle = len(y) // 2
+    token = y[middle]
+    y_left, y_right = y[:middle], y[middle + 1 :]
+
+    offset = (max_hamming - size_difference) / 2
+    low = math.floor(middle - offset - (size_difference if len(x) < len(y) else 0))
+    high = math.ceil(middle + offset + (size_difference if len(x) >= len(y) else 0))
+    position = bisect.bisect_left(x, token, max(low, 0), max(min(high, len(x)), 0))
+    if not low <= position <= high:
+        return max_hamming + 1
+    x_left = x[:position]
+    if position < len(x) and x[position] == token:
+        x_right, difference = x[position + 1 :], 0
+    else:
+        x_right, difference = x[position:], 1
+
+    right = abs(len(x_right) - len(y_right))
+    hamming = abs(len(x_left) - len(y_left)) + right + difference
+    if hamming > max_hamming or depth >= _MAX_SUFFIX_DEPTH:
+        return hamming
+    left = _suffix_hamming_bound(x_left, y_left, max_hamming - right - difference, depth + 1)
+    hamming = left + right + difference
+    if hamming > max_hamming:
+        return hamming
+    return left + _suffix_hamming_bound(x_right, y_right, max_hamming - left - difference, depth + 1) + difference
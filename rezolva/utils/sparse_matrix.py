@@ -0,0 +1,168 @@
+import math
+from array import array
+from collections import defaultdict
+from itertools import repeat
+from operator import mul
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+class SparseMatrix:
+    """
+    Sparse vectors by ID, stored as a compressed sparse row (CSR) matrix with unit-length rows.
+
+    The terms of the vectors are numbered, and the rows are kept in three flat arrays: the term
+    numbers of all rows one after the other, their weights, and the offset of each row. Each row is
+    divided by its norm when it is stored, and the norms are kept in `norms`, so the cosine similarity
+    of a normalized query with a row is a single sparse dot product.
+
+    How SparseMatrix works:
+    1. Store each row's term numbers and normalized weights at the end of the arrays
+    2. Score a query against a few rows by a sparse dot product with each row
+    3. Score a query against all rows at once through the columns of its terms (the transposed
+       matrix, built on first use), accumulating the products into the rows they touch
+
+    Replacing or removing a row leaves its old entries unused in the arrays, and the matrix is
+    compacted once the unused entries outnumber the used ones.
+
+    Usage:
+    matrix = SparseMatrix.from_vectors({"1": {"apple": 0.5, "iphone": 1.2}, "2": {"galaxy": 0.8}})
+    query = matrix.normalize({"apple": 1.0})
+    scores = matrix.scores(query)
+    """
+
+    def __init__(self):
+        self.term_ids: Dict[Any, int] = {}
+        self.rows: Dict[Any, int] = {}
+        self.indptr = array("Q", [0])
+        self.indices = array("q")
+        self.data = array("d")
+        self.norms = array("d")
+        self._row_ids: List[Any] = []
+        self._unused = 0
+        self._columns: Optional[Dict[int, Tuple[array, array]]] = None
+
+    @classmethod
+    def from_vectors(cls, vectors: Mapping[Any, Mapping[Any, float]]) -> "SparseMatrix":
+        matrix = cls()
+        matrix.set_rows(vectors)
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, row_id: Any) -> bool:
+        return row_id in self.rows
+
+    def set_rows(self, vectors: Mapping[Any, Mapping[Any, float]]):
+        """
+        Add rows, replacing existing rows with the same IDs.
+
+        :param vectors: The vectors (term -> weight dictionaries) by row ID
+        """
+        for row_id, vector in vectors.items():
+            self._discard(row_id)
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            self.rows[row_id] = len(self._row_ids)
+            self._row_ids.append(row_id)
+            self.norms.append(norm)
+            if norm > 0:
+                for term, weight in vector.items():
+                    if weight:
+                        term_id = self.term_ids.setdefault(term, len(self.term_ids))
+                        self.indices.append(term_id)
+                        self.data.append(weight / norm)
+            self.indptr.append(len(self.data))
+        self._columns = None
+        self._compact_if_sparse()
+
+    def remove_rows(self, row_ids: Iterable[Any]):
+        """
+        Remove rows, ignoring unknown IDs.
+
+        :param row_ids: The IDs of the rows to remove
+        """
+        for row_id in row_ids:
+            self._discard(row_id)
+        self._columns = None
+        self._compact_if_sparse()
+
+    def normalize(self, vector: Mapping[Any, float]) -> Dict[int, float]:
+        """
+        Divide a query vector by its norm and number its terms, leaving out terms no row contains.
+
+        :param vector: The query vector (term -> weight dictionary)
+        :return: The normalized weights by term number
+        """
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if norm == 0:
+            return {}
+        term_ids = self.term_ids
+        return {term_ids[term]: weight / norm for term, weight in vector.items() if weight and term in term_ids}
+
+    def dot(self, query: Dict[int, float], row_id: Any) -> float:
+        """
+        Calculate the dot product of a normalized query with a row, i.e. their cosine similarity.
+
+        :param query: The normalized query from `normalize`
+        :param row_id: The ID of the row
+        :return: The dot product
+        """
+        if not query:
+            return 0.0
+        row = self.rows[row_id]
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return sum(map(mul, self.data[start:end], map(query.get, self.indices[start:end], repeat(0.0))))
+
+    def scores(self, query: Dict[int, float]) -> List[Tuple[Any, float]]:
+        """
+        Score a normalized query against all rows at once, through the columns of its terms.
+
+        Only the rows sharing a term with the query are scored, so the cost depends on the lengths of
+        the query terms' columns rather than on the number of rows.
+
+        :param query: The normalized query from `normalize`
+        :return: The (row ID, dot product) of each row sharing a term with the query, in row order
+        """
+        columns = self._get_columns()
+        accumulated = defaultdict(float)
+        for term_id, weight in query.items():
+            column = columns.get(term_id)
+            if column is not None:
+                for row, row_weight in zip(*column):
+                    accumulated[row] += weight * row_weight
+        return [(self._row_ids[row], accumulated[row]) for row in sorted(accumulated)]
+
+    def _get_columns(self) -> Dict[int, Tuple[array, array]]:
+        # The transposed matrix, built from the rows in use on first use after a change
+        if self._columns is None:
+            columns = {}
+            for row in sorted(self.rows.values()):
+                for index in range(self.indptr[row], self.indptr[row + 1]):
+                    column = columns.get(self.indices[index])
+                    if column is None:
+                        column = columns[self.indices[index]] = (array("q"), array("d"))
+                    column[0].append(row)
+                    column[1].append(self.data[index])
+            self._columns = columns
+        return self._columns
+
+    def _discard(self, row_id: Any):
+        row = self.rows.pop(row_id, None)
+        if row is not None:
+            self._unused += self.indptr[row + 1] - self.indptr[row]
+
+    def _compact_if_sparse(self):
+        if self._unused > len(self.data) - self._unused:
+            rows = {}
+            for row_id, row in self.rows.items():
+                start, end = self.indptr[row], self.indptr[row + 1]
+                rows[row_id] = (self.indices[start:end], self.data[start:end], self.norms[row])
+            self.rows, self._row_ids, self._unused = {}, [], 0
+            self.indptr, self.indices, self.data, self.norms = array("Q", [0]), array("q"), array("d"), array("d")
+            for row_id, (indices, data, norm) in rows.items():
+                self.rows[row_id] = len(self._row_ids)
+                self._row_ids.append(row_id)
+                self.norms.append(norm)
+                self.indices.extend(indices)
+                self.data.extend(data)
+                self.indptr.append(len(self.data))
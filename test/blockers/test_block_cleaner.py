@@ -0,0 +1,103 @@
+import unittest
+
+from rezolva.blockers.block_cleaner import BlockCleaner
+from rezolva.blockers.q_gram_blocker import QGramBlocker
+from rezolva.core.base import Entity
+from rezolva.core.resolver import EntityResolver
+from rezolva.matchers.jaccard_matcher import JaccardMatcher
+from rezolva.model_builders.simple_model_builder import SimpleModelBuilder
+from rezolva.preprocessors.simple_preprocessor import SimplePreprocessor
+
+
+def _index(blocks):
+    entity_blocks = {}
+    for key, block in blocks.items():
+        for entity_id in block:
+            entity_blocks.setdefault(entity_id, set()).add(key)
+    return entity_blocks
+
+
+class TestBlockCleaner(unittest.TestCase):
+    def setUp(self):
+        self.blocks = {f"b{i}": {f"{i}a", f"{i}b"} for i in range(10)}
+        self.blocks["common"] = {f"e{i}" for i in range(100)} | {"0a"}
+        self.entity_blocks = _index(self.blocks)
+
+    def test_purge_limit(self):
+        self.assertEqual(BlockCleaner().purge_limit(self.blocks), 2)
+        self.assertEqual(BlockCleaner(purging_factor=100).purge_limit(self.blocks), 101)
+        self.assertEqual(BlockCleaner().purge_limit({}), 0)
+
+    def test_purging(self):
+        stats = BlockCleaner().clean(self.blocks, self.entity_blocks)
+
+        self.assertNotIn("common", self.blocks)
+        self.assertEqual(self.entity_blocks["0a"], {"b0"})
+        self.assertNotIn("e1", self.entity_blocks)
+        self.assertEqual(stats["purged_blocks"], 1)
+        self.assertEqual(stats["comparisons_before"], 10 + 101 * 100 // 2)
+        self.assertEqual(stats["comparisons_after"], 10)
+        self.assertEqual(stats["comparisons_removed"], 101 * 100 // 2)
+
+    def test_max_block_size(self):
+        BlockCleaner(max_block_size=1).clean(self.blocks, self.entity_blocks)
+        self.assertEqual(self.blocks, {})
+        self.assertEqual(self.entity_blocks, {})
+
+    def test_filtering(self):
+        blocks = {"small": {"1", "2"}, "medium": {"1", "2", "3"}, "large": {"1", "2", "3", "4"}}
+        entity_blocks = _index(blocks)
+
+        stats = BlockCleaner(max_block_size=10, max_blocks_per_entity=1).clean(blocks, entity_blocks)
+
+        self.assertEqual(entity_blocks, {"1": {"small"}, "2": {"small"}, "3": {"medium"}, "4": {"large"}})
+        self.assertEqual(blocks, {"small": {"1", "2"}, "medium": {"3"}, "large": {"4"}})
+        self.assertEqual(stats["filtered_assignments"], 5)
+        self.assertEqual(stats["comparisons_removed"], 10 - 1)
+
+    def test_filter_keys(self):
+        blocks = {"a": {"1"}, "b": {"1", "2"}, "c": {"1", "2", "3"}, "d": {"1", "2", "3", "4"}}
+
+        keys = ["d", "c", "b", "a"]
+
+        self.assertEqual(BlockCleaner(filter_ratio=0.5).filter_keys(keys + ["x"], blocks), ["a", "b"])
+        self.assertEqual(BlockCleaner(max_blocks_per_entity=3).filter_keys(keys, blocks), ["a", "b", "c"])
+        self.assertEqual(BlockCleaner().filter_keys(["d", "x"], blocks), ["d", "x"])
+
+    def test_incremental_clean(self):
+        cleaner = BlockCleaner()
+        cleaner.clean(self.blocks, self.entity_blocks)
+
+        # Purged keys stay purged, however small the block recreated by an update is
+        self.blocks["common"] = {"new"}
+        self.entity_blocks["new"] = {"common"}
+        stats = cleaner.clean(self.blocks, self.entity_blocks, keys=["common"], entity_ids=["new"])
+
+        self.assertNotIn("common", self.blocks)
+        self.assertEqual(stats["purged_blocks"], 1)
+
+    def test_resolver(self):
+        entities = [Entity(str(i), {"name": f"the item{i}"}) for i in range(30)]
+        matcher = JaccardMatcher(threshold=0.9, attribute_weights={"name": 1.0})
+        resolver = EntityResolver(
+            SimplePreprocessor([]),
+            SimpleModelBuilder(["name"]),
+            matcher,
+            QGramBlocker(3, lambda e: e.attributes["name"], threshold=1),
+            block_cleaner=BlockCleaner(max_block_size=5),
+        )
+        resolver.train(entities)
+
+        self.assertNotIn("the", resolver.blocks)
+        self.assertGreater(resolver.get_stats()["block_cleaning"]["comparisons_removed"], 0)
+
+        matches = resolver.resolve([Entity("q", {"name": "the item7"})])[0][1]
+        self.assertEqual([match.id for match, _ in matches], ["7"])
+        self.assertLess(matcher.comparison_stats["comparisons"], 30)
+
+        resolver.update_model([Entity("30", {"name": "the item30"})])
+        self.assertNotIn("the", resolver.blocks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+
+from rezolva.blockers.composite_blocker import (IntersectionBlocker,
+                                                MultiPassBlocker, UnionBlocker)
+from rezolva.blockers.simple_blocker import SimpleBlocker
+from rezolva.core.base import Entity
+from rezolva.core.resolver import EntityResolver
+from rezolva.matchers.jaccard_matcher import JaccardMatcher
+from rezolva.model_builders.simple_model_builder import SimpleModelBuilder
+from rezolva.preprocessors.simple_preprocessor import SimplePreprocessor
+
+
+def surname_key(entity):
+    # A crude phonetic key, folding the spelling variants used below
+    return entity.attributes["surname"].replace("y", "i")
+
+
+def zip_code(entity):
+    return entity.attributes["zip"]
+
+
+def first_letter(entity):
+    return entity.attributes["name"][0]
+
+
+def _block_ids(blocks):
+    return {key: sorted(entity.id for entity in block) for key, block in blocks.items()}
+
+
+class TestCompositeBlockers(unittest.TestCase):
+    def setUp(self):
+        self.entities = [
+            Entity("1", {"name": "john", "surname": "smith", "zip": "10001"}),
+            Entity("2", {"name": "jon", "surname": "smyth", "zip": "10001"}),
+            Entity("3", {"name": "jane", "surname": "smith", "zip": "94105"}),
+            Entity("4", {"name": "bob", "surname": "jones", "zip": "10001"}),
+        ]
+        self.surname = SimpleBlocker(surname_key)
+        self.zip = SimpleBlocker(zip_code)
+        self.name = SimpleBlocker(first_letter)
+
+    def test_union_blocker(self):
+        blocker = UnionBlocker([self.name, self.zip])
+
+        blocks = _block_ids(blocker.create_blocks(self.entities))
+
+        self.assertEqual(
+            blocks,
+            {(0, "j"): ["1", "2", "3"], (0, "b"): ["4"], (1, "10001"): ["1", "2", "4"], (1, "94105"): ["3"]},
+        )
+        self.assertEqual(blocker.block_keys(self.entities[0]), [(0, "j"), (1, "10001")])
+
+    def test_intersection_blocker(self):
+        blocker = IntersectionBlocker([self.surname, self.zip])
+
+        blocks = _block_ids(blocker.create_blocks(self.entities))
+
+        self.assertEqual(blocks, {("smith", "10001"): ["1", "2"], ("smith", "94105"): ["3"], ("jones", "10001"): ["4"]})
+        self.assertEqual(blocker.block_keys(self.entities[0]), [("smith", "10001")])
+
+    def test_multi_pass_blocker(self):
+        sequential = MultiPassBlocker([self.name, [self.surname, self.zip]], n_jobs=1)
+        concurrent = MultiPassBlocker([self.name, [self.surname, self.zip]], n_jobs=2, min_parallel_entities=0)
+
+        blocks = _block_ids(sequential.create_blocks(self.entities))
+
+        self.assertIsInstance(sequential.blockers[1], IntersectionBlocker)
+        self.assertEqual(blocks[(1, ("smith", "10001"))], ["1", "2"])
+        self.assertEqual(_block_ids(concurrent.create_blocks(self.entities)), blocks)
+        self.assertEqual(sequential.block_keys(self.entities[0]), [(0, "j"), (1, ("smith", "10001"))])
+
+    def test_small_input_in_process(self):
+        blocker = MultiPassBlocker([self.name, [self.surname, self.zip]], n_jobs=2)
+
+        with patch("rezolva.blockers.composite_blocker.ProcessPoolExecutor") as executor:
+            blocks = _block_ids(blocker.create_blocks(self.entities))
+
+        executor.assert_not_called()
+        self.assertEqual(blocks[(1, ("smith", "10001"))], ["1", "2"])
+        self.assertEqual(MultiPassBlocker([self.name]).n_jobs, 1)
+
+    def test_no_blockers(self):
+        with self.assertRaises(ValueError):
+            UnionBlocker([])
+
+    def test_resolver(self):
+        matcher = JaccardMatcher(threshold=0.1, attribute_weights={"surname": 1.0})
+        resolver = EntityResolver(
+            SimplePreprocessor([]),
+            SimpleModelBuilder(["name", "surname"]),
+            matcher,
+            MultiPassBlocker([self.name, [self.surname, self.zip]], n_jobs=1),
+        )
+        resolver.train(self.entities)
+
+        # Entities 1 and 2 share a block in both passes, but are compared once
+        pairs = [(entity.id, match.id) for entity, match, _ in resolver.deduplicate()]
+        self.assertEqual(pairs, [("1", "3")])
+        self.assertEqual(matcher.comparison_stats["comparisons"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
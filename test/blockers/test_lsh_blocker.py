@@ -47,6 +47,21 @@ class TestLSHBlocker(unittest.TestCase):
         self.assertEqual(len(signature), self.blocker.num_hash_functions)
         self.assertTrue(all(isinstance(x, int) for x in signature))
 
+    def test_batch_signatures(self):
+        entities = [
+            Entity("1", {"description": "Latest smartphone from Apple"}),
+            Entity("2", {"description": "Powerful laptop from Apple"}),
+        ]
+
+        blocks = self.blocker.create_blocks(entities)
+
+        for entity in entities:
+            keys = self.blocker.block_keys(entity)
+            self.assertTrue(all(entity in blocks[key] for key in keys))
+        self.assertEqual(
+            self.blocker._minhash_signature("apple LAPTOP"), self.blocker._minhash_signature("laptop apple")
+        )
+
     def test_empty_input(self):
         blocks = self.blocker.create_blocks([])
         self.assertEqual(len(blocks), 0)
@@ -57,6 +72,11 @@ class TestLSHBlocker(unittest.TestCase):
         self.assertGreater(len(blocks), 0)
         self.assertEqual(sum(len(block) for block in blocks.values()), 20)
 
+    def test_block_keys(self):
+        entity = Entity("1", {"name": "iPhone 12", "description": "Latest smartphone from Apple"})
+        blocks = self.blocker.create_blocks([entity])
+        self.assertEqual(set(self.blocker.block_keys(entity)), set(blocks.keys()))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,169 @@
+import math
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from rezolva.blockers.block_cleaner import BlockCleaner
+from rezolva.blockers.meta_blocker import MetaBlocker
+from rezolva.blockers.q_gram_blocker import QGramBlocker
+from rezolva.core.base import Entity
+from rezolva.core.resolver import EntityResolver
+from rezolva.matchers.jaccard_matcher import JaccardMatcher
+from rezolva.model_builders.simple_model_builder import SimpleModelBuilder
+from rezolva.preprocessors.simple_preprocessor import SimplePreprocessor
+
+
+class TestMetaBlocker(unittest.TestCase):
+    def setUp(self):
+        self.blocks = {"a": {"1", "2", "3"}, "b": {"1", "2"}, "c": {"1", "3", "4"}, "d": {"4"}}
+        self.entity_blocks = {"1": {"a", "b", "c"}, "2": {"a", "b"}, "3": {"a", "c"}, "4": {"c", "d"}}
+
+    def _weights(self, weighting, entity_id="1"):
+        meta_blocker = MetaBlocker(weighting=weighting)
+        meta_blocker.fit(self.blocks, self.entity_blocks)
+        return meta_blocker.edge_weights(
+            self.entity_blocks[entity_id], self.blocks, self.entity_blocks, exclude=entity_id
+        )
+
+    def test_cbs(self):
+        self.assertEqual(self._weights("cbs"), {"2": 2, "3": 2, "4": 1})
+
+    def test_jaccard(self):
+        self.assertEqual(self._weights("jaccard"), {"2": 2 / 3, "3": 2 / 3, "4": 1 / 4})
+
+    def test_ecbs(self):
+        weights = self._weights("ecbs")
+        self.assertAlmostEqual(weights["2"], 2 * math.log(4 / 3) * math.log(4 / 2))
+        self.assertAlmostEqual(weights["4"], 1 * math.log(4 / 3) * math.log(4 / 2))
+
+    def test_arcs(self):
+        weights = self._weights("arcs")
+        self.assertAlmostEqual(weights["2"], 1 / 3 + 1)
+        self.assertAlmostEqual(weights["4"], 1 / 3)
+
+    def test_wnp(self):
+        meta_blocker = MetaBlocker(weighting="cbs", pruning="wnp")
+        self.assertEqual(meta_blocker.prune({"2": 2, "3": 2, "4": 1}), ["2", "3"])
+        self.assertEqual(meta_blocker.prune({"2": 0.1, "3": 0.1}), ["2", "3"])
+
+    def test_cnp(self):
+        meta_blocker = MetaBlocker(weighting="cbs", pruning="cnp", k=1)
+        meta_blocker.fit(self.blocks, self.entity_blocks)
+        self.assertEqual(meta_blocker.prune({"2": 2, "3": 3, "4": 1}), ["3"])
+        self.assertEqual(meta_blocker.node_threshold({"2": 2, "3": 3, "4": 1}), 3)
+
+    def test_cnp_cardinality(self):
+        meta_blocker = MetaBlocker(pruning="cnp")
+        meta_blocker.fit(self.blocks, self.entity_blocks)
+        # 9 block assignments over 4 entities
+        self.assertEqual(meta_blocker.cardinality, 1)
+
+    def test_wep(self):
+        meta_blocker = MetaBlocker(weighting="cbs", pruning="wep")
+        meta_blocker.fit(self.blocks, self.entity_blocks)
+        # Edges: 1-2 (2), 1-3 (2), 1-4 (1), 2-3 (1), 3-4 (1)
+        self.assertAlmostEqual(meta_blocker.threshold, 7 / 5)
+        self.assertEqual(meta_blocker.prune({"2": 2, "3": 2, "4": 1}), ["2", "3"])
+
+    def test_cep(self):
+        meta_blocker = MetaBlocker(weighting="cbs", pruning="cep")
+        meta_blocker.fit(self.blocks, self.entity_blocks)
+        # 9 block assignments keep the 4 heaviest edges
+        self.assertEqual(meta_blocker.threshold, 1)
+
+    def test_invalid_scheme(self):
+        with self.assertRaises(ValueError):
+            MetaBlocker(weighting="unknown")
+        with self.assertRaises(ValueError):
+            MetaBlocker(pruning="unknown")
+
+    def test_resolver(self):
+        entities = [
+            Entity("1", {"name": "john smith"}),
+            Entity("2", {"name": "jon smith"}),
+            Entity("3", {"name": "jane doe"}),
+            Entity("4", {"name": "joan dole"}),
+            Entity("5", {"name": "bob smithers"}),
+        ]
+        comparisons = {}
+        for meta_blocker in (None, MetaBlocker(weighting="jaccard", pruning="wnp")):
+            matcher = JaccardMatcher(threshold=0.3, attribute_weights={"name": 1.0})
+            resolver = EntityResolver(
+                SimplePreprocessor([]),
+                SimpleModelBuilder(["name"]),
+                matcher,
+                QGramBlocker(3, lambda e: e.attributes["name"], threshold=1),
+                meta_blocker=meta_blocker,
+            )
+            resolver.train(entities)
+
+            pairs = [(entity.id, match.id) for entity, match, _ in resolver.deduplicate()]
+            self.assertEqual(pairs, [("1", "2")])
+            matches = resolver.resolve([Entity("q", {"name": "john smith"})], top_k=2)[0][1]
+            self.assertEqual([match.id for match, _ in matches], ["1", "2"])
+            comparisons[meta_blocker is None] = matcher.comparison_stats["comparisons"]
+
+        self.assertLess(comparisons[False], comparisons[True])
+
+    def _resolver(self, meta_blocker, block_cleaner=None):
+        return EntityResolver(
+            SimplePreprocessor([]),
+            SimpleModelBuilder(["name"]),
+            JaccardMatcher(threshold=0.3, attribute_weights={"name": 1.0}),
+            QGramBlocker(3, lambda e: e.attributes["name"], threshold=1),
+            meta_blocker=meta_blocker,
+            block_cleaner=block_cleaner,
+        )
+
+    def test_incremental_statistics(self):
+        names = ["john smith", "jon smith", "jane doe", "joan dole", "bob smithers", "john smyth", "jane dough"]
+        entities = [Entity(str(i), {"name": name}) for i, name in enumerate(names)]
+        for weighting in MetaBlocker.WEIGHTING_SCHEMES:
+            for pruning in MetaBlocker.PRUNING_SCHEMES:
+                for block_cleaner in (None, BlockCleaner(max_block_size=3)):
+                    with self.subTest(weighting=weighting, pruning=pruning, block_cleaner=block_cleaner):
+                        resolver = self._resolver(MetaBlocker(weighting, pruning), block_cleaner)
+                        resolver.train(entities[:4])
+                        with patch.object(MetaBlocker, "fit") as fit:
+                            resolver.update_model(entities[4:])
+                            resolver.remove_entities(["1", "5"])
+                            resolver.upsert_entities([Entity("2", {"name": "jane smith"})])
+                        fit.assert_not_called()
+
+                        # The statistics kept up to date match the ones fitted on the final blocks
+                        fitted = MetaBlocker(weighting, pruning)
+                        fitted.fit(resolver.blocks, resolver.entity_blocks)
+                        self.assertEqual(resolver.meta_blocker.stats, fitted.stats)
+                        self.assertEqual(resolver.meta_blocker.threshold, fitted.threshold)
+                        self.assertEqual(resolver.meta_blocker.cardinality, fitted.cardinality)
+
+    def test_saved_statistics(self):
+        entities = [Entity(str(i), {"name": name}) for i, name in enumerate(["john smith", "jon smith", "jane doe"])]
+        resolver = self._resolver(MetaBlocker("cbs", "wep"))
+        resolver.train(entities)
+        loaded = self._resolver(MetaBlocker("cbs", "wep"))
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, "model.rzl")
+            resolver.save_model(path)
+            # Loading restores the statistics instead of walking the blocks
+            with patch.object(MetaBlocker, "fit") as fit:
+                loaded.load_model(path, lazy=True)
+            fit.assert_not_called()
+            self.assertEqual(loaded.meta_blocker.stats, resolver.meta_blocker.stats)
+            self.assertEqual(loaded.meta_blocker.threshold, resolver.meta_blocker.threshold)
+
+            # A meta-blocker weighting edges differently is fitted on the loaded blocks
+            other = self._resolver(MetaBlocker("arcs", "wep"))
+            with patch.object(MetaBlocker, "fit", wraps=other.meta_blocker.fit) as fit:
+                other.load_model(path)
+            fit.assert_called_once()
+            self.assertEqual(other.meta_blocker.edge_profiles, {(): 3})
+            # The "arcs" weights of the edges of every block of two or more entities add up to 1
+            total = sum(sum(other._edge_weights(entity_id).values()) for entity_id in other.entity_blocks) / 2
+            self.assertAlmostEqual(other.meta_blocker.threshold, total / 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -54,6 +54,15 @@ class TestQGramBlocker(unittest.TestCase):
         self.assertIsNotNone(john_block)
         self.assertIn(self.entities[2], john_block)  # Jon Doe should be in the same block as John Doe
 
+    def test_block_keys(self):
+        blocks = self.blocker.create_blocks(self.entities)
+        keys = self.blocker.block_keys(self.entities[0])
+
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(
+            {key for key in keys if key in blocks}, {key for key, block in blocks.items() if self.entities[0] in block}
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
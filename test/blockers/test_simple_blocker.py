@@ -56,6 +56,10 @@ class TestSimpleBlocker(unittest.TestCase):
         self.assertEqual(len(blocks["G"]), 1)
         self.assertEqual(len(blocks["M"]), 1)
 
+    def test_block_keys(self):
+        entity = Entity("1", {"name": "iPhone 12", "category": "Smartphone"})
+        self.assertEqual(self.blocker.block_keys(entity), ["Smartphone"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -47,6 +47,13 @@ class TestSortedNeighborhoodBlocker(unittest.TestCase):
         self.assertIn(self.entities[3], blocks["n"])  # New York
         self.assertIn(self.entities[1], blocks["l"])  # Los Angeles
 
+    def test_block_keys(self):
+        blocks = self.blocker.create_blocks(self.entities)
+        for entity in self.entities:
+            keys = self.blocker.block_keys(entity)
+            self.assertEqual(keys, [default_key_func(entity)])
+            self.assertIn(entity, blocks[keys[0]])
+
 
 if __name__ == "__main__":
     unittest.main()
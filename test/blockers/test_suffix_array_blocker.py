@@ -62,6 +62,14 @@ class TestSuffixArrayBlocker(unittest.TestCase):
         self.assertIn(self.entities[1], smith_block)  # Jane Smith
         self.assertIn(self.entities[2], smith_block)  # John Smith
 
+    def test_block_keys(self):
+        blocks = self.blocker.create_blocks(self.entities)
+        keys = self.blocker.block_keys(self.entities[0])
+
+        self.assertIn("new york", keys)
+        self.assertTrue(all(len(key) >= self.blocker.min_suffix_length for key in keys))
+        self.assertEqual(set(keys), {key for key, block in blocks.items() if self.entities[0] in block})
+
 
 if __name__ == "__main__":
     unittest.main()
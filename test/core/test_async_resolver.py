@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from rezolva.blockers.simple_blocker import SimpleBlocker
+from rezolva.core.async_resolver import AsyncEntityResolver
+from rezolva.core.base import Entity
+from rezolva.core.resolver import EntityResolver
+from rezolva.matchers.jaccard_matcher import JaccardMatcher
+from rezolva.model_builders.simple_model_builder import SimpleModelBuilder
+from rezolva.preprocessors.simple_preprocessor import SimplePreprocessor
+
+
+def same_block(entity):
+    return "all"
+
+
+class TestAsyncEntityResolver(unittest.TestCase):
+    def setUp(self):
+        self.resolver = Mock(spec=EntityResolver)
+        self.resolver.resolve.side_effect = lambda entities, top_k: [
+            (entity, [(Entity(f"match-{entity.id}", {}), 1.0)]) for entity in entities
+        ]
+
+    def test_resolve_batches_concurrent_requests(self):
+        async_resolver = AsyncEntityResolver(self.resolver, max_batch_size=100, max_wait=0.01)
+        entities = [Entity(str(i), {"name": f"Entity{i}"}) for i in range(10)]
+
+        async def run():
+            return await asyncio.gather(*(async_resolver.resolve(entity) for entity in entities))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(self.resolver.resolve.call_count, 1)
+        self.assertEqual(len(self.resolver.resolve.call_args[0][0]), 10)
+        for entity, matches in zip(entities, results):
+            self.assertEqual(matches[0][0].id, f"match-{entity.id}")
+
+    def test_resolve_respects_max_batch_size(self):
+        async_resolver = AsyncEntityResolver(self.resolver, max_batch_size=4, max_wait=0.01)
+        entities = [Entity(str(i), {"name": f"Entity{i}"}) for i in range(10)]
+
+        results = asyncio.run(async_resolver.resolve_many(entities, top_k=2))
+
+        self.assertEqual(self.resolver.resolve.call_count, 3)
+        self.assertTrue(all(call[0][1] == 2 for call in self.resolver.resolve.call_args_list))
+        self.assertEqual([entity.id for entity, _ in results], [entity.id for entity in entities])
+        self.assertEqual([matches[0][0].id for _, matches in results], [f"match-{e.id}" for e in entities])
+
+    def test_resolve_propagates_errors(self):
+        self.resolver.resolve.side_effect = ValueError("Model not trained. Call train() first.")
+        async_resolver = AsyncEntityResolver(self.resolver)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(async_resolver.resolve(Entity("1", {"name": "John"})))
+
+    def test_concurrent_requests_with_same_id(self):
+        resolver = EntityResolver(
+            SimplePreprocessor([]),
+            SimpleModelBuilder(["name"]),
+            JaccardMatcher(threshold=0.5, attribute_weights={"name": 1.0}),
+            SimpleBlocker(same_block),
+        )
+        resolver.train([Entity("1", {"name": "john smith"}), Entity("2", {"name": "jane doe"})])
+        async_resolver = AsyncEntityResolver(resolver, max_batch_size=100, max_wait=0.01)
+
+        async def run():
+            return await asyncio.gather(
+                async_resolver.resolve(Entity("q", {"name": "john smith"})),
+                async_resolver.resolve(Entity("q", {"name": "jane doe"})),
+            )
+
+        # Both requests are resolved in one batch, each with its own entity
+        results = asyncio.run(run())
+
+        self.assertEqual(
+            [[(match.id, score) for match, score in matches] for matches in results], [[("1", 1.0)], [("2", 1.0)]]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from typing import List, Tuple
 
@@ -11,6 +12,25 @@ class TestEntity(unittest.TestCase):
         self.assertEqual(entity.id, "1")
         self.assertEqual(entity.attributes, {"name": "John", "age": 30})
 
+    def test_entity_slots(self):
+        entity = Entity("1", {"name": "John"})
+        self.assertFalse(hasattr(entity, "__dict__"))
+        with self.assertRaises(AttributeError):
+            entity.extra = True
+
+    def test_entity_pickle(self):
+        entity = pickle.loads(pickle.dumps(Entity("1", {"name": "John"})))
+        self.assertEqual((entity.id, entity.attributes), ("1", {"name": "John"}))
+
+    def test_unpickle_dict_state(self):
+        # An Entity pickled before Entity defined __slots__, with its __dict__ as state
+        data = (
+            b"\x80\x02crezolva.core.base\nEntity\nq\x00)\x81q\x01}q\x02(X\x02\x00\x00\x00idq\x03X\x01\x00\x00\x00"
+            b"1q\x04X\n\x00\x00\x00attributesq\x05}q\x06X\x04\x00\x00\x00nameq\x07X\x04\x00\x00\x00Johnq\x08sub."
+        )
+        entity = pickle.loads(data)
+        self.assertEqual((entity.id, entity.attributes), ("1", {"name": "John"}))
+
 
 class TestAbstractClasses(unittest.TestCase):
     def test_abstract_methods(self):
@@ -0,0 +1,95 @@
+import pickle
+import unittest
+
+from rezolva.blockers.simple_blocker import SimpleBlocker
+from rezolva.core.base import Entity
+from rezolva.core.entity_store import EntityStore
+from rezolva.core.resolver import EntityResolver
+from rezolva.matchers.jaccard_matcher import JaccardMatcher
+from rezolva.model_builders.simple_model_builder import SimpleModelBuilder
+from rezolva.preprocessors.simple_preprocessor import SimplePreprocessor
+
+
+class TestEntityStore(unittest.TestCase):
+    def setUp(self):
+        self.store = EntityStore()
+        self.store.add(Entity("1", {"name": "John", "city": "New York"}))
+        self.store.add(Entity("2", {"name": "Jane", "zip": "10001"}))
+
+    def test_get(self):
+        entity = self.store["1"]
+        self.assertIsInstance(entity, Entity)
+        self.assertEqual(entity.id, "1")
+        self.assertEqual(entity.attributes, {"name": "John", "city": "New York"})
+        self.assertEqual(self.store["2"].attributes, {"name": "Jane", "zip": "10001"})
+
+    def test_mapping_interface(self):
+        self.assertEqual(len(self.store), 2)
+        self.assertIn("1", self.store)
+        self.assertNotIn("3", self.store)
+        self.assertEqual(list(self.store), ["1", "2"])
+        self.assertEqual([e.id for e in self.store.values()], ["1", "2"])
+        with self.assertRaises(KeyError):
+            self.store["3"]
+
+    def test_get_value(self):
+        self.assertEqual(self.store.get_value("1", "city"), "New York")
+        self.assertIsNone(self.store.get_value("2", "city"))
+        self.assertEqual(self.store.get_value("2", "missing", ""), "")
+        self.assertEqual(self.store.attribute_names, ["name", "city", "zip"])
+
+    def test_overwrite(self):
+        self.store["1"] = Entity("1", {"name": "Johnny"})
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store["1"].attributes, {"name": "Johnny"})
+
+    def test_delete_reuses_row(self):
+        row = self.store.row("1")
+        del self.store["1"]
+        self.assertNotIn("1", self.store)
+        self.assertEqual(len(self.store), 1)
+
+        self.assertEqual(self.store.add(Entity("3", {"name": "Bob"})), row)
+        self.assertEqual(self.store["3"].attributes, {"name": "Bob"})
+        self.assertEqual(self.store.entity_at(row).id, "3")
+
+    def test_interned_values(self):
+        self.store.add(Entity("3", {"city": "".join(["New ", "York"])}))
+        self.assertIs(self.store.get_value("3", "city"), self.store.get_value("1", "city"))
+
+    def test_pickle(self):
+        restored = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(restored["2"].attributes, {"name": "Jane", "zip": "10001"})
+        self.assertEqual(restored.get_value("2", "city", "none"), "none")
+
+    def test_resolver_with_entity_store(self):
+        def create_resolver(entity_store=None):
+            return EntityResolver(
+                SimplePreprocessor([str.lower]),
+                SimpleModelBuilder(["name"]),
+                JaccardMatcher(threshold=0.3, attribute_weights={"name": 1.0}),
+                SimpleBlocker(lambda e: e.attributes["name"][0]),
+                entity_store=entity_store,
+            )
+
+        entities = [Entity(str(i), {"name": name}) for i, name in enumerate(["acme corp", "acme inc", "beta labs"])]
+        queries = [Entity("q1", {"name": "Acme Corp Ltd"}), Entity("q2", {"name": "Beta Labs"})]
+
+        store = EntityStore()
+        resolver = create_resolver(store)
+        resolver.train(entities)
+        expected = create_resolver()
+        expected.train(entities)
+
+        self.assertIs(resolver.preprocessed_entities, store)
+        self.assertIs(resolver.model["entities"], store)
+        self.assertEqual(len(store), 3)
+        for (_, matches), (_, expected_matches) in zip(resolver.resolve(queries), expected.resolve(queries)):
+            self.assertEqual([(m.id, s) for m, s in matches], [(m.id, s) for m, s in expected_matches])
+
+        resolver.update_model([Entity("3", {"name": "Beta Labs Inc"})])
+        self.assertEqual(store["3"].attributes, {"name": "beta labs inc"})
+
+
+if __name__ == "__main__":
+    unittest.main()
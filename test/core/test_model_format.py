@@ -0,0 +1,150 @@
+import os
+import pickle
+import struct
+import tempfile
+import unittest
+
+from rezolva.core.base import Entity
+from rezolva.core.model_format import (FORMAT_VERSION, MAGIC, is_model_file,
+                                       read_model, write_model)
+from rezolva.matchers.cosine_similarity_matcher import CosineSimilarityMatcher
+from rezolva.model_builders.simple_vector_model_builder import \
+    SimpleVectorModelBuilder
+
+
+class TestModelFormat(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "model.rzl")
+        self.entities = {
+            "1": Entity("1", {"name": "john doe", "age": 30}),
+            2: Entity(2, {"name": "jane doe", "tags": ["a", "b"]}),
+            "3": Entity("3", {"name": "bob smith"}),
+        }
+        self.blocks = {"doe": {"1", 2}, ("smith", 1): {"3"}, 7: {"1"}}
+        self.entity_blocks = {"1": {"doe", 7}, 2: {"doe"}, "3": {("smith", 1)}}
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _round_trip(self, model):
+        write_model(self.path, model, self.entities, self.blocks, self.entity_blocks)
+        return read_model(self.path)
+
+    def test_round_trip(self):
+        data = self._round_trip({"entities": self.entities, "index": {"doe": {"1", 2}}})
+
+        self.assertTrue(is_model_file(self.path))
+        self.assertEqual(list(data["preprocessed_entities"]), ["1", 2, "3"])
+        self.assertEqual(data["preprocessed_entities"][2].attributes, {"name": "jane doe", "tags": ["a", "b"]})
+        self.assertEqual(data["preprocessed_entities"]["1"].attributes["age"], 30)
+        self.assertEqual(dict(data["blocks"]), self.blocks)
+        self.assertEqual(dict(data["entity_blocks"]), self.entity_blocks)
+        self.assertIs(data["model"]["entities"], data["preprocessed_entities"])
+        self.assertEqual(data["model"]["index"], {"doe": {"1", 2}})
+
+    def test_lazy(self):
+        model = {"entities": self.entities, "index": {"doe": {"1", 2}}}
+        write_model(self.path, model, self.entities, self.blocks, self.entity_blocks)
+        data = read_model(self.path, lazy=True, max_shards=2, shard_size=16)
+
+        self.assertEqual(data["blocks"]["doe"], {"1", 2})
+        self.assertEqual(data["preprocessed_entities"][2].attributes, {"name": "jane doe", "tags": ["a", "b"]})
+        self.assertEqual(dict(data["blocks"]), self.blocks)
+        self.assertEqual(dict(data["entity_blocks"]), self.entity_blocks)
+        self.assertEqual(data["model"]["index"], {"doe": {"1", 2}})
+        self.assertIsNone(data["blocks"].get("missing"))
+
+        stats = data["blocks"].shard_stats
+        self.assertGreater(stats["misses"], 0)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertLessEqual(len(data["blocks"]._file.shards), 2)
+        self.assertIsNone(read_model(self.path)["blocks"].shard_stats)
+
+    def test_missing_keys(self):
+        data = self._round_trip({"entities": self.entities})
+
+        self.assertNotIn("2", data["preprocessed_entities"])
+        self.assertIsNone(data["blocks"].get("missing"))
+        with self.assertRaises(KeyError):
+            data["entity_blocks"]["missing"]
+
+    def test_unshared_model(self):
+        data = self._round_trip(["not", "a", "dict"])
+        self.assertEqual(data["model"], ["not", "a", "dict"])
+
+    def test_overlay(self):
+        blocks = self._round_trip({})["blocks"]
+
+        blocks["new"] = {"3"}
+        blocks["doe"] = {"1"}
+        del blocks[7]
+
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual(set(blocks), {"doe", ("smith", 1), "new"})
+        self.assertEqual(blocks["doe"], {"1"})
+        self.assertNotIn(7, blocks)
+        with self.assertRaises(KeyError):
+            del blocks[7]
+
+        # The file itself is left unchanged
+        self.assertEqual(read_model(self.path)["blocks"]["doe"], {"1", 2})
+
+    def test_vectors(self):
+        entities = [Entity("1", {"name": "john doe"}), Entity("2", {"name": "jane doe"}), Entity("3", {"name": ""})]
+        model_builder = SimpleVectorModelBuilder(["name"])
+        model = model_builder.train(entities)
+        self.entities = model["entities"]
+        self.blocks = {"all": {"1", "2", "3"}}
+        self.entity_blocks = {"1": {"all"}, "2": {"all"}, "3": {"all"}}
+
+        loaded = self._round_trip(model)["model"]
+
+        self.assertEqual(dict(loaded["vectors"]), model["vectors"])
+        self.assertEqual(dict(read_model(self.path, lazy=True, shard_size=64)["model"]["vectors"]), model["vectors"])
+        self.assertEqual(loaded["idf"], model["idf"])
+
+        matcher = CosineSimilarityMatcher(threshold=0.1)
+        expected = matcher.match(Entity("1", {"name": "john doe"}), model)
+        matches = matcher.match(Entity("1", {"name": "john doe"}), loaded)
+        self.assertEqual([(m.id, s) for m, s in matches], [(m.id, s) for m, s in expected])
+
+        loaded = model_builder.remove(loaded, ["1"])
+        self.assertEqual(set(loaded["vectors"]), {"2", "3"})
+
+    def test_close(self):
+        write_model(self.path, {"entities": self.entities}, self.entities, self.blocks, self.entity_blocks)
+        mapped = read_model(self.path)
+        self.assertEqual(mapped["blocks"]["doe"], {"1", 2})
+        with read_model(self.path, lazy=True)["file"] as lazy_file:
+            pass
+
+        mapped["file"].close()
+        self.assertTrue(mapped["file"].mmap.closed)
+        self.assertTrue(lazy_file.file.closed)
+
+    def test_invalid_key(self):
+        self.blocks = {frozenset({"a"}): {"1"}}
+        with self.assertRaises(TypeError):
+            write_model(self.path, {}, self.entities, self.blocks, {})
+
+    def test_not_a_model_file(self):
+        with open(self.path, "wb") as f:
+            pickle.dump({}, f)
+
+        self.assertFalse(is_model_file(self.path))
+        with self.assertRaises(ValueError):
+            read_model(self.path)
+
+    def test_newer_version(self):
+        self._round_trip({})
+        with open(self.path, "r+b") as f:
+            f.seek(len(MAGIC))
+            f.write(struct.pack("<I", FORMAT_VERSION + 1))
+
+        with self.assertRaises(ValueError):
+            read_model(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
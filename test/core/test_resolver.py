@@ -1,11 +1,22 @@
-import pickle
+import inspect
+import os
+import tempfile
 import unittest
 from typing import List, Tuple
 from unittest.mock import Mock, patch
 
+from rezolva.blockers.q_gram_blocker import QGramBlocker
+from rezolva.blockers.simple_blocker import SimpleBlocker
 from rezolva.core.base import (Blocker, Entity, Matcher, ModelBuilder,
                                Preprocessor)
 from rezolva.core.resolver import EntityResolver
+from rezolva.matchers.jaccard_matcher import JaccardMatcher
+from rezolva.model_builders.simple_model_builder import SimpleModelBuilder
+from rezolva.preprocessors.simple_preprocessor import SimplePreprocessor
+
+
+def first_letter(entity):
+    return entity.attributes["name"][0]
 
 
 class TestEntityResolver(unittest.TestCase):
@@ -38,24 +49,85 @@ class TestEntityResolver(unittest.TestCase):
         self.blocker.create_blocks.assert_called_once()
         self.assertEqual(len(self.resolver.preprocessed_entities), 2)
         self.assertEqual(self.resolver.blocks, {"block1": {"1", "2"}})
+        self.assertEqual(self.resolver.entity_blocks, {"1": {"block1"}, "2": {"block1"}})
 
     def test_resolve(self):
         entities = [Entity("1", {"name": "John"})]
         self.resolver.model = Mock()  # Simulate a trained model
+        self.resolver.blocks = {"block1": {"2"}}
         self.preprocessor.preprocess.side_effect = lambda e: e
-        self.blocker.create_blocks.return_value = {"block1": entities}
+        self.blocker.block_keys.return_value = ["block1"]
         self.matcher.match.return_value = [(Entity("2", {"name": "Jane"}), 0.8)]
 
         results = self.resolver.resolve(entities)
 
         self.preprocessor.preprocess.assert_called()
-        self.blocker.create_blocks.assert_called_once()
+        self.blocker.block_keys.assert_called_once()
+        self.blocker.create_blocks.assert_not_called()
         self.matcher.match.assert_called_once()
+        self.assertEqual(self.matcher.match.call_args[1], {"top_k": 1})
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0][0].id, "1")
         self.assertEqual(results[0][1][0][0].id, "2")
         self.assertEqual(results[0][1][0][1], 0.8)
 
+    def test_matcher_signature_inspected_once(self):
+        resolver = self._real_resolver([Entity("1", {"name": "john"}), Entity("2", {"name": "jane"})])
+
+        with patch("rezolva.core.resolver.inspect.signature", wraps=inspect.signature) as signature:
+            resolver.resolve([Entity("q1", {"name": "john"}), Entity("q2", {"name": "jane"})])
+            resolver.resolve([Entity("q3", {"name": "john"})])
+            self.assertEqual(signature.call_count, 1)
+
+            # A replaced matcher is inspected again
+            resolver.matcher = JaccardMatcher(threshold=0.5, attribute_weights={"name": 1.0})
+            resolver.resolve([Entity("q4", {"name": "john"})])
+            self.assertEqual(signature.call_count, 2)
+
+    def test_resolve_uses_block_keys(self):
+        entities = [Entity(str(i), {"name": f"Entity{i}"}) for i in range(6)]
+        self.preprocessor.preprocess.side_effect = lambda e: e
+        self.blocker.create_blocks.return_value = {
+            f"block{i}": [e for e in entities if int(e.id) % 3 == i] for i in range(3)
+        }
+        self.resolver.train(entities)
+        self.matcher.match.return_value = []
+
+        self.blocker.block_keys.return_value = ["missing", "block2"]
+        self.resolver.resolve([Entity("q", {"name": "Query"})])
+
+        candidates = self.matcher.match.call_args[0][1]["entities"]
+        self.assertEqual(set(candidates), {"2", "5"})
+
+    def test_resolve_candidate_union(self):
+        self.resolver.model = Mock()
+        self.resolver.preprocessed_entities = {str(i): Entity(str(i), {"name": f"Entity{i}"}) for i in range(5)}
+        self.resolver.blocks = {"a": {"1", "2"}, "b": {"2", "3"}, "c": {"2", "4"}}
+        self.preprocessor.preprocess.side_effect = lambda e: e
+        self.blocker.block_keys.return_value = ["a", "b", "c"]
+        self.matcher.match.return_value = []
+
+        self.resolver.resolve([Entity("q", {"name": "Query"})])
+
+        self.matcher.match.assert_called_once()
+        candidates = self.matcher.match.call_args[0][1]["entities"]
+        self.assertEqual(len(candidates), 4)
+        self.assertEqual(set(candidates), {"1", "2", "3", "4"})
+
+    def test_resolve_max_candidates(self):
+        self.resolver.max_candidates = 1
+        self.resolver.model = Mock()
+        self.resolver.preprocessed_entities = {str(i): Entity(str(i), {"name": f"Entity{i}"}) for i in range(5)}
+        self.resolver.blocks = {"a": {"1", "2"}, "b": {"2", "3"}, "c": {"2", "4"}}
+        self.preprocessor.preprocess.side_effect = lambda e: e
+        self.blocker.block_keys.return_value = ["a", "b", "c"]
+        self.matcher.match.return_value = []
+
+        self.resolver.resolve([Entity("q", {"name": "Query"})])
+
+        candidates = self.matcher.match.call_args[0][1]["entities"]
+        self.assertEqual(list(candidates), ["2"])
+
     def test_resolve_no_model(self):
         with self.assertRaises(ValueError):
             self.resolver.resolve([Entity("1", {"name": "John"})])
@@ -72,6 +144,76 @@ class TestEntityResolver(unittest.TestCase):
         self.assertEqual(len(self.resolver.preprocessed_entities), 2)
         self.assertEqual(len(self.resolver.blocks["block1"]), 2)
         self.assertIsInstance(self.resolver.blocks["block1"], set)
+        self.assertEqual(self.resolver.entity_blocks["2"], {"block1"})
+
+    def _real_resolver(self, entities):
+        resolver = EntityResolver(
+            SimplePreprocessor([]),
+            SimpleModelBuilder(["name"]),
+            JaccardMatcher(threshold=0.1, attribute_weights={"name": 1.0}),
+            SimpleBlocker(first_letter),
+        )
+        resolver.train(entities)
+        return resolver
+
+    def test_deduplicate(self):
+        resolver = EntityResolver(
+            SimplePreprocessor([]),
+            SimpleModelBuilder(["name"]),
+            JaccardMatcher(threshold=0.5, attribute_weights={"name": 1.0}),
+            QGramBlocker(3, lambda e: e.attributes["name"], threshold=1),
+        )
+        resolver.train(
+            [
+                Entity("1", {"name": "john smith"}),
+                Entity("2", {"name": "john smith"}),
+                Entity("3", {"name": "john smyth"}),
+                Entity("4", {"name": "bob"}),
+            ]
+        )
+
+        pairs = [(entity.id, match.id, score) for entity, match, score in resolver.deduplicate()]
+
+        self.assertEqual(pairs, [("1", "2", 1.0)])
+        # Entities 1, 2 and 3 share several blocks, but each of their pairs is compared once
+        self.assertEqual(resolver.matcher.comparison_stats["comparisons"], 3)
+
+    def test_remove_entities(self):
+        resolver = self._real_resolver(
+            [Entity("1", {"name": "john"}), Entity("2", {"name": "jane"}), Entity("3", {"name": "bob"})]
+        )
+        resolver.remove_entities(["1", "3", "unknown"])
+
+        self.assertEqual(resolver.blocks, {"j": {"2"}})
+        self.assertEqual(resolver.entity_blocks, {"2": {"j"}})
+        self.assertEqual(list(resolver.preprocessed_entities), ["2"])
+        self.assertEqual(list(resolver.model["entities"]), ["2"])
+        self.assertNotIn("john", resolver.model["index"]["name"])
+
+        matches = resolver.resolve([Entity("q", {"name": "jane"})], top_k=3)[0][1]
+        self.assertEqual([match.id for match, _ in matches], ["2"])
+
+    def test_remove_entities_without_remove_hook(self):
+        self.preprocessor.preprocess.side_effect = lambda e: e
+        entities = [Entity("1", {"name": "John"}), Entity("2", {"name": "Jane"})]
+        self.blocker.create_blocks.return_value = {"block1": entities}
+        self.resolver.train(entities)
+
+        self.resolver.remove_entities(["1"])
+
+        self.assertEqual(self.model_builder.train.call_count, 2)
+        self.assertEqual(self.model_builder.train.call_args[0][0], [entities[1]])
+        self.assertEqual(self.resolver.blocks, {"block1": {"2"}})
+
+    def test_upsert_entities(self):
+        resolver = self._real_resolver([Entity("1", {"name": "john"}), Entity("2", {"name": "jane"})])
+        resolver.upsert_entities([Entity("1", {"name": "bob"}), Entity("3", {"name": "jim"})])
+
+        self.assertEqual(resolver.blocks, {"j": {"2", "3"}, "b": {"1"}})
+        self.assertEqual(resolver.entity_blocks["1"], {"b"})
+        self.assertEqual(resolver.preprocessed_entities["1"].attributes["name"], "bob")
+        self.assertEqual(resolver.model["index"]["name"]["bob"], {"1"})
+        self.assertNotIn("john", resolver.model["index"]["name"])
 
     def test_bulk_resolve(self):
         entities = [Entity(str(i), {"name": f"Entity{i}"}) for i in range(10)]
@@ -109,35 +251,134 @@ class TestEntityResolver(unittest.TestCase):
             self.assertEqual(matches[0][0].id, "match")
             self.assertEqual(matches[0][1], 0.8)
 
-    @patch("builtins.open", new_callable=unittest.mock.mock_open)
-    @patch("pickle.dump")
-    def test_save_model(self, mock_pickle_dump, mock_open):
+    def test_bulk_resolve_parallel(self):
+        resolver = EntityResolver(
+            SimplePreprocessor([str.lower]),
+            SimpleModelBuilder(["name"]),
+            JaccardMatcher(threshold=0.3, attribute_weights={"name": 1.0}),
+            SimpleBlocker(first_letter),
+        )
+        names = ["acme corp", "acme inc", "beta labs", "beta labs inc", "gamma co", "gamma company"]
+        resolver.train([Entity(str(i), {"name": name}) for i, name in enumerate(names)])
+        queries = [Entity(f"q{i}", {"name": name + " ltd"}) for i, name in enumerate(names * 3)]
+
+        sequential = resolver.bulk_resolve(queries, batch_size=4)
+        parallel = resolver.bulk_resolve(queries, batch_size=4, n_jobs=2)
+
+        self.assertEqual(len(parallel), len(queries))
+        for query, (entity, matches), (_, expected) in zip(queries, parallel, sequential):
+            self.assertIs(entity, query)
+            self.assertEqual([(m.id, s) for m, s in matches], [(m.id, s) for m, s in expected])
+
+    def test_iter_resolve(self):
         self.resolver.model = Mock()
-        self.resolver.preprocessed_entities = {"1": Entity("1", {"name": "John"})}
-        self.resolver.blocks = {"block1": set(["1"])}
-
-        self.resolver.save_model("model.pkl")
-
-        mock_open.assert_called_once_with("model.pkl", "wb")
-        mock_pickle_dump.assert_called_once()
-
-    @patch("builtins.open", new_callable=unittest.mock.mock_open)
-    @patch("pickle.load")
-    def test_load_model(self, mock_pickle_load, mock_open):
-        mock_data = {
-            "model": Mock(),
-            "preprocessed_entities": {"1": Entity("1", {"name": "John"})},
-            "blocks": {"block1": set(["1"])},
-        }
-        mock_pickle_load.return_value = mock_data
-
-        self.resolver.load_model("model.pkl")
-
-        mock_open.assert_called_once_with("model.pkl", "rb")
-        mock_pickle_load.assert_called_once()
-        self.assertEqual(self.resolver.model, mock_data["model"])
-        self.assertEqual(self.resolver.preprocessed_entities, mock_data["preprocessed_entities"])
-        self.assertEqual(self.resolver.blocks, mock_data["blocks"])
+        self.preprocessor.preprocess.side_effect = lambda e: e
+        self.blocker.block_keys.return_value = []
+        consumed = []
+
+        def entity_stream():
+            for i in range(10):
+                consumed.append(i)
+                yield Entity(str(i), {"name": f"Entity{i}"})
+
+        results = self.resolver.iter_resolve(entity_stream(), batch_size=3)
+
+        self.assertEqual(consumed, [])
+        entity, matches = next(results)
+        self.assertEqual(entity.id, "0")
+        self.assertEqual(matches, [])
+        self.assertEqual(len(consumed), 3)
+
+        self.assertEqual([entity.id for entity, _ in results], [str(i) for i in range(1, 10)])
+
+    def test_iter_resolve_parallel(self):
+        resolver = EntityResolver(
+            SimplePreprocessor([str.lower]),
+            SimpleModelBuilder(["name"]),
+            JaccardMatcher(threshold=0.3, attribute_weights={"name": 1.0}),
+            SimpleBlocker(first_letter),
+        )
+        resolver.train([Entity("1", {"name": "acme corp"}), Entity("2", {"name": "beta labs"})])
+        queries = (Entity(f"q{i}", {"name": ["acme inc", "beta labs inc"][i % 2]}) for i in range(20))
+
+        results = list(resolver.iter_resolve(queries, batch_size=3, n_jobs=2))
+
+        self.assertEqual([entity.id for entity, _ in results], [f"q{i}" for i in range(20)])
+        self.assertEqual([matches[0][0].id for _, matches in results], ["1", "2"] * 10)
+
+    def test_save_and_load_model(self):
+        entities = [Entity("1", {"name": "john"}), Entity("2", {"name": "jane"}), Entity("3", {"name": "bob"})]
+        resolver = self._real_resolver(entities)
+        loaded = self._real_resolver([])
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, "model.rzl")
+            resolver.save_model(path)
+            loaded.load_model(path)
+
+            self.assertEqual(dict(loaded.blocks), resolver.blocks)
+            self.assertEqual(dict(loaded.entity_blocks), resolver.entity_blocks)
+            self.assertEqual(loaded.preprocessed_entities["2"].attributes, {"name": "jane"})
+            self.assertIs(loaded.model["entities"], loaded.preprocessed_entities)
+            self.assertEqual(loaded.model["index"], resolver.model["index"])
+            matches = loaded.resolve([Entity("q", {"name": "jane"})])[0][1]
+            self.assertEqual([(match.id, score) for match, score in matches], [("2", 1.0)])
+
+            # Changes to a loaded model stay in memory
+            loaded.update_model([Entity("4", {"name": "jim"})])
+            loaded.remove_entities(["3"])
+            self.assertEqual(loaded.blocks["j"], {"1", "2", "4"})
+            self.assertNotIn("b", loaded.blocks)
+            self.assertEqual(len(loaded.preprocessed_entities), 3)
+
+    def test_load_model_lazy(self):
+        resolver = self._real_resolver([Entity(str(i), {"name": f"name{i}"}) for i in range(100)])
+        loaded = self._real_resolver([])
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, "model.rzl")
+            resolver.save_model(path)
+            loaded.load_model(path, lazy=True, max_shards=4)
+
+            matches = loaded.resolve([Entity("q", {"name": "name42"})])[0][1]
+            self.assertEqual([(match.id, score) for match, score in matches], [("42", 1.0)])
+            self.assertGreater(loaded.get_stats()["shard_stats"]["misses"], 0)
+
+    def test_load_pickled_model(self):
+        # A model saved by an earlier version, whose entities are pickled with their __dict__ as state
+        data = (
+            b"\x80\x02}q\x00(X\x05\x00\x00\x00modelq\x01}q\x02X\x08\x00\x00\x00entitiesq\x03}q\x04X\x01\x00\x00"
+            b"\x001q\x05crezolva.core.base\nEntity\nq\x06)\x81q\x07}q\x08(X\x02\x00\x00\x00idq\th\x05X\n\x00\x00"
+            b"\x00attributesq\n}q\x0bX\x04\x00\x00\x00nameq\x0cX\x04\x00\x00\x00Johnq\rsubssX\x15\x00\x00\x00"
+            b"preprocessed_entitiesq\x0e}q\x0fh\x05h\x06)\x81q\x10}q\x11(h\th\x05h\n}q\x12h\x0ch\rsubsX\x06\x00\x00"
+            b"\x00blocksq\x13}q\x14X\x06\x00\x00\x00block1q\x15c__builtin__\nset\nq\x16]q\x17h\x05a\x85q\x18Rq\x19su."
+        )
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, "model.pkl")
+            with open(path, "wb") as f:
+                f.write(data)
+            self.resolver.load_model(path)
+
+        self.assertEqual(self.resolver.preprocessed_entities["1"].attributes, {"name": "John"})
+        self.assertEqual(self.resolver.model["entities"]["1"].id, "1")
+        self.assertEqual(self.resolver.blocks, {"block1": {"1"}})
+        self.assertEqual(self.resolver.entity_blocks, {"1": {"block1"}})
+
+    def test_load_model_closes_previous_file(self):
+        resolver = self._real_resolver([Entity("1", {"name": "john"})])
+        loaded = self._real_resolver([])
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, "model.rzl")
+            resolver.save_model(path)
+            loaded.load_model(path, lazy=True)
+            first = loaded._model_file
+            loaded.load_model(path)
+
+            self.assertTrue(first.file.closed)
+            self.assertFalse(loaded._model_file.mmap.closed)
+            self.assertEqual(loaded.preprocessed_entities["1"].attributes, {"name": "john"})
 
     def test_get_stats(self):
         self.resolver.preprocessed_entities = {"1": Entity("1", {"name": "John"}), "2": Entity("2", {"name": "Jane"})}
@@ -1,7 +1,7 @@
 import unittest
 
 from rezolva.core.base import Entity
-from rezolva.matchers.base_matcher import BaseAttributeMatcher
+from rezolva.matchers.base_matcher import BaseAttributeMatcher, TopKMatches
 
 
 class DummyMatcher(BaseAttributeMatcher):
@@ -30,6 +30,121 @@ class TestBaseAttributeMatcher(unittest.TestCase):
         self.assertEqual(matches[1][0].id, "2")
         self.assertAlmostEqual(matches[1][1], 0.6666666666666666)
 
+    def test_match_top_k(self):
+        entity = Entity("1", {"name": "John", "age": "30"})
+        model = {
+            "entities": {
+                "2": Entity("2", {"name": "John", "age": "31"}),
+                "3": Entity("3", {"name": "Jane", "age": "30"}),
+                "4": Entity("4", {"name": "John", "age": "30"}),
+                "5": Entity("5", {"name": "John", "age": "30"}),
+            }
+        }
+
+        matches = self.matcher.match(entity, model, top_k=2)
+        self.assertEqual([(m.id, s) for m, s in matches], [("4", 1.0), ("5", 1.0)])
+        self.assertEqual(
+            [(m.id, s) for m, s in self.matcher.match(entity, model, top_k=3)],
+            [(m.id, s) for m, s in self.matcher.match(entity, model)],
+        )
+
+    def test_match_abandons_early(self):
+        compared = []
+
+        class RecordingMatcher(DummyMatcher):
+            def _calculate_attribute_similarity(self, val1, val2):
+                compared.append(val2)
+                return super()._calculate_attribute_similarity(val1, val2)
+
+        matcher = RecordingMatcher(threshold=0.5, attribute_weights={"name": 1.0, "address": 0.5})
+        entity = Entity("1", {"name": "John", "address": "1 Long Street Name"})
+        model = {
+            "entities": {
+                "2": Entity("2", {"name": "Jane", "address": "1 Long Street Name"}),
+                "3": Entity("3", {"name": "John", "address": "2 Other Road"}),
+            }
+        }
+
+        matches = matcher.match(entity, model)
+
+        self.assertEqual([(m.id, s) for m, s in matches], [("3", 2 / 3)])
+        # The cheap, heavily weighted name is compared first, so candidate 2 never reaches the address
+        self.assertEqual(compared, ["Jane", "John", "2 Other Road"])
+        self.assertEqual(
+            matcher.comparison_stats, {"comparisons": 2, "abandoned": 1, "attribute_comparisons_skipped": 1}
+        )
+
+        matcher.reset_comparison_stats()
+        self.assertEqual(matcher.comparison_stats["comparisons"], 0)
+
+    def test_match_abandons_below_top_k_floor(self):
+        entity = Entity("1", {"name": "John", "age": "30"})
+        model = {
+            "entities": {
+                "2": Entity("2", {"name": "John", "age": "30"}),
+                "3": Entity("3", {"name": "Jane", "age": "30"}),
+                "4": Entity("4", {"name": "John", "age": "31"}),
+            }
+        }
+
+        matches = self.matcher.match(entity, model, top_k=1)
+
+        self.assertEqual([(m.id, s) for m, s in matches], [("2", 1.0)])
+        self.assertEqual(self.matcher.comparison_stats["abandoned"], 2)
+
+    def test_min_similarity(self):
+        bounds = []
+
+        class BoundedMatcher(DummyMatcher):
+            def _calculate_bounded_similarity(self, val1, val2, min_similarity):
+                bounds.append(min_similarity)
+                return super()._calculate_bounded_similarity(val1, val2, min_similarity)
+
+        matcher = BoundedMatcher(threshold=0.5, attribute_weights={"name": 1.0, "age": 0.5})
+        entity = Entity("1", {"name": "John", "age": "30"})
+
+        matches = matcher.match(entity, {"entities": {"2": Entity("2", {"name": "John", "age": "31"})}})
+
+        self.assertEqual([m.id for m, _ in matches], ["2"])
+        # The name has to reach (0.5 * 1.5 - 0.5) / 1.0 even if the age matches, the age (0.5 * 1.5 - 1.0) / 0.5
+        self.assertAlmostEqual(bounds[0], 0.25)
+        self.assertAlmostEqual(bounds[1], -0.5)
+
+    def test_match_batch(self):
+        batches = []
+
+        class BatchMatcher(DummyMatcher):
+            def similarity_many(self, query, candidates, min_similarity=float("-inf")):
+                batches.append(list(candidates))
+                return [self._calculate_attribute_similarity(query, candidate) for candidate in candidates]
+
+        entity = Entity("q", {"name": "John", "age": "30"})
+        entities = [Entity(str(i), {"name": ["John", "Jane"][i % 2], "age": str(30 + i % 3)}) for i in range(40)]
+        model = {"entities": {e.id: e for e in entities}}
+        sequential = DummyMatcher(threshold=0.5, attribute_weights={"name": 1.0, "age": 0.5})
+        matcher = BatchMatcher(threshold=0.5, attribute_weights={"name": 1.0, "age": 0.5})
+
+        for top_k in (None, 3):
+            self.assertEqual(
+                [(m.id, s) for m, s in matcher.match(entity, model, top_k=top_k)],
+                [(m.id, s) for m, s in sequential.match(entity, model, top_k=top_k)],
+            )
+
+        # The names of all candidates are compared in one batch, then the ages of the 20 Johns
+        self.assertEqual([len(batch) for batch in batches[:2]], [40, 20])
+        self.assertEqual(matcher.comparison_stats["abandoned"], 40)
+
+        matcher = BatchMatcher(threshold=0.5, attribute_weights={"name": 1.0, "age": 0.5}, min_batch_candidates=41)
+        batches.clear()
+        matcher.match(entity, model)
+        self.assertEqual(batches, [])
+
+    def test_attribute_costs(self):
+        matcher = DummyMatcher(attribute_weights={"name": 1.0, "age": 0.5}, attribute_costs={"name": 10.0})
+        steps, total_weight, _ = matcher._compile_comparison_plan(Entity("1", {"name": "John", "age": "30"}))
+        self.assertEqual([attr for attr, _, _ in steps], ["age", "name"])
+        self.assertEqual(total_weight, 1.5)
+
     def test_calculate_weighted_similarity(self):
         entity1 = Entity("1", {"name": "John", "age": "30"})
         entity2 = Entity("2", {"name": "John", "age": "31"})
@@ -38,5 +153,28 @@ class TestBaseAttributeMatcher(unittest.TestCase):
         self.assertAlmostEqual(similarity, 0.6666666666666666)
 
 
+class TestTopKMatches(unittest.TestCase):
+    def test_keeps_top_k(self):
+        entities = [Entity(str(i), {}) for i in range(6)]
+        matches = TopKMatches(top_k=3)
+        for entity, score in zip(entities, [0.2, 0.9, 0.5, 0.9, 0.1, 0.7]):
+            matches.add(entity, score)
+
+        self.assertEqual([(m.id, s) for m, s in matches.sorted()], [("1", 0.9), ("3", 0.9), ("5", 0.7)])
+        self.assertEqual(matches.min_score, 0.7)
+
+    def test_min_score_before_full(self):
+        matches = TopKMatches(top_k=2)
+        matches.add(Entity("1", {}), 0.5)
+        self.assertEqual(matches.min_score, float("-inf"))
+
+    def test_unbounded(self):
+        matches = TopKMatches()
+        for i, score in enumerate([0.2, 0.9, 0.5]):
+            matches.add(Entity(str(i), {}), score)
+        self.assertEqual([m.id for m, _ in matches.sorted()], ["1", "2", "0"])
+        self.assertEqual(matches.min_score, float("-inf"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,7 @@
+import itertools
+import random
 import unittest
+from collections import Counter
 from unittest.mock import patch
 
 from rezolva.core.base import Entity
@@ -73,5 +76,100 @@ class TestBayesianMatcher(unittest.TestCase):
         self.assertEqual(self.matcher._jaccard_similarity("", ""), 0.0)
 
 
+
+class TestFellegiSunterMatcher(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.entities = []
+        for i in range(300):
+            person = {
+                "name": f"first{rng.randrange(50)} last{rng.randrange(200)}",
+                "city": f"city{rng.randrange(20)}",
+                "year": str(rng.randrange(1950, 2000)),
+            }
+            self.entities.append(Entity(f"{i}a", person))
+            if i % 2 == 0:
+                duplicate = dict(person)
+                if i % 3 == 0:
+                    duplicate["city"] = f"city{rng.randrange(20)}"
+                self.entities.append(Entity(f"{i}b", duplicate))
+        self.matcher = BayesianMatcher(
+            threshold=0.5, attribute_weights={"name": 1.0, "city": 1.0, "year": 1.0}, fellegi_sunter=True
+        )
+        self.matcher.train(self.entities)
+
+    def test_train(self):
+        for attr in ["name", "city", "year"]:
+            m_probabilities, u_probabilities = self.matcher.m_probabilities[attr], self.matcher.u_probabilities[attr]
+            self.assertAlmostEqual(sum(m_probabilities), 1.0)
+            self.assertAlmostEqual(sum(u_probabilities), 1.0)
+            # Exact agreement is far more likely among matches, disagreement among non-matches
+            self.assertGreater(self.matcher.level_weights[attr][-1], 0)
+            self.assertLess(self.matcher.level_weights[attr][0], 0)
+        self.assertLess(self.matcher.match_proportion, 0.01)
+
+    def test_match(self):
+        model = {"entities": {e.id: e for e in self.entities}}
+
+        # The duplicate of 2a agrees on every attribute, the duplicate of 0a is in another city
+        matches = self.matcher.match(model["entities"]["2a"], model)
+        moved_matches = self.matcher.match(model["entities"]["0a"], model)
+
+        self.assertEqual([match.id for match, _ in matches], ["2b"])
+        self.assertGreater(matches[0][1], 0.99)
+        self.assertEqual([match.id for match, _ in moved_matches], ["0b"])
+        self.assertLess(moved_matches[0][1], matches[0][1])
+        self.assertEqual(self.matcher.match_probability(self.entities[0], self.entities[1]), moved_matches[0][1])
+        self.assertLess(self.matcher.match_probability(self.entities[0], self.entities[2]), 0.01)
+
+    def test_agreement_level(self):
+        self.assertEqual(self.matcher._agreement_level("john smith", "john smith"), 2)
+        self.assertEqual(self.matcher._agreement_level("john smith", "john smith jr"), 1)
+        self.assertEqual(self.matcher._agreement_level("john smith", "jane doe"), 0)
+        self.assertIsNone(self.matcher._agreement_level("john smith", ""))
+
+    def test_term_frequency_adjustments(self):
+        # Agreeing on a value counts for less the more common the value is
+        counts = Counter(e.attributes["city"] for e in self.entities)
+        common, rare = counts.most_common()[0][0], counts.most_common()[-1][0]
+        self.assertGreater(self.matcher.exact_weights["city"][rare], self.matcher.exact_weights["city"][common])
+
+        query = self.matcher._prepare(Entity("q", {"name": "", "city": rare, "year": ""}))
+        self.assertEqual(
+            self.matcher._match_weight(query, Entity("c", {"city": rare})), self.matcher.exact_weights["city"][rare]
+        )
+
+    def test_expectation_maximization(self):
+        # The expected counts of 10000 pairs, 10% of them matches, with known m and u
+        m = {"a": [0.1, 0.1, 0.8], "b": [0.2, 0.1, 0.7], "c": [0.05, 0.15, 0.8]}
+        u = {"a": [0.8, 0.15, 0.05], "b": [0.7, 0.2, 0.1], "c": [0.6, 0.3, 0.1]}
+        patterns = Counter()
+        for pattern in itertools.product(range(3), repeat=3):
+            match, non_match = 0.1, 0.9
+            for attr, level in zip("abc", pattern):
+                match *= m[attr][level]
+                non_match *= u[attr][level]
+            patterns[pattern] = 10000 * (match + non_match)
+        matcher = BayesianMatcher(
+            attribute_weights={"a": 1.0, "b": 1.0, "c": 1.0}, fellegi_sunter=True, max_iterations=1000
+        )
+        matcher.m_probabilities = {attr: [0.2, 0.3, 0.5] for attr in "abc"}
+        matcher.u_probabilities = {attr: [0.5, 0.3, 0.2] for attr in "abc"}
+        matcher.match_proportion = 0.5
+
+        matcher._expectation_maximization(patterns)
+
+        self.assertAlmostEqual(matcher.match_proportion, 0.1, places=2)
+        for attr in "abc":
+            estimated = matcher.m_probabilities[attr] + matcher.u_probabilities[attr]
+            for estimated_probability, probability in zip(estimated, m[attr] + u[attr]):
+                self.assertAlmostEqual(estimated_probability, probability, places=2)
+
+    def test_not_trained(self):
+        matcher = BayesianMatcher(attribute_weights={"name": 1.0}, fellegi_sunter=True)
+        with self.assertRaises(ValueError):
+            matcher.match(self.entities[0], {"entities": {}})
+
+
 if __name__ == "__main__":
     unittest.main()
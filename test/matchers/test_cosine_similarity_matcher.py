@@ -3,6 +3,8 @@ import unittest
 
 from rezolva.core.base import Entity
 from rezolva.matchers.cosine_similarity_matcher import CosineSimilarityMatcher
+from rezolva.model_builders.simple_vector_model_builder import \
+    SimpleVectorModelBuilder
 
 
 class TestCosineSimilarityMatcher(unittest.TestCase):
@@ -50,6 +52,33 @@ class TestCosineSimilarityMatcher(unittest.TestCase):
         self.assertEqual(matches[0][0].id, "2")
         self.assertGreater(matches[0][1], 0.5)
 
+    def test_match_batch(self):
+        entities = [
+            Entity("1", {"title": "iPhone 12", "description": "Latest smartphone from Apple"}),
+            Entity("2", {"title": "iPhone 12 Pro", "description": "Advanced smartphone from Apple"}),
+            Entity("3", {"title": "Galaxy S21", "description": "Latest smartphone from Samsung"}),
+            Entity("4", {"title": "Pixel 5", "description": "Google phone"}),
+        ]
+        model = SimpleVectorModelBuilder(["title", "description"]).train(entities)
+        matcher = CosineSimilarityMatcher(threshold=0.1)
+
+        batch = matcher.match_batch(entities, model, top_k=2)
+
+        for entity, matches in zip(entities, batch):
+            expected = [(match.id, score) for match, score in matcher.match(entity, model, top_k=2)]
+            self.assertEqual([match.id for match, _ in matches], [match_id for match_id, _ in expected])
+            for (_, score), (_, expected_score) in zip(matches, expected):
+                self.assertAlmostEqual(score, expected_score)
+        self.assertEqual([match.id for match, _ in batch[0]], ["2", "3"])
+        self.assertEqual(batch[3], [])
+
+        self_matches = {entity.id: [match.id for match, _ in matches] for entity, matches in matcher.self_match(model)}
+        self.assertEqual(self_matches, {"1": ["2", "3"], "2": ["1"], "3": ["1"], "4": []})
+
+        # The matrix follows entities removed from the model, before the vectors are re-weighted
+        SimpleVectorModelBuilder(["title", "description"], reweight_ratio=1.0).remove(model, ["2"])
+        self.assertEqual([match.id for match, _ in matcher.match_batch(entities[:1], model)[0]], ["3"])
+
     def test_cosine_similarity_vectors(self):
         vec1 = {"a": 1, "b": 2, "c": 3}
         vec2 = {"b": 2, "c": 3, "d": 4}
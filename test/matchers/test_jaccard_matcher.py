@@ -35,6 +35,41 @@ class TestJaccardMatcher(unittest.TestCase):
         for sim, expected_sim in zip(similarities, expected_similarities):
             self.assertAlmostEqual(sim, expected_sim, places=6)
 
+    def test_set_similarity_join(self):
+        matcher = JaccardMatcher(threshold=0.6, attribute_weights={"title": 1.0}, min_batch_candidates=1)
+        entities = [Entity(str(i), {"title": f"phone model {i}"}) for i in range(40)]
+        entities.append(Entity("40", {"title": "phone model 1"}))
+        matcher.train(entities)
+
+        model = {"entities": {entity.id: entity for entity in entities}}
+        matches = matcher.match(Entity("q", {"title": "phone model 1"}), model)
+
+        self.assertEqual(matcher.join_attribute, "title")
+        self.assertEqual([(match.id, score) for match, score in matches], [("1", 1.0), ("40", 1.0)])
+        self.assertEqual(matcher.comparison_stats["comparisons"], 2)
+
+        matcher.remove(["40"])
+        # Candidates that are not indexed are compared anyway
+        matches = matcher.match(Entity("q", {"title": "phone model 1"}), model)
+        self.assertEqual([match.id for match, _ in matches], ["1", "40"])
+
+    def test_self_join(self):
+        matcher = JaccardMatcher(threshold=0.6, attribute_weights={"title": 1.0, "description": 0.5})
+        entities = [
+            Entity("1", {"title": "iPhone 12", "description": "Latest smartphone from Apple"}),
+            Entity("2", {"title": "iPhone 12", "description": "Smartphone from Apple"}),
+            Entity("3", {"title": "Galaxy S21", "description": "Latest smartphone from Samsung"}),
+        ]
+
+        pairs = [(entity.id, match.id) for entity, match, _ in matcher.self_join(entities)]
+
+        # Only the titles at least 0.4 similar are joined, then the pairs are scored on both attributes
+        self.assertEqual(matcher._join_bound()[0], "title")
+        self.assertEqual(pairs, [("1", "2")])
+        # With a threshold of 0.3 spread over both attributes, every pair is scored
+        self.assertEqual(self.matcher._join_bound(), (None, 0.0))
+        self.assertEqual([(entity.id, match.id) for entity, match, _ in self.matcher.self_join(entities)], [("1", "2")])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -48,6 +48,38 @@ class TestJaroWinklerMatcher(unittest.TestCase):
         for dist, expected_dist in zip(distances, expected_distances):
             self.assertAlmostEqual(dist, expected_dist, places=6)
 
+    def test_similarity_many(self):
+        candidates = ["MARHTA", "DUANE", "MARHTA", ""]
+
+        similarities = self.matcher.similarity_many("MARTHA", candidates)
+
+        self.assertEqual(similarities, [self.matcher._jaro_winkler_similarity("MARTHA", c) for c in candidates])
+        self.assertAlmostEqual(similarities[0], 0.9611111111111111)
+
+    def test_similarity_bound(self):
+        character_matcher = JaroWinklerMatcher(character_bound=True)
+
+        # Only the lengths and the prefix bound the similarity, unless the characters are used too
+        self.assertAlmostEqual(self.matcher._similarity_bound("DIXON", "DICKSONX"), 0.9)
+        self.assertAlmostEqual(self.matcher._similarity_bound("MARTHA", "MARTIN"), 1.0)
+        self.assertAlmostEqual(character_matcher._similarity_bound("MARTHA", "MARTIN"), 0.8666666666666667)
+        self.assertGreaterEqual(
+            character_matcher._similarity_bound("MARTHA", "MARTIN"),
+            self.matcher._jaro_winkler_similarity("MARTHA", "MARTIN") - 1e-9,
+        )
+
+    def test_similarity_many_pruned(self):
+        character_matcher = JaroWinklerMatcher(character_bound=True)
+        candidates = ["MARHTA", "MA", "MARTIN", "MARTHA"]
+
+        similarities = character_matcher.similarity_many("MARTHA", candidates, 0.9)
+
+        # "MA" is outside the length window and "MARTIN" is pruned on its characters, both below 0.9
+        self.assertAlmostEqual(similarities[0], 0.9611111111111111)
+        self.assertAlmostEqual(similarities[1], 0.7777777777777778)
+        self.assertLess(similarities[2], 0.9)
+        self.assertEqual(similarities[3], 1.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -48,6 +48,42 @@ class TestLevenshteinMatcher(unittest.TestCase):
         for dist, expected_dist in zip(distances, expected_distances):
             self.assertEqual(dist, expected_dist)
 
+    def test_bounded_distance(self):
+        pairs = [("kitten", "sitting"), ("book", "back"), ("completely", "different"), ("abc", "")]
+        for s1, s2 in pairs:
+            distance = self.matcher._levenshtein_distance(s1, s2)
+            for max_distance in range(10):
+                expected = distance if distance <= max_distance else max_distance + 1
+                self.assertEqual(self.matcher._levenshtein_distance(s1, s2, max_distance), expected)
+
+    def test_long_strings(self):
+        # The shorter string is longer than 64 characters, so the banded dynamic programming is used
+        s1 = "the quick brown fox jumps over the lazy dog " * 3
+        s2 = s1.replace("quick", "quack").replace("lazy", "hazy")[:-5]
+
+        self.assertEqual(self.matcher._levenshtein_distance(s1, s2), 11)
+        self.assertEqual(self.matcher._banded_distance(s1, s2, None), 11)
+        self.assertEqual(self.matcher._myers_distance(s1, s2, None), 11)
+        self.assertEqual(self.matcher._levenshtein_distance(s1, s2, 10), 11)
+        self.assertEqual(self.matcher._levenshtein_distance(s1, s2, 11), 11)
+
+    def test_bounded_similarity(self):
+        self.assertAlmostEqual(self.matcher._calculate_bounded_similarity("kitten", "sitting", 0.5), 4 / 7)
+        self.assertLess(self.matcher._calculate_bounded_similarity("kitten", "sitting", 0.6), 0.6)
+        self.assertEqual(self.matcher._calculate_bounded_similarity("", "", 0.9), 1)
+
+    def test_similarity_many(self):
+        candidates = ["sitting", "kitten", "", "sitting", "mitten"]
+
+        similarities = self.matcher.similarity_many("kitten", candidates)
+
+        expected = [self.matcher._calculate_attribute_similarity("kitten", c) for c in candidates]
+        self.assertEqual(similarities, expected)
+        bounded = self.matcher.similarity_many("kitten", candidates, min_similarity=0.8)
+        self.assertEqual(bounded[1], 1.0)
+        self.assertAlmostEqual(bounded[4], 5 / 6)
+        self.assertLess(bounded[0], 0.8)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,11 @@
 import unittest
 
+from rezolva.blockers.simple_blocker import SimpleBlocker
 from rezolva.core.base import Entity
+from rezolva.core.resolver import EntityResolver
 from rezolva.matchers.minhash_matcher import MinHashMatcher
+from rezolva.model_builders.simple_model_builder import SimpleModelBuilder
+from rezolva.preprocessors.simple_preprocessor import SimplePreprocessor
 
 
 class TestMinHashMatcher(unittest.TestCase):
@@ -30,24 +34,54 @@ class TestMinHashMatcher(unittest.TestCase):
         self.assertTrue(all(isinstance(x, int) for x in signature))
 
     def test_calculate_weighted_similarity(self):
-        entity_signatures = {
-            "title": self.matcher._minhash_signature("iPhone 12"),
-            "description": self.matcher._minhash_signature("Latest smartphone from Apple"),
-        }
+        entity = Entity("1", {"title": "iPhone 12", "description": "Latest smartphone from Apple"})
         candidate = Entity("2", {"title": "iPhone 12 Pro", "description": "Advanced smartphone from Apple"})
+        entity_signatures, candidate_signatures = self.matcher._sign([entity, candidate])
 
-        similarity = self.matcher._calculate_weighted_similarity(entity_signatures, candidate)
+        similarity = self.matcher._calculate_weighted_similarity(entity_signatures, candidate_signatures)
         self.assertGreater(similarity, 0)
         self.assertLessEqual(similarity, 1)
+        self.assertEqual(self.matcher._calculate_weighted_similarity(entity_signatures, entity_signatures), 1)
+
+    def test_signature_cache(self):
+        entity = Entity("1", {"title": "iPhone 12", "description": "Latest smartphone from Apple"})
+        candidates = [
+            Entity("2", {"title": "iPhone 12 Pro", "description": "Advanced smartphone from Apple"}),
+            Entity("3", {"title": "Galaxy S21", "description": "Latest smartphone from Samsung"}),
+        ]
+        untrained = self.matcher.match(entity, candidates)
+
+        self.matcher.train(candidates)
+        self.assertEqual(set(self.matcher.signatures), {"2", "3"})
+
+        # Cached signatures are used as they are, without signing the candidates again
+        signed = []
+        original_sign = self.matcher._sign
+        self.matcher._sign = lambda entities: signed.extend(entities) or original_sign(entities)
+        trained = self.matcher.match(entity, {"entities": {c.id: c for c in candidates}})
+
+        self.assertEqual([(m.id, s) for m, s in trained], [(m.id, s) for m, s in untrained])
+        self.assertEqual([e.id for e in signed], ["1"])
+
+        self.matcher.remove(["2"])
+        self.assertEqual(set(self.matcher.signatures), {"3"})
+
+    def test_resolver(self):
+        resolver = EntityResolver(
+            SimplePreprocessor([]),
+            SimpleModelBuilder(["title"]),
+            self.matcher,
+            SimpleBlocker(lambda e: e.attributes["title"].split()[0]),
+        )
+        resolver.train([Entity("1", {"title": "iPhone 12"}), Entity("2", {"title": "Galaxy S21"})])
 
-    def test_generate_hash_functions(self):
-        hash_functions = self.matcher._generate_hash_functions()
-        self.assertEqual(len(hash_functions), self.matcher.num_hash_functions)
+        resolver.upsert_entities([Entity("2", {"title": "iPhone 12 Pro"}), Entity("3", {"title": "iPhone 13"})])
+        self.assertEqual(self.matcher.signatures["2"], self.matcher._sign([resolver.preprocessed_entities["2"]])[0])
+        resolver.remove_entities(["3"])
+        self.assertEqual(set(self.matcher.signatures), {"1", "2"})
 
-        # Test that hash functions produce different results for the same input
-        test_input = "test"
-        hash_results = [h(test_input) for h in hash_functions]
-        self.assertEqual(len(set(hash_results)), len(hash_results))  # All results should be unique
+        matches = resolver.resolve([Entity("q", {"title": "iPhone 12 Pro"})])[0][1]
+        self.assertEqual([match.id for match, _ in matches], ["2"])
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import math
 import unittest
+from array import array
 
 from rezolva.core.base import Entity
 from rezolva.matchers.tfidf_matcher import TfIdfMatcher
@@ -57,12 +58,15 @@ class TestTfIdfMatcher(unittest.TestCase):
         for word, score in tfidf.items():
             self.assertAlmostEqual(score, expected_tfidf[word], places=6)
 
-    def test_cosine_similarity(self):
-        vec1 = {"a": 1, "b": 2, "c": 3}
-        vec2 = {"b": 2, "c": 3, "d": 4}
-        similarity = self.matcher._cosine_similarity(vec1, vec2)
+    def test_dot_product(self):
+        # The cosine similarity of {a: 1, b: 2, c: 3} and {b: 2, c: 3, d: 4}, as unit vectors by term ID
+        query = {0: 1 / math.sqrt(14), 1: 2 / math.sqrt(14), 2: 3 / math.sqrt(14)}
+        terms = array("l", [1, 2, 3])
+        weights = array("d", [2 / math.sqrt(29), 3 / math.sqrt(29), 4 / math.sqrt(29)])
+        similarity = self.matcher._dot_product(query, terms, weights)
         expected_similarity = 0.6451791670811048
         self.assertAlmostEqual(similarity, expected_similarity, places=6)
+        self.assertEqual(self.matcher._dot_product({}, terms, weights), 0.0)
 
     def test_calculate_attribute_similarity(self):
         val1 = "iPhone 12 Pro"
@@ -71,6 +75,24 @@ class TestTfIdfMatcher(unittest.TestCase):
         self.assertGreater(similarity, 0.5)
         self.assertLessEqual(similarity, 1.0)  # Changed from assertLess to assertLessEqual
 
+    def test_precomputed_vectors(self):
+        terms, weights = self.matcher.vectors["1"]["description"]
+
+        # "smartphone" is in every document and has no weight
+        self.assertEqual(len(terms), 3)
+        self.assertAlmostEqual(sum(weight**2 for weight in weights), 1.0)
+
+        new_entity = Entity("4", {"title": "iPhone 13", "description": "Next generation smartphone from Apple"})
+        candidate = Entity("1", {"title": "iPhone 12", "description": "Latest smartphone from Apple"})
+        precomputed = self.matcher.match(new_entity, {"entities": {"1": candidate}})
+        self.matcher.remove(["1"])
+        self.assertNotIn("1", self.matcher.vectors)
+        computed = self.matcher.match(new_entity, {"entities": {"1": candidate}})
+        self.assertAlmostEqual(precomputed[0][1], computed[0][1])
+
+        self.matcher.update([candidate])
+        self.assertIn("1", self.matcher.vectors)
+
     def test_match_no_match(self):
         new_entity = Entity("5", {"title": "Refrigerator", "description": "Large kitchen appliance for food storage"})
         matches = self.matcher.match(new_entity, {"entities": {e.id: e for e in self.entities}})
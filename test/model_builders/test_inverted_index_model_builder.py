@@ -34,6 +34,17 @@ class TestInvertedIndexModelBuilder(unittest.TestCase):
         self.assertIn("jane", updated_model["index"])
         self.assertIn("data", updated_model["index"])
 
+    def test_remove(self):
+        entities = [
+            Entity("1", {"name": "John Doe", "description": "Software Engineer"}),
+            Entity("2", {"name": "Jane Smith", "description": "Software Developer"}),
+        ]
+        model = self.model_builder.remove(self.model_builder.train(entities), ["1", "unknown"])
+
+        self.assertEqual(list(model["entities"]), ["2"])
+        self.assertNotIn("john", model["index"])
+        self.assertEqual(model["index"]["software"], {"2"})
+
     def test_tokenize(self):
         text = "Hello, World! This is a test."
         tokens = self.model_builder._tokenize(text)
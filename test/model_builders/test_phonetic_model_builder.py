@@ -29,6 +29,17 @@ class TestPhoneticModelBuilder(unittest.TestCase):
         self.assertIn("J530", updated_model["phonetic_index"].keys())
         self.assertIn("J525", updated_model["phonetic_index"].keys())
 
+    def test_remove(self):
+        entities = [
+            Entity("1", {"name": "John Smith"}),
+            Entity("2", {"name": "Jon Smyth"}),
+            Entity("3", {"name": "Jane Doe"}),
+        ]
+        model = self.model_builder.remove(self.model_builder.train(entities), ["1", "3"])
+
+        self.assertEqual(list(model["entities"]), ["2"])
+        self.assertEqual(model["phonetic_index"], {"J525": {"2"}})
+
     def test_soundex(self):
         self.assertEqual(self.model_builder._soundex("Robert"), "R163")
         self.assertEqual(self.model_builder._soundex("Rupert"), "R163")
@@ -31,6 +31,14 @@ class TestSimpleModelBuilder(unittest.TestCase):
         self.assertIn("jane smith", updated_model["index"]["name"].keys())
         self.assertIn("25", updated_model["index"]["age"])
 
+    def test_remove(self):
+        entities = [Entity("1", {"name": "John Doe", "age": "30"}), Entity("2", {"name": "Jane Smith", "age": "30"})]
+        model = self.model_builder.remove(self.model_builder.train(entities), ["1"])
+
+        self.assertEqual(list(model["entities"]), ["2"])
+        self.assertNotIn("john doe", model["index"]["name"])
+        self.assertEqual(model["index"]["age"]["30"], {"2"})
+
 
 if __name__ == "__main__":
     unittest.main()
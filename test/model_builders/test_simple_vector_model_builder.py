@@ -72,6 +72,84 @@ class TestSimpleVectorModelBuilder(unittest.TestCase):
         expected_tfidf_john = tf_john * idf_john
         self.assertAlmostEqual(john_vector["john"], expected_tfidf_john, places=6)
 
+    def test_remove(self):
+        entities = [
+            Entity("1", {"name": "John Doe", "description": "Software Engineer"}),
+            Entity("2", {"name": "Jane Smith", "description": "Data Scientist"}),
+            Entity("3", {"name": "Bob Johnson", "description": "Software Developer"}),
+        ]
+        model_builder = SimpleVectorModelBuilder(["name", "description"], reweight_ratio=0.5)
+        model = model_builder.remove(model_builder.train(entities), ["1"])
+
+        self.assertEqual(set(model["entities"]), {"2", "3"})
+        self.assertNotIn("1", model["vectors"])
+        self.assertNotIn("john", model["idf"])
+        self.assertEqual(model["doc_freq"]["software"], 1)
+        self.assertEqual(model["postings"]["software"], {"3"})
+        self.assertEqual(model["num_docs"], 2)
+        self.assertNotIn("1", model["matrix"])
+
+        # Until enough documents change, the other vectors keep the IDF values they were computed with
+        self.assertAlmostEqual(model["idf"]["software"], math.log(3 / 3), places=6)
+        self.assertEqual(model["stale_docs"], 1)
+
+        # Removing another document re-weights every vector with the current number of documents
+        model = model_builder.remove(model, ["2"])
+        self.assertAlmostEqual(model["idf"]["software"], math.log(1 / 2), places=6)
+        self.assertAlmostEqual(model["vectors"]["3"]["software"], 1 / 4 * math.log(1 / 2), places=6)
+        self.assertEqual(model["stale_docs"], 0)
+
+    def test_deferred_update(self):
+        entities = [Entity(str(i), {"name": f"name{i} common", "description": ""}) for i in range(10)]
+        model = self.model_builder.train(entities)
+        vector = model["vectors"]["0"]
+
+        model = self.model_builder.update(model, [Entity("10", {"name": "new common", "description": ""})])
+
+        # Only the new entity is vectorized, with the IDF of its new term taken from the current counts
+        self.assertIs(model["vectors"]["0"], vector)
+        self.assertEqual(model["num_docs"], 11)
+        self.assertEqual(model["doc_freq"]["common"], 11)
+        self.assertAlmostEqual(model["idf"]["new"], math.log(11 / 2), places=6)
+        self.assertAlmostEqual(model["vectors"]["10"]["new"], 1 / 2 * math.log(11 / 2), places=6)
+        self.assertIn("10", model["matrix"])
+
+    def test_replaced_entities_counted_once(self):
+        entities = [Entity(str(i), {"name": f"name{i}", "description": ""}) for i in range(10)]
+        model_builder = SimpleVectorModelBuilder(["name", "description"], reweight_ratio=0.5)
+        model = model_builder.train(entities)
+
+        replacements = [Entity(str(i), {"name": f"renamed{i}", "description": ""}) for i in range(3)]
+        model = model_builder.update(model, replacements)
+
+        # Each replaced entity counts as one changed document, so 3 of 10 stay below the ratio
+        self.assertEqual(model["num_docs"], 10)
+        self.assertEqual(model["stale_docs"], 3)
+
+    def test_matches_full_retrain(self):
+        entities = [
+            Entity("1", {"name": "John Doe", "description": "Software Engineer"}),
+            Entity("2", {"name": "Jane Smith", "description": "Data Scientist"}),
+            Entity("3", {"name": "Bob Johnson", "description": "Software Developer"}),
+            Entity("4", {"name": "Alice Doe", "description": "Data Engineer"}),
+        ]
+        updates = [Entity("5", {"name": "Carol Smith", "description": "Engineer"}), Entity("2", {"name": "Jane Doe"})]
+        expected = self.model_builder.train([entities[0], entities[2], entities[3], updates[0], updates[1]])
+
+        for reweight_ratio in (0, 0.1, 10):
+            model_builder = SimpleVectorModelBuilder(["name", "description"], reweight_ratio)
+            model = model_builder.train(entities)
+            model = model_builder.update(model, updates)
+            with self.subTest(reweight_ratio=reweight_ratio):
+                # The counts are always current, and the weights once the model is re-weighted
+                self.assertEqual(model["num_docs"], expected["num_docs"])
+                self.assertEqual(model["doc_freq"], expected["doc_freq"])
+                self.assertEqual(model["postings"], expected["postings"])
+                if reweight_ratio < 10:
+                    self.assertEqual(model["idf"], expected["idf"])
+                    self.assertEqual(model["vectors"], expected["vectors"])
+                    self.assertEqual(set(model["matrix"].rows), set(expected["matrix"].rows))
+
     def test_empty_entity(self):
         entities = [Entity("1", {"name": "", "description": ""})]
         model = self.model_builder.train(entities)
@@ -29,6 +29,37 @@ class TestSimplePreprocessor(unittest.TestCase):
         preprocessor.remove_preprocessing_function(dummy_func)
         self.assertNotIn(dummy_func, preprocessor.preprocessing_functions)
 
+    def test_cache(self):
+        calls = []
+
+        def uppercase(value):
+            calls.append(value)
+            return value.upper() if isinstance(value, str) else value
+
+        preprocessor = SimplePreprocessor([uppercase], cache_size=10)
+        entities = [Entity(str(i), {"city": "boston", "state": "ma", "zip": i % 2}) for i in range(5)]
+        processed = [preprocessor.preprocess(entity) for entity in entities]
+
+        self.assertTrue(all(e.attributes == {"city": "BOSTON", "state": "MA", "zip": int(e.id) % 2} for e in processed))
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(preprocessor.cache_stats, {"hits": 11, "misses": 4})
+
+        preprocessor.add_preprocessing_function(lambda value: value)
+        self.assertEqual(preprocessor.cache_stats, {"hits": 0, "misses": 0})
+
+    def test_cache_eviction(self):
+        preprocessor = SimplePreprocessor([str.upper], cache_size=2)
+        for value in ["a", "b", "a", "c", "b"]:
+            preprocessor.preprocess(Entity("1", {"name": value}))
+
+        self.assertEqual(preprocessor.cache_stats, {"hits": 1, "misses": 4})
+        self.assertEqual(len(preprocessor._cache), 2)
+
+    def test_cache_unhashable_value(self):
+        preprocessor = SimplePreprocessor([lambda value: value], cache_size=10)
+        processed = preprocessor.preprocess(Entity("1", {"tags": ["a", "b"]}))
+        self.assertEqual(processed.attributes["tags"], ["a", "b"])
+
 
 if __name__ == "__main__":
     unittest.main()
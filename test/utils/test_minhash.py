@@ -0,0 +1,51 @@
+import unittest
+
+from rezolva.utils.minhash import (MAX_HASH, MinHashSigner, hash_token,
+                                   matching_values, pack_signature)
+
+
+class TestMinHashSigner(unittest.TestCase):
+    def setUp(self):
+        self.signer = MinHashSigner(64, seed=7)
+
+    def test_signature_matches_hash_functions(self):
+        tokens = ["latest", "smartphone", "from", "apple"]
+
+        expected = [
+            min(((a * hash_token(token) + b) % 2**64) >> 32 for token in tokens)
+            for a, b in zip(self.signer.multipliers, self.signer.increments)
+        ]
+
+        self.assertEqual(self.signer.signature(tokens), expected)
+
+    def test_signatures(self):
+        token_sets = [["a", "b"], ["b", "c", "a"], []]
+
+        signatures = self.signer.signatures(token_sets)
+
+        self.assertEqual(signatures, [self.signer.signature(tokens) for tokens in token_sets])
+        self.assertEqual(signatures[2], [MAX_HASH] * 64)
+
+    def test_seed(self):
+        self.assertEqual(MinHashSigner(64, seed=7).signature(["a"]), self.signer.signature(["a"]))
+        self.assertNotEqual(MinHashSigner(64, seed=8).signature(["a"]), self.signer.signature(["a"]))
+
+    def test_matching_values(self):
+        first = [0, 1, MAX_HASH, 7, 2**31]
+        second = [0, 2, MAX_HASH, 8, 2**31]
+
+        self.assertEqual(matching_values(pack_signature(first), pack_signature(second), 5), 3)
+        self.assertEqual(matching_values(pack_signature(first), pack_signature(first), 5), 5)
+
+    def test_jaccard_estimate(self):
+        signer = MinHashSigner(512)
+        first = signer.signature(str(i) for i in range(100))
+        second = signer.signature(str(i) for i in range(50, 150))
+
+        # The true Jaccard similarity is 50 / 150
+        estimate = sum(a == b for a, b in zip(first, second)) / 512
+        self.assertAlmostEqual(estimate, 1 / 3, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
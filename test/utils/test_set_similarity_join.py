@@ -0,0 +1,86 @@
+import itertools
+import random
+import unittest
+
+from rezolva.utils.set_similarity_join import SetSimilarityJoin, _suffix_hamming_bound
+
+
+def jaccard(set1, set2):
+    if not set1 and not set2:
+        return 1.0
+    return len(set1 & set2) / len(set1 | set2)
+
+
+class TestSetSimilarityJoin(unittest.TestCase):
+    def setUp(self):
+        self.sets = {
+            "1": {"apple", "iphone", "12"},
+            "2": {"apple", "iphone", "13"},
+            "3": {"apple", "iphone", "12", "pro"},
+            "4": {"samsung", "galaxy", "s21"},
+            "5": set(),
+            "6": set(),
+        }
+        self.join = SetSimilarityJoin(0.5)
+        self.join.build(self.sets)
+
+    def test_build(self):
+        # Tokens are numbered from the rarest, so the prefix of a set holds its rarest tokens
+        self.assertLess(self.join.token_ids["12"], self.join.token_ids["apple"])
+        self.assertEqual(self.join.records["1"], tuple(sorted(self.join.records["1"])))
+        self.assertEqual(len(self.join), 6)
+
+    def test_query(self):
+        matches = dict(self.join.query({"apple", "iphone", "12", "pro"}))
+
+        self.assertEqual(set(matches), {"1", "3"})
+        self.assertAlmostEqual(matches["1"], 0.75)
+        self.assertEqual(dict(self.join.query(set())), {"5": 1.0, "6": 1.0})
+        self.assertEqual(self.join.query({"nokia"}), [])
+        self.assertEqual(dict(self.join.query({"apple", "iphone", "12", "pro"}, 0.8)), {"3": 1.0})
+        with self.assertRaises(ValueError):
+            self.join.query({"apple"}, 0.3)
+
+    def test_self_join(self):
+        pairs = {(id1, id2): similarity for id1, id2, similarity in self.join.self_join()}
+
+        self.assertEqual(set(pairs), {("5", "6"), ("1", "2"), ("1", "3")})
+        self.assertAlmostEqual(pairs[("1", "2")], 0.5)
+
+    def test_add_remove(self):
+        self.join.add({"7": {"apple", "iphone", "12", "mini"}, "3": {"galaxy", "s21"}})
+        self.join.remove(["1", "unknown"])
+
+        self.assertNotIn("1", self.join)
+        self.assertEqual(set(dict(self.join.query({"apple", "iphone", "12"}))), {"2", "7"})
+        self.assertEqual(set(dict(self.join.query({"samsung", "galaxy", "s21"}))), {"3", "4"})
+
+    def test_exact(self):
+        # The filters only drop pairs below the threshold, whatever the sets and thresholds
+        rng = random.Random(0)
+        for threshold in (0.2, 0.5, 0.8, 1.0):
+            for suffix_filter in (False, True):
+                sets = {i: {rng.randrange(20) for _ in range(rng.randrange(12))} for i in range(60)}
+                join = SetSimilarityJoin(threshold, suffix_filter=suffix_filter)
+                join.build(sets)
+
+                expected = {
+                    (i, j) for i, j in itertools.combinations(sets, 2) if jaccard(sets[i], sets[j]) >= threshold
+                }
+                self.assertEqual({tuple(sorted(pair[:2])) for pair in join.self_join()}, expected)
+                for query in [{rng.randrange(25) for _ in range(rng.randrange(12))} for _ in range(10)]:
+                    expected = {i for i in sets if jaccard(query, sets[i]) >= threshold}
+                    self.assertEqual({i for i, _ in join.query(query)}, expected)
+
+    def test_suffix_hamming_bound(self):
+        # The Hamming distance of these is 4, and the bound never exceeds it
+        self.assertLessEqual(_suffix_hamming_bound((1, 2, 3, 4, 5), (1, 3, 5, 6, 7), 10, 1), 4)
+        self.assertGreater(_suffix_hamming_bound((1, 2, 3), (4, 5, 6), 2, 1), 2)
+
+    def test_invalid_threshold(self):
+        with self.assertRaises(ValueError):
+            SetSimilarityJoin(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
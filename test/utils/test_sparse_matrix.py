@@ -0,0 +1,65 @@
+import math
+import unittest
+
+from rezolva.utils.sparse_matrix import SparseMatrix
+
+
+class TestSparseMatrix(unittest.TestCase):
+    def setUp(self):
+        self.vectors = {
+            "1": {"a": 1.0, "b": 2.0, "c": 3.0},
+            "2": {"b": 2.0, "c": 3.0, "d": 4.0},
+            "3": {"e": 1.0},
+            "4": {},
+        }
+        self.matrix = SparseMatrix.from_vectors(self.vectors)
+
+    def test_from_vectors(self):
+        self.assertEqual(len(self.matrix), 4)
+        self.assertAlmostEqual(self.matrix.norms[self.matrix.rows["1"]], math.sqrt(14))
+        self.assertEqual(list(self.matrix.indptr), [0, 3, 6, 7, 7])
+
+    def test_dot(self):
+        query = self.matrix.normalize(self.vectors["1"])
+
+        self.assertAlmostEqual(self.matrix.dot(query, "2"), 0.6451791670811048)
+        self.assertAlmostEqual(self.matrix.dot(query, "1"), 1.0)
+        self.assertEqual(self.matrix.dot(query, "4"), 0.0)
+
+    def test_normalize(self):
+        # Terms no row contains still count towards the norm of the query
+        query = self.matrix.normalize({"a": 3.0, "unknown": 4.0})
+        self.assertEqual(query, {self.matrix.term_ids["a"]: 0.6})
+        self.assertEqual(self.matrix.normalize({}), {})
+
+    def test_scores(self):
+        query = self.matrix.normalize(self.vectors["2"])
+
+        scores = self.matrix.scores(query)
+
+        self.assertEqual([row_id for row_id, _ in scores], ["1", "2"])
+        for row_id, score in scores:
+            self.assertAlmostEqual(score, self.matrix.dot(query, row_id))
+
+    def test_set_and_remove_rows(self):
+        query = self.matrix.normalize({"e": 1.0})
+        self.assertEqual(self.matrix.scores(query), [("3", 1.0)])
+
+        self.matrix.set_rows({"1": {"e": 2.0}})
+        self.matrix.remove_rows(["3", "unknown"])
+
+        self.assertNotIn("3", self.matrix)
+        self.assertEqual(self.matrix.scores(query), [("1", 1.0)])
+        self.assertAlmostEqual(self.matrix.dot(self.matrix.normalize(self.vectors["2"]), "2"), 1.0)
+
+    def test_compaction(self):
+        for _ in range(5):
+            self.matrix.set_rows({"2": self.vectors["2"]})
+
+        # Replaced rows are dropped from the arrays once they outnumber the rows in use
+        self.assertLessEqual(len(self.matrix.data), 2 * 7)
+        self.assertAlmostEqual(self.matrix.dot(self.matrix.normalize(self.vectors["1"]), "2"), 0.6451791670811048)
+
+
+if __name__ == "__main__":
+    unittest.main()